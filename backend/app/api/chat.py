@@ -1,21 +1,40 @@
 
-from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
 from pydantic import BaseModel
-from ..services.chat_service import ChatService
-from ..services.embedding_service import EmbeddingService
-from sqlalchemy.orm import Session
-from ..db.db_connection import get_db
+from starlette.background import BackgroundTask
+from ..services.admission import (
+    AdmissionController, Cancellation, DeadlineExceededError, OverloadedError, RateLimitedError,
+    RequestCancelledError
+)
+from ..services.conversation_memory import looks_like_follow_up
+from ..services.inference_scheduler import QueueFullError
+from .dependencies import get_admission, get_chat_service, get_scheduler
+from ..services.interaction_logger import InteractionRecord, interaction_log
+from sqlalchemy.orm import Session, joinedload, selectinload
+from ..db.db_connection import SessionLocal, get_db, set_statement_timeout
+from ..core import tracing
+from ..core.executors import run_in_db_pool, run_in_ingest_pool
+from ..db import stats
 from ..db.db_models import Conversation, Interaction
+from ..db.search import message_filter, user_name_filter
 import logging
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 import asyncio
-from typing import List, Optional
+import json
+import time
+from typing import TYPE_CHECKING, List, Literal, Optional
 
 from datetime import datetime
 
+if TYPE_CHECKING:
+    # Annotations only: importing chat_service pulls in torch and transformers,
+    # which the lifespan loads later, off the import path of the routers
+    from ..services.chat_service import ChatService
+    from ..services.conversation_memory import ConversationMemory
+    from ..services.inference_scheduler import InferenceScheduler
+
 logger = logging.getLogger(__name__)
 router = APIRouter()
-chat_service = ChatService()
 
 # Request models for API endpoints
 class ChatRequest(BaseModel):
@@ -29,24 +48,110 @@ class UserActivity(BaseModel):
     user_name: str
     interactions: list
 
+# How often a waiting /api/chat checks whether its client is still connected
+DISCONNECT_POLL_S = 0.5
+
+def admission_error(e: Exception) -> HTTPException:
+    """Traduce un rechazo del control de admisión a la respuesta HTTP"""
+    if isinstance(e, RateLimitedError):
+        logger.warning("Rate limit exceeded, rejecting chat request")
+        return HTTPException(
+            status_code=429,
+            detail="Too many requests, please slow down",
+            headers={"Retry-After": str(max(1, round(e.retry_after)))}
+        )
+    logger.warning("Too many concurrent generations, rejecting chat request")
+    return HTTPException(
+        status_code=503,
+        detail="Server busy, please retry",
+        headers={"Retry-After": "1"}
+    )
+
+async def wait_for_reply(http_request: Request, pending: asyncio.Future, cancellation: Cancellation) -> str:
+    """Espera la respuesta; la cancela si el cliente se desconecta o vence el plazo"""
+    while True:
+        done, _ = await asyncio.wait({pending}, timeout=DISCONNECT_POLL_S)
+        if done:
+            return pending.result()
+        expired = cancellation.expired
+        if expired or await http_request.is_disconnected():
+            # Drops the request from the queue, or stops its row between tokens
+            pending.cancel()
+            if expired:
+                raise DeadlineExceededError("Request deadline exceeded")
+            raise RequestCancelledError("Client disconnected")
+
+async def load_memory(memory: Optional["ConversationMemory"], user_email: str) -> None:
+    """Trae la conversación de la base si no está en la memoria caliente"""
+    if memory is not None and not memory.touch(user_email):
+        await run_in_db_pool(memory.load, user_email)
+
 # Main chat endpoint for handling user messages
 @router.post("/api/chat")
-async def chat(request: ChatRequest):
+async def chat(
+    request: ChatRequest,
+    http_request: Request,
+    chat_service: "ChatService" = Depends(get_chat_service),
+    scheduler: "InferenceScheduler" = Depends(get_scheduler),
+    admission: AdmissionController = Depends(get_admission)
+):
     try:
         logger.info(f"Received chat request from {request.user_email}")
-        logger.info(f"Message: {request.message}")
+        # Message contents only reach the logs for a sample of requests
+        tracing.log_payload(logger, "Chat request", user_email=request.user_email, message=request.message)
         
         if not request.message:
             raise ValueError("Message cannot be empty")
             
-        response = chat_service.generate_response(
-            request.message,
-            request.company_name,
-            request.chat_name
-        )
+        memory = chat_service.memory
+        # Short continuations ("why?") depend on the previous turn, so their
+        # conversation is loaded first; anything else tries the cache first
+        follow_up = memory is not None and looks_like_follow_up(request.message)
+        if follow_up:
+            await load_memory(memory, request.user_email)
+        # Exact repeats are answered from the cache without touching the models
+        cached = None
+        if not (follow_up and memory.has_history(request.user_email)):
+            cached = chat_service.get_cached_reply(request.message, request.company_name, request.chat_name)
+        if cached is not None:
+            if memory is not None:
+                memory.append(request.user_email, request.message, cached)
+            return {"reply": cached}
+        if not follow_up:
+            await load_memory(memory, request.user_email)
         
-        logger.info(f"Generated response: {response}")
+        # Only generations count against the limits; cache hits are served above
+        with admission.admit(request.user_email):
+            cancellation = Cancellation()
+            # Concurrent requests are grouped into micro-batches by the scheduler,
+            # taking turns per user so one heavy user can't starve the rest
+            pending = asyncio.ensure_future(scheduler.generate(
+                request.message,
+                request.company_name,
+                request.chat_name,
+                user_key=request.user_email,
+                cancellation=cancellation
+            ))
+            response = await wait_for_reply(http_request, pending, cancellation)
+        
+        tracing.log_payload(logger, "Chat response", user_email=request.user_email, reply=response)
         return {"reply": response}
+    except (RateLimitedError, OverloadedError) as e:
+        raise admission_error(e)
+    except DeadlineExceededError:
+        logger.warning(f"Chat request from {request.user_email} exceeded its deadline")
+        raise HTTPException(status_code=504, detail="Request deadline exceeded")
+    except RequestCancelledError:
+        logger.info(f"Client {request.user_email} disconnected, generation cancelled")
+        # Nobody reads this response; the status only shows up in logs and metrics
+        raise HTTPException(status_code=499, detail="Client closed request")
+    except QueueFullError:
+        logger.warning("Inference queue full, rejecting chat request")
+        raise HTTPException(
+            status_code=503,
+            detail="Server busy, please retry",
+            headers={"Retry-After": "1"}
+        )
     except ValueError as ve:
         logger.error(f"Validation error: {str(ve)}")
         raise HTTPException(status_code=400, detail=str(ve))
@@ -54,13 +159,88 @@ async def chat(request: ChatRequest):
         logger.error(f"Error in chat: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail="Internal server error occurred")
 
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+# Streaming chat endpoint: emits the answer as Server-Sent Events while it is generated
+@router.post("/api/chat/stream")
+async def chat_stream(
+    request: ChatRequest,
+    chat_service: "ChatService" = Depends(get_chat_service),
+    scheduler: "InferenceScheduler" = Depends(get_scheduler),
+    admission: AdmissionController = Depends(get_admission)
+):
+    if not request.message:
+        raise HTTPException(status_code=400, detail="Message cannot be empty")
+
+    logger.info(f"Received streaming chat request from {request.user_email}")
+    # Rejected before the stream opens, so the client gets a plain 429/503
+    try:
+        slot = admission.admit(request.user_email)
+    except (RateLimitedError, OverloadedError) as e:
+        raise admission_error(e)
+    cancellation = Cancellation()
+    try:
+        # Exact cache hits are answered without history, so they skip the DB read
+        if looks_like_follow_up(request.message) or chat_service.get_cached_reply(
+            request.message, request.company_name, request.chat_name
+        ) is None:
+            await load_memory(chat_service.memory, request.user_email)
+    except Exception:
+        slot.release()
+        raise
+
+    def events():
+        start = time.perf_counter()
+        ttft_ms = None
+        reply = []
+        try:
+            # Decoding waits its turn in the scheduler's fair queue, and closing
+            # this generator (client disconnect) stops it
+            for text in scheduler.stream(
+                request.message,
+                request.company_name,
+                request.chat_name,
+                user_key=request.user_email,
+                cancellation=cancellation
+            ):
+                if ttft_ms is None:
+                    ttft_ms = round((time.perf_counter() - start) * 1000, 1)
+                reply.append(text)
+                yield sse_event("token", {"text": text})
+            yield sse_event("done", {
+                "reply": "".join(reply),
+                "ttft_ms": ttft_ms,
+                "total_ms": round((time.perf_counter() - start) * 1000, 1)
+            })
+        except DeadlineExceededError:
+            logger.warning(f"Chat stream for {request.user_email} exceeded its deadline")
+            yield sse_event("error", {"detail": "Request deadline exceeded", "partial_reply": "".join(reply)})
+        except QueueFullError:
+            logger.warning("Inference queue full, rejecting chat stream")
+            yield sse_event("error", {"detail": "Server busy, please retry"})
+        except Exception as e:
+            logger.error(f"Error in chat stream: {str(e)}", exc_info=True)
+            yield sse_event("error", {"detail": "Internal server error occurred"})
+        finally:
+            slot.release()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Frees the slot even if the client leaves before the stream starts
+        background=BackgroundTask(slot.release)
+    )
+
 # Initialize embeddings and other necessary data
 @router.post("/api/initialize")
-async def initialize_data():
+async def initialize_data(chat_service: "ChatService" = Depends(get_chat_service)):
     try:
         logger.info("Starting data initialization...")
-        embedding_service = EmbeddingService()
-        embedding_service._initialize_data()
+        # Re-ingest the corpus on the live service; searches keep using the previous
+        # index until the new one is swapped in, and cached answers are invalidated
+        await run_in_ingest_pool(chat_service.embedding_service._initialize_data)
         
         logger.info("Data initialized successfully")
         return {"message": "Data initialized successfully"}
@@ -69,56 +249,59 @@ async def initialize_data():
         raise HTTPException(status_code=500, detail=str(e))
 
 # Log user interactions with the chatbot
-async def log_interaction(activity: UserActivity, db: Session = Depends(get_db)):
+# Records are queued for the background writer, so no DB work happens in the request
+@router.post("/api/log_interaction", status_code=202)
+async def log_interaction(activity: UserActivity):
     try:
-        # Search or create a conversation for this user
-        conversation = db.query(Conversation).filter(
-            Conversation.user_email == activity.user_email
-        ).first()
-        
-        if not conversation:
-            # Create new conversation if none exists
-            conversation = Conversation(
+        records = [
+            InteractionRecord(
                 user_email=activity.user_email,
-                user_name=activity.user_name
-            )
-            db.add(conversation)
-            db.commit()
-            db.refresh(conversation)
-
-        # Add new interactions to the conversation
-        for interaction in activity.interactions:
-            new_interaction = Interaction(
-                conversation_id=conversation.id,
+                user_name=activity.user_name,
                 timestamp=datetime.fromisoformat(interaction["timestamp"].replace("Z", "+00:00")),
                 user_message=interaction["user_message"],
                 bot_response=interaction["bot_response"]
             )
-            db.add(new_interaction)
-
-        db.commit()
-        return {"message": "Interactions logged successfully"}
-    except Exception as e:
-        db.rollback()
-        logger.error(f"Error logging interaction: {str(e)}")
-        raise HTTPException(status_code=500, detail="Error logging interaction")
+            for interaction in activity.interactions
+        ]
+    except (KeyError, TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid interaction: {str(e)}")
+    
+    if not all([interaction_log.log(record) for record in records]):
+        raise HTTPException(
+            status_code=503,
+            detail="Interaction log queue is full",
+            headers={"Retry-After": "1"}
+        )
+    return {"message": "Interactions queued for logging"}
 
 # Retrieve all interactions for admin dashboard
+# - default: JSON list of conversations; with `limit`, one page keyed on conversation id,
+#   and the cursor for the next page is returned in the X-Next-Cursor header
+# - format=ndjson: streams one interaction per line, keyed on interaction id
 @router.get("/api/interactions")
 async def get_all_interactions(
     request: Request,
-    db: Session = Depends(get_db),
-    timeout: Optional[float] = 30.0
+    timeout: Optional[float] = 30.0,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[int] = None,
+    format: str = "json"
 ):
+    if format == "ndjson":
+        return StreamingResponse(
+            stream_interactions_ndjson(cursor),
+            media_type="application/x-ndjson"
+        )
     try:
-        # Add timeout to the database query
-        result = await asyncio.wait_for(
-            get_interactions_from_db(db),
+        # The query runs on the DB pool, so wait_for can actually time out
+        result, next_cursor = await asyncio.wait_for(
+            run_in_db_pool(load_interactions_page, timeout, limit, cursor),
             timeout=timeout
         )
+        headers = {"X-Next-Cursor": str(next_cursor)} if next_cursor is not None else None
         return JSONResponse(
             content=result,
-            status_code=200
+            status_code=200,
+            headers=headers
         )
     except asyncio.TimeoutError:
         logger.error("Request timeout getting interactions")
@@ -133,130 +316,195 @@ async def get_all_interactions(
             detail="Error getting interactions"
         )
 
-async def get_interactions_from_db(db: Session):
-    conversations = db.query(Conversation).all()
-    return [
-        {
-            "user_email": conv.user_email,
-            "user_name": conv.user_name,
-            "interactions": [
-                {
-                    "timestamp": inter.timestamp.isoformat(),
-                    "user_message": inter.user_message,
-                    "bot_response": inter.bot_response
-                }
-                for inter in db.query(Interaction)
-                .filter(Interaction.conversation_id == conv.id)
-                .all()
-            ]
-        }
-        for conv in conversations
-    ]
+def serialize_conversation(conversation: Conversation, newest_first: bool = False):
+    interactions = sorted(
+        conversation.interactions,
+        key=lambda interaction: (interaction.timestamp, interaction.id),
+        reverse=newest_first
+    )
+    return {
+        "user_email": conversation.user_email,
+        "user_name": conversation.user_name,
+        "interactions": [
+            {
+                "timestamp": interaction.timestamp.isoformat(),
+                "user_message": interaction.user_message,
+                "bot_response": interaction.bot_response,
+                "sentiment": interaction.sentiment
+            }
+            for interaction in interactions
+        ]
+    }
 
-# Search interactions by username with fuzzy matching
-@router.get("/api/interactions/search")
-async def search_interactions(user_name: str, db: Session = Depends(get_db)):
+def load_interactions_page(timeout: Optional[float], limit: Optional[int], cursor: Optional[int]):
+    # The session belongs to the pool thread: a timed-out request stops waiting
+    # for it, but never closes it while the query is still running
+    db = SessionLocal()
     try:
-        # Log the search attempt for debugging
-        logger.info(f"Searching for user_name: {user_name}")
-        
-        # Get all conversations that match the username using case-insensitive search
-        conversations = db.query(Conversation).filter(
-            Conversation.user_name.ilike(f"%{user_name}%")
-        ).all()
-        
-        if not conversations:
-            return []
-            
-        # Format the response with matched conversations
-        response_data = []
-        for conversation in conversations:
-            try:
-                # Get interactions ordered by most recent first
-                interactions = db.query(Interaction).filter(
-                    Interaction.conversation_id == conversation.id
-                ).order_by(Interaction.timestamp.desc()).all()
-                
-                response_data.append({
-                    "user_email": conversation.user_email,
-                    "user_name": conversation.user_name,
-                    "interactions": [
-                        {
-                            "timestamp": interaction.timestamp.isoformat(),
-                            "user_message": interaction.user_message,
-                            "bot_response": interaction.bot_response
-                        }
-                        for interaction in interactions
-                    ]
-                })
-            except Exception as inner_e:
-                logger.error(f"Error processing conversation {conversation.id}: {str(inner_e)}")
-                continue
+        return get_interactions_from_db(db, timeout, limit, cursor)
+    finally:
+        db.close()
+
+def get_interactions_from_db(
+    db: Session,
+    timeout: Optional[float] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[int] = None
+):
+    if timeout:
+        set_statement_timeout(db, timeout)
+    # selectinload fetches the interactions of every conversation in one extra query
+    query = db.query(Conversation).options(
+        selectinload(Conversation.interactions)
+    ).order_by(Conversation.id)
+    if cursor is not None:
+        query = query.filter(Conversation.id > cursor)
+    if limit is not None:
+        query = query.limit(limit)
+    conversations = query.all()
+    
+    next_cursor = None
+    if limit is not None and len(conversations) == limit:
+        next_cursor = conversations[-1].id
+    return [serialize_conversation(conv) for conv in conversations], next_cursor
+
+def stream_interactions_ndjson(cursor: Optional[int] = None, batch_size: int = 1000):
+    # The request-scoped session is closed before streaming starts, so use our own
+    db = SessionLocal()
+    try:
+        query = db.query(
+            Interaction.id,
+            Interaction.timestamp,
+            Interaction.user_message,
+            Interaction.bot_response,
+            Interaction.sentiment,
+            Conversation.user_email,
+            Conversation.user_name
+        ).join(Conversation, Interaction.conversation_id == Conversation.id).order_by(Interaction.id)
+        if cursor is not None:
+            query = query.filter(Interaction.id > cursor)
         
-        return response_data
+        # yield_per streams rows from a server-side cursor in fixed-size batches
+        for row in query.yield_per(batch_size):
+            yield json.dumps({
+                "id": row.id,
+                "user_email": row.user_email,
+                "user_name": row.user_name,
+                "timestamp": row.timestamp.isoformat(),
+                "user_message": row.user_message,
+                "bot_response": row.bot_response,
+                "sentiment": row.sentiment
+            }, ensure_ascii=False) + "\n"
+    except Exception as e:
+        logger.error(f"Error streaming interactions: {str(e)}")
+    finally:
+        db.close()
+
+# Search interactions by username (substring) and/or message text (full-text)
+@router.get("/api/interactions/search")
+async def search_interactions(
+    user_name: Optional[str] = None,
+    q: Optional[str] = None,
+    limit: int = Query(500, ge=1, le=5000),
+    db: Session = Depends(get_db)
+):
+    try:
+        # Search terms are user content: debug level only
+        logger.debug(f"Searching for user_name: {user_name}, q: {q}")
+        return await run_in_db_pool(search_interactions_in_db, db, user_name, q, limit)
     except Exception as e:
         logger.error(f"Error searching interactions: {str(e)}")
         return []  # Return empty list instead of raising an exception
 
-# Get interactions for a specific user by email
-async def get_interactions(user_email: str, db: Session = Depends(get_db)):
-    try:
-        # Get user's conversation by email
-        conversation = db.query(Conversation).filter(Conversation.user_email == user_email).first()
-        
-        if not conversation:
-            raise HTTPException(status_code=404, detail="No interactions found for this user.")
-        
-        # Get all interactions associated with the conversation
-        interactions = db.query(Interaction).filter(Interaction.conversation_id == conversation.id).all()
+def search_interactions_in_db(db: Session, user_name: Optional[str], q: Optional[str] = None, limit: int = 500):
+    if not user_name and not q:
+        return []
+    
+    if not q:
+        # Get all conversations that match the username, backed by the trigram/FTS indexes
+        conversations = db.query(Conversation).options(
+            selectinload(Conversation.interactions)
+        ).filter(user_name_filter(db, user_name)).limit(limit).all()
         
-        # Format the response with user's interactions
-        response_data = {
+        # Interactions ordered by most recent first
+        return [serialize_conversation(conversation, newest_first=True) for conversation in conversations]
+    
+    # Message search returns only the matching interactions, grouped by conversation
+    query = db.query(Interaction).options(
+        joinedload(Interaction.conversation)
+    ).filter(message_filter(db, q))
+    if user_name:
+        query = query.join(Conversation).filter(user_name_filter(db, user_name))
+    matches = query.order_by(Interaction.timestamp.desc()).limit(limit).all()
+    
+    grouped = {}
+    for interaction in matches:
+        conversation = interaction.conversation
+        entry = grouped.setdefault(conversation.id, {
             "user_email": conversation.user_email,
             "user_name": conversation.user_name,
-            "interactions": [
-                {
-                    "timestamp": interaction.timestamp.isoformat(),
-                    "user_message": interaction.user_message,
-                    "bot_response": interaction.bot_response
-                }
-                for interaction in interactions
-            ]
-        }
-        
-        return response_data
+            "interactions": []
+        })
+        entry["interactions"].append({
+            "timestamp": interaction.timestamp.isoformat(),
+            "user_message": interaction.user_message,
+            "bot_response": interaction.bot_response,
+            "sentiment": interaction.sentiment
+        })
+    return list(grouped.values())
+
+# Aggregated dashboard stats, maintained incrementally as interactions are written
+# - bucket: activity per "hour" or "day" over the last `days`
+# - ETag is the aggregates' version; If-None-Match answers 304 without computing anything
+@router.get("/api/interactions/stats")
+async def get_interaction_stats(
+    request: Request,
+    bucket: Literal["hour", "day"] = "day",
+    days: int = Query(30, ge=1, le=366),
+    top: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    try:
+        etag, result = await run_in_db_pool(
+            get_stats_from_db, db, bucket, days, top, request.headers.get("if-none-match")
+        )
     except Exception as e:
-        logger.error(f"Error getting interactions: {str(e)}")
-        raise HTTPException(status_code=500, detail="Error getting interactions")
+        logger.error(f"Error getting interaction stats: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error getting interaction stats")
+
+    # no-cache: clients may keep the body but must revalidate it with the ETag
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if result is None:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content=result, headers=headers)
+
+def get_stats_from_db(db: Session, bucket: str, days: int, top: int, if_none_match: Optional[str] = None):
+    conn = db.connection()
+    # The window slides every hour, so the current hour is part of the tag
+    etag = f'W/"{stats.stats_version(conn)}-{stats.hour_bucket(datetime.utcnow()):%Y%m%d%H}-{bucket}-{days}-{top}"'
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return etag, None
+    return etag, stats.read_stats(conn, bucket, days, top)
 
 # Add this route after the existing routes
 @router.get("/api/interactions/{user_email}")
 async def get_user_interactions(user_email: str, db: Session = Depends(get_db)):
     try:
-        # Get user's conversation by email
-        conversation = db.query(Conversation).filter(Conversation.user_email == user_email).first()
-        
-        if not conversation:
-            raise HTTPException(status_code=404, detail="No interactions found for this user.")
-        
-        # Get all interactions associated with the conversation
-        interactions = db.query(Interaction).filter(Interaction.conversation_id == conversation.id).all()
-        
-        # Format the response with user's interactions
-        response_data = {
-            "user_email": conversation.user_email,
-            "user_name": conversation.user_name,
-            "interactions": [
-                {
-                    "timestamp": interaction.timestamp.isoformat(),
-                    "user_message": interaction.user_message,
-                    "bot_response": interaction.bot_response
-                }
-                for interaction in interactions
-            ]
-        }
-        
-        return response_data
+        response_data = await run_in_db_pool(get_user_interactions_from_db, db, user_email)
     except Exception as e:
         logger.error(f"Error getting interactions: {str(e)}")
-        raise HTTPException(status_code=500, detail="Error getting interactions")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Error getting interactions")
+    
+    if response_data is None:
+        raise HTTPException(status_code=404, detail="No interactions found for this user.")
+    return response_data
+
+def get_user_interactions_from_db(db: Session, user_email: str):
+    # Get user's conversation and its interactions by email
+    conversation = db.query(Conversation).options(
+        selectinload(Conversation.interactions)
+    ).filter(Conversation.user_email == user_email).first()
+    
+    if not conversation:
+        return None
+    return serialize_conversation(conversation)
@@ -0,0 +1,25 @@
+from fastapi import HTTPException, Request
+
+
+def _require_ready(request: Request):
+    if not request.app.state.ready:
+        raise HTTPException(
+            status_code=503,
+            detail="Service is starting up",
+            headers={"Retry-After": "5"}
+        )
+
+
+# Shared model instances, created once by the lifespan in core/events.py
+def get_chat_service(request: Request):
+    _require_ready(request)
+    return request.app.state.chat_service
+
+
+def get_scheduler(request: Request):
+    _require_ready(request)
+    return request.app.state.scheduler
+
+
+def get_admission(request: Request):
+    return request.app.state.admission
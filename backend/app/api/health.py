@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+
+router = APIRouter()
+
+# Liveness: the process is up and serving requests
+@router.get("/health/live")
+async def live():
+    return {"status": "ok"}
+
+# Readiness: models are loaded and warmed up
+@router.get("/health/ready")
+async def ready(request: Request):
+    if request.app.state.ready:
+        return {"status": "ready"}
+    content = {"status": "starting"}
+    if request.app.state.startup_error:
+        content = {"status": "error", "detail": request.app.state.startup_error}
+    return JSONResponse(status_code=503, content=content)
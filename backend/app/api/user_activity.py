@@ -1,5 +1,6 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
+from ..services.interaction_logger import InteractionRecord, interaction_log
 import logging
 
 logger = logging.getLogger(__name__)
@@ -13,11 +14,20 @@ class UserActivity(BaseModel):
 async def log_user_activity(activity: UserActivity):
     try:
         logger.info(f"User activity received: {activity.email}, {activity.name}")
-        return {"message": "User activity logged successfully"}
+        # Registers the user's conversation through the background writer
+        queued = interaction_log.log(InteractionRecord(user_email=activity.email, user_name=activity.name))
     except Exception as e:
         logger.error(f"Error logging user activity: {str(e)}")
         raise HTTPException(status_code=500, detail="Error logging user activity")
 
+    if not queued:
+        raise HTTPException(
+            status_code=503,
+            detail="Interaction log queue is full",
+            headers={"Retry-After": "1"}
+        )
+    return {"message": "User activity logged successfully"}
+
 @router.options("/api/log_user_activity")
 async def options_log_user_activity():
     return {} 
\ No newline at end of file
@@ -0,0 +1,125 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Paths are relative to the backend folder, like the rest of the app
+DATA_DIR = os.getenv("DATA_DIR", "app/data")
+CACHE_DIR = os.getenv("CACHE_DIR", "app/cache")
+
+# Embedding model used for retrieval
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2")
+
+# Vector store backend: numpy (exact), faiss-flat, faiss-hnsw or faiss-ivf
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "numpy")
+HNSW_M = int(os.getenv("HNSW_M", 32))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", 200))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", 64))
+IVF_NLIST = int(os.getenv("IVF_NLIST", 1024))
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", 16))
+
+# Micro-batching of /api/chat generations
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", 8))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", 20))
+BATCH_MAX_QUEUE_DEPTH = int(os.getenv("BATCH_MAX_QUEUE_DEPTH", 64))
+
+# Admission control for /api/chat and /api/chat/stream: at most CHAT_MAX_CONCURRENT
+# generations queued or running, USER_RATE_PER_MINUTE per user (bursts of USER_BURST,
+# 0 = unlimited) and CHAT_DEADLINE_S per request, after which decoding stops (0 = none)
+CHAT_MAX_CONCURRENT = int(os.getenv("CHAT_MAX_CONCURRENT", 64))
+USER_RATE_PER_MINUTE = float(os.getenv("USER_RATE_PER_MINUTE", 20))
+USER_BURST = int(os.getenv("USER_BURST", 5))
+CHAT_DEADLINE_S = float(os.getenv("CHAT_DEADLINE_S", 120))
+
+# Worker pools keeping blocking work off the event loop
+MODEL_WORKERS = int(os.getenv("MODEL_WORKERS", 1))
+DB_WORKERS = int(os.getenv("DB_WORKERS", 8))
+# Server processes started by `python -m app.main`; above 1 the models are loaded once
+# and the workers are forked from that process, sharing its memory copy-on-write
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", 1))
+
+# Response cache: exact LRU plus semantic matches above the cosine threshold
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", 1024))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", 3600))
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", 0.95))
+
+# Write-behind interaction logging
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", 500))
+LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", 1.0))
+
+# Generation model and how it runs: auto, fp16, fp32, bf16, int8 or onnx.
+# auto keeps fp16 on CUDA and uses fp32 on CPU-only hosts.
+LLM_MODEL_NAME = os.getenv("LLM_MODEL_NAME", "TinyLlama/TinyLlama-1.1B-Chat-v1.0")
+INFERENCE_MODE = os.getenv("INFERENCE_MODE", "auto")
+# 0 leaves torch's defaults untouched
+TORCH_NUM_THREADS = int(os.getenv("TORCH_NUM_THREADS", 0))
+TORCH_INTEROP_THREADS = int(os.getenv("TORCH_INTEROP_THREADS", 0))
+
+# Knowledge-base chunking, in tokens of the embedding model's tokenizer.
+# all-MiniLM-L6-v2 truncates at 256 tokens, so chunks stay below that.
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", 200))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", 40))
+
+# Prompt budget: the answer always gets MAX_NEW_TOKENS and retrieved context fills
+# the rest of LLM_CONTEXT_TOKENS. Prefill cost grows with the prompt, so the default
+# stays well below TinyLlama's 2048; 0 opts into the model's max_position_embeddings.
+MAX_NEW_TOKENS = int(os.getenv("MAX_NEW_TOKENS", 256))
+LLM_CONTEXT_TOKENS = int(os.getenv("LLM_CONTEXT_TOKENS", 1024))
+# past_key_values of the static system prompt, one entry per (chat_name, company)
+PREFIX_CACHE_ENABLED = os.getenv("PREFIX_CACHE_ENABLED", "true").lower() == "true"
+PREFIX_CACHE_SIZE = int(os.getenv("PREFIX_CACHE_SIZE", 8))
+
+# Conversation memory, per user_email: the latest turns (up to MEMORY_WINDOW_TOKENS,
+# each cut to MEMORY_TURN_TOKENS) enter the prompt verbatim. Older ones are compacted
+# into a summary of their topics (MEMORY_SUMMARY_TOKENS) and up to MEMORY_ARCHIVE_TURNS
+# embedded turns, of which the MEMORY_RECALL_TURNS closest to the question come back.
+# Only turns related to the question (MEMORY_RECALL_SIMILARITY) enter the prompt, and
+# answers built on history skip the response cache. MEMORY_CONVERSATIONS stay hot in
+# memory; the rest are rebuilt from the interactions table, and with several workers
+# every conversation is rebuilt after MEMORY_REFRESH_S (0 = never).
+CONVERSATION_MEMORY_ENABLED = os.getenv("CONVERSATION_MEMORY_ENABLED", "true").lower() == "true"
+MEMORY_CONVERSATIONS = int(os.getenv("MEMORY_CONVERSATIONS", 1000))
+MEMORY_WINDOW_TOKENS = int(os.getenv("MEMORY_WINDOW_TOKENS", 192))
+MEMORY_TURN_TOKENS = int(os.getenv("MEMORY_TURN_TOKENS", 96))
+MEMORY_SUMMARY_TOKENS = int(os.getenv("MEMORY_SUMMARY_TOKENS", 48))
+MEMORY_ARCHIVE_TURNS = int(os.getenv("MEMORY_ARCHIVE_TURNS", 50))
+MEMORY_RECALL_TURNS = int(os.getenv("MEMORY_RECALL_TURNS", 2))
+MEMORY_RECALL_SIMILARITY = float(os.getenv("MEMORY_RECALL_SIMILARITY", 0.3))
+# Messages of at most this many words are read as continuations of the last turn
+MEMORY_FOLLOW_UP_WORDS = int(os.getenv("MEMORY_FOLLOW_UP_WORDS", 4))
+MEMORY_REFRESH_S = float(os.getenv("MEMORY_REFRESH_S", 60 if WEB_WORKERS > 1 else 0))
+
+# Per-company knowledge bases: app/data/*.json belongs to the company named in its
+# metadata (DEFAULT_COMPANY if none) and each app/data/<company>/ folder is another one.
+# Indexes beyond TENANT_INDEX_MEMORY_MB are searched from their mmap'd files. With
+# several workers they all stay mmap'd by default, so the page cache holds one copy.
+DEFAULT_COMPANY = os.getenv("DEFAULT_COMPANY", "Promtior")
+TENANT_INDEX_MEMORY_MB = float(os.getenv("TENANT_INDEX_MEMORY_MB", 0 if WEB_WORKERS > 1 else 512))
+
+# Hybrid retrieval: BM25 and dense candidates fused with reciprocal rank fusion,
+# optionally reranked by a cross-encoder (empty RERANK_MODEL_NAME disables it).
+HYBRID_RETRIEVAL = os.getenv("HYBRID_RETRIEVAL", "true").lower() == "true"
+RETRIEVAL_CANDIDATES = int(os.getenv("RETRIEVAL_CANDIDATES", 20))
+RRF_K = int(os.getenv("RRF_K", 60))
+RERANK_MODEL_NAME = os.getenv("RERANK_MODEL_NAME", "")
+RERANK_TOP_N = int(os.getenv("RERANK_TOP_N", 10))
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", 50))
+
+# Query-embedding cache, bounded in MB (0 disables it); float16 halves its footprint
+QUERY_CACHE_MAX_MB = float(os.getenv("QUERY_CACHE_MAX_MB", 32))
+QUERY_CACHE_DTYPE = os.getenv("QUERY_CACHE_DTYPE", "float16")
+
+# Speculative decoding: off, prompt_lookup (drafts copied from n-grams of the prompt,
+# i.e. the retrieved context) or draft (DRAFT_MODEL_NAME proposes, the chat model verifies).
+# Only single-request generations use it; micro-batches decode normally.
+SPECULATIVE_DECODING = os.getenv("SPECULATIVE_DECODING", "off")
+PROMPT_LOOKUP_TOKENS = int(os.getenv("PROMPT_LOOKUP_TOKENS", 10))
+DRAFT_MODEL_NAME = os.getenv("DRAFT_MODEL_NAME", "")
+
+# Observability: per-stage timings go to /metrics; SERVER_TIMING_ENABLED also returns
+# them in a Server-Timing header. Message contents are logged only for a
+# LOG_PAYLOAD_SAMPLE_RATE share of requests (0 = never).
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "false").lower() == "true"
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", 0.0))
@@ -1,15 +1,156 @@
-from ..services.embedding_service import EmbeddingService
+import asyncio
 import logging
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI
+
+from . import executors, metrics
+from ..db.db_connection import engine
+from ..db.db_models import Base
+from ..db.migrations import run_migrations
+from ..services.admission import AdmissionController
+from ..services.interaction_logger import interaction_log
 
 logger = logging.getLogger(__name__)
 
-async def startup_event(app):
-    """Evento que se ejecuta al iniciar la aplicación"""
+
+def init_db():
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+
+
+# Services loaded by the pre-fork server before it starts the workers (see core/prefork.py)
+_preloaded_chat_service = None
+
+
+def load_services(warm_up: bool = True):
+    """Carga cada modelo una sola vez y lo precalienta"""
+    from ..services.chat_service import ChatService
+    from ..services.embedding_service import EmbeddingService
+
+    embedding_service = EmbeddingService()
+    chat_service = ChatService(embedding_service=embedding_service)
+    if warm_up:
+        chat_service.warm_up()
+    else:
+        chat_service._load_model()
+    return chat_service
+
+
+def preload() -> None:
+    """Prepara la base y carga los modelos en el proceso padre, antes del fork
+
+    Los workers heredan los pesos y los índices y comparten esas páginas
+    mientras nadie las escriba. El precalentamiento (que crea hilos y cachés
+    propios) queda para cada worker.
+    """
+    global _preloaded_chat_service
+    init_db()
+    # Connections must not be shared across processes; each worker opens its own
+    engine.dispose()
+    _preloaded_chat_service = load_services(warm_up=False)
+
+
+def register_metrics(chat_service, scheduler) -> None:
+    """Expone en /metrics las colas y los aciertos de caché, leídos al exportar"""
+    metrics.gauge("inference_queue_depth", "Peticiones esperando lote de inferencia", fn=lambda: scheduler.depth)
+    embedding_service = chat_service.embedding_service
+    metrics.gauge(
+        "tenant_index_resident_bytes", "Bytes de índices por empresa residentes en RAM",
+        fn=lambda: embedding_service.tenants.resident_bytes
+    )
+    metrics.counter(
+        "tenant_index_spills_total", "Índices de empresa bajados a mmap por falta de memoria",
+        fn=lambda: embedding_service.tenants.spills
+    )
+    caches = []
+    if chat_service.response_cache is not None:
+        response_cache = chat_service.response_cache
+        caches += [
+            ("response", "exact_hit", lambda: response_cache.exact_hits),
+            ("response", "semantic_hit", lambda: response_cache.semantic_hits),
+            ("response", "miss", lambda: response_cache.misses),
+        ]
+    if embedding_service.query_cache is not None:
+        query_cache = embedding_service.query_cache
+        caches += [
+            ("query_embedding", "hit", lambda: query_cache.hits),
+            ("query_embedding", "miss", lambda: query_cache.misses),
+        ]
+    if chat_service.prefix_cache is not None:
+        prefix_cache = chat_service.prefix_cache
+        caches += [
+            ("prefix_kv", "hit", lambda: prefix_cache.hits),
+            ("prefix_kv", "miss", lambda: prefix_cache.misses),
+        ]
+    if chat_service.memory is not None:
+        memory = chat_service.memory
+        caches += [
+            ("conversation_memory", "hit", lambda: memory.hits),
+            ("conversation_memory", "miss", lambda: memory.misses),
+        ]
+        metrics.gauge("conversation_memory_conversations", "Conversaciones en la memoria caliente", fn=lambda: memory.size)
+    for cache, result, fn in caches:
+        metrics.counter("cache_lookups_total", "Consultas a cada caché por resultado", fn=fn, cache=cache, result=result)
+
+
+async def startup_event(app: FastAPI):
+    """Carga y precalienta los modelos; la app pasa a estar lista al terminar"""
+    from ..services.inference_scheduler import InferenceScheduler
+
     try:
         logger.info("Iniciando servicios...")
-        embedding_service = EmbeddingService()
-        app.state.embedding_service = embedding_service
+        if _preloaded_chat_service is not None:
+            chat_service = _preloaded_chat_service
+            await executors.run_in_model_pool(chat_service.warm_up)
+        else:
+            chat_service = await executors.run_in_model_pool(load_services)
+        scheduler = InferenceScheduler(chat_service)
+        scheduler.start()
+        register_metrics(chat_service, scheduler)
+        app.state.chat_service = chat_service
+        app.state.embedding_service = chat_service.embedding_service
+        app.state.scheduler = scheduler
+        app.state.ready = True
         logger.info("Servicios iniciados correctamente")
     except Exception as e:
-        logger.error(f"Error al iniciar servicios: {str(e)}")
-        raise e
\ No newline at end of file
+        app.state.startup_error = str(e)
+        logger.error(f"Error al iniciar servicios: {str(e)}", exc_info=True)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.ready = False
+    app.state.startup_error = None
+    app.state.chat_service = None
+    app.state.embedding_service = None
+    app.state.scheduler = None
+
+    if _preloaded_chat_service is None:
+        await executors.run_in_db_pool(init_db)
+    await interaction_log.start()
+    metrics.gauge("interaction_log_queue_depth", "Interacciones esperando escritura", fn=lambda: interaction_log.depth)
+    metrics.counter("interaction_log_dropped_total", "Interacciones descartadas", fn=lambda: interaction_log.dropped)
+    admission = app.state.admission = AdmissionController()
+    metrics.gauge("chat_active_generations", "Generaciones admitidas en curso", fn=lambda: admission.active)
+    metrics.counter(
+        "chat_rejected_total", "Peticiones de chat rechazadas por control de admisión",
+        fn=lambda: admission.rejected_overloaded, reason="overloaded"
+    )
+    metrics.counter(
+        "chat_rejected_total", "Peticiones de chat rechazadas por control de admisión",
+        fn=lambda: admission.rejected_rate_limited, reason="rate_limited"
+    )
+
+    # Models load in the background so /health/live answers while they warm up
+    loading = asyncio.create_task(startup_event(app))
+    try:
+        yield
+    finally:
+        app.state.ready = False
+        if not loading.done():
+            loading.cancel()
+        if app.state.scheduler is not None:
+            app.state.scheduler.stop(timeout=30)
+        await interaction_log.stop()
+        executors.shutdown()
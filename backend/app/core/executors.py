@@ -0,0 +1,53 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Tuple
+
+from . import config, tracing
+
+def _new_pools() -> Tuple[ThreadPoolExecutor, ThreadPoolExecutor, ThreadPoolExecutor]:
+    return (
+        # Model inference (generation, encodes, index builds) runs on its own bounded pool so
+        # it can't starve DB work or the event loop; torch releases the GIL inside its kernels.
+        ThreadPoolExecutor(max_workers=config.MODEL_WORKERS, thread_name_prefix="model"),
+        ThreadPoolExecutor(max_workers=config.DB_WORKERS, thread_name_prefix="db"),
+        # Corpus re-ingestion gets a single thread of its own: rebuilds are serialized and
+        # never hold up generation while they re-embed.
+        ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest"),
+    )
+
+
+# Threads are only started on first use; always reach the pools through this module,
+# since shutdown() replaces them
+model_executor, db_executor, ingest_executor = _new_pools()
+
+
+def _in_context(fn: Callable[..., Any], *args, **kwargs) -> Callable[[], Any]:
+    # run_in_executor doesn't carry contextvars over; spans in the pool still reach the request's trace
+    return functools.partial(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+async def run_in_model_pool(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(model_executor, _in_context(fn, *args, **kwargs))
+
+
+async def run_in_db_pool(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    loop = asyncio.get_running_loop()
+    with tracing.span("db"):
+        return await loop.run_in_executor(db_executor, _in_context(fn, *args, **kwargs))
+
+
+async def run_in_ingest_pool(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(ingest_executor, _in_context(fn, *args, **kwargs))
+
+
+def shutdown() -> None:
+    """Espera el trabajo en curso y deja pools nuevos para el próximo lifespan del proceso"""
+    global model_executor, db_executor, ingest_executor
+    pools = (model_executor, db_executor, ingest_executor)
+    model_executor, db_executor, ingest_executor = _new_pools()
+    for pool in pools:
+        pool.shutdown(wait=True)
@@ -0,0 +1,152 @@
+import bisect
+import math
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Latency buckets in seconds, Prometheus style
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Histogram:
+    """Histograma acumulativo en memoria, seguro entre hilos"""
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS, labels: Labels = ()):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            cumulative: List[int] = []
+            total = 0
+            for count in self._counts:
+                total += count
+                cumulative.append(total)
+            return {
+                "buckets": list(zip(self.buckets + (float("inf"),), cumulative)),
+                "sum": self._sum,
+                "count": self._count,
+            }
+
+    def samples(self) -> List[str]:
+        snapshot = self.snapshot()
+        lines = [
+            f"{self.name}_bucket{_format_labels(self.labels, ('le', _format_value(bound)))} {count}"
+            for bound, count in snapshot["buckets"]
+        ]
+        lines.append(f"{self.name}_sum{_format_labels(self.labels)} {_format_value(snapshot['sum'])}")
+        lines.append(f"{self.name}_count{_format_labels(self.labels)} {snapshot['count']}")
+        return lines
+
+
+class _Value:
+    """Contador o gauge; con fn, el valor se lee al exportar (p. ej. profundidad de una cola)"""
+
+    def __init__(self, kind: str, name: str, description: str, labels: Labels = (), fn: Optional[Callable[[], float]] = None):
+        self.kind = kind
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.fn = fn
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    def set(self, value: float) -> None:
+        with self._lock:
+            self._value = value
+
+    @property
+    def value(self) -> float:
+        if self.fn is not None:
+            try:
+                return float(self.fn())
+            except Exception:
+                return float("nan")
+        return self._value
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labels)} {_format_value(self.value)}"]
+
+
+_registry: Dict[Tuple[str, Labels], object] = {}
+_registry_lock = threading.Lock()
+
+
+def _get_or_create(name: str, labels: Dict[str, str], factory):
+    key = (name, tuple(sorted(labels.items())))
+    with _registry_lock:
+        if key not in _registry:
+            _registry[key] = factory(key[1])
+        return _registry[key]
+
+
+def histogram(name: str, description: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS, **labels: str) -> Histogram:
+    """Devuelve el histograma registrado con ese nombre y etiquetas, creándolo si no existe"""
+    return _get_or_create(name, labels, lambda key: Histogram(name, description, buckets, key))
+
+
+def counter(name: str, description: str, fn: Optional[Callable[[], float]] = None, **labels: str) -> _Value:
+    metric = _get_or_create(name, labels, lambda key: _Value("counter", name, description, key, fn))
+    if fn is not None:
+        # Re-registering (a new app instance) points the series at the live object
+        metric.fn = fn
+    return metric
+
+
+def gauge(name: str, description: str, fn: Optional[Callable[[], float]] = None, **labels: str) -> _Value:
+    metric = _get_or_create(name, labels, lambda key: _Value("gauge", name, description, key, fn))
+    if fn is not None:
+        metric.fn = fn
+    return metric
+
+
+def render() -> str:
+    """Todas las métricas en el formato de texto de Prometheus (0.0.4)"""
+    with _registry_lock:
+        metrics = list(_registry.values())
+    families: Dict[str, List[object]] = {}
+    for metric in metrics:
+        families.setdefault(metric.name, []).append(metric)
+
+    lines = []
+    for name, family in families.items():
+        lines.append(f"# HELP {name} {family[0].description}")
+        lines.append(f"# TYPE {name} {family[0].kind}")
+        for metric in family:
+            lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,102 @@
+import gc
+import logging
+import os
+import signal
+import socket
+import time
+from typing import Dict
+
+from . import config, events
+
+logger = logging.getLogger(__name__)
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(app, sock: socket.socket, workers: int) -> None:
+    import torch
+    import uvicorn
+
+    # Split the cores between workers unless the thread count is pinned
+    if config.TORCH_NUM_THREADS <= 0:
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) // workers))
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    server = uvicorn.Server(uvicorn.Config(app, log_level="info"))
+    server.run(sockets=[sock])
+
+
+def _spawn(app, sock: socket.socket, workers: int) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            _run_worker(app, sock, workers)
+        except BaseException:
+            logger.exception("El worker terminó con error")
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def serve(app, host: str, port: int, workers: int) -> None:
+    """Servidor pre-fork: carga los modelos una vez y reparte el socket entre workers
+
+    Los workers nacen con fork() del proceso que ya cargó los pesos y abrió
+    los índices, así que comparten esas páginas copy-on-write; cada uno
+    precalienta y mantiene sus propios cachés. Un worker que muere se
+    reemplaza con otro fork del padre, que nunca atiende peticiones.
+    """
+    # Rust tokenizers would warn and disable their pool in every child anyway
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+    logger.info(f"Precargando modelos para {workers} workers...")
+    events.preload()
+    # Objects created so far are never collected again: the GC would otherwise write
+    # to their headers in every worker and unshare those pages
+    gc.collect()
+    gc.freeze()
+
+    sock = _bind(host, port)
+    children: Dict[int, float] = {}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for _ in range(workers):
+        children[_spawn(app, sock, workers)] = time.monotonic()
+    logger.info(f"Escuchando en {host}:{port} con {workers} workers (pids {sorted(children)})")
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        started = children.pop(pid, None)
+        if started is None or stopping:
+            continue
+        logger.warning(f"El worker {pid} terminó (estado {status}); iniciando otro")
+        # Don't spin if workers die right after starting
+        if time.monotonic() - started < 1:
+            time.sleep(1)
+        children[_spawn(app, sock, workers)] = time.monotonic()
+    sock.close()
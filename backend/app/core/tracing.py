@@ -0,0 +1,83 @@
+import contextvars
+import logging
+import random
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence
+
+from . import config, metrics
+
+
+class Trace:
+    """Tiempos por etapa de una petición, para el header Server-Timing"""
+    __slots__ = ("start", "stages")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def server_timing(self) -> str:
+        entries = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in self.stages.items()]
+        entries.append(f"total;dur={(time.perf_counter() - self.start) * 1000:.1f}")
+        return ", ".join(entries)
+
+
+# Traces of the request(s) the current code works for; a micro-batch serves several
+_active: contextvars.ContextVar[Sequence[Trace]] = contextvars.ContextVar("traces", default=())
+
+
+def start_trace() -> Trace:
+    trace = Trace()
+    _active.set((trace,))
+    return trace
+
+
+def current_trace() -> Optional[Trace]:
+    traces = _active.get()
+    return traces[0] if len(traces) == 1 else None
+
+
+@contextmanager
+def use_traces(traces: List[Optional[Trace]]) -> Iterator[None]:
+    """Atribuye los spans del bloque a todas esas peticiones (p. ej. las de un lote)"""
+    token = _active.set(tuple(trace for trace in traces if trace is not None))
+    try:
+        yield
+    finally:
+        _active.reset(token)
+
+
+_stage_histograms: Dict[str, metrics.Histogram] = {}
+
+
+def record(stage: str, seconds: float) -> None:
+    histogram = _stage_histograms.get(stage)
+    if histogram is None:
+        histogram = _stage_histograms.setdefault(stage, metrics.histogram(
+            "chat_stage_duration_seconds",
+            "Duración de cada etapa del procesamiento de una petición",
+            stage=stage
+        ))
+    histogram.observe(seconds)
+    for trace in _active.get():
+        trace.add(stage, seconds)
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Mide el bloque: histograma por etapa y, si hay, las trazas activas"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - start)
+
+
+def log_payload(logger: logging.Logger, event: str, /, **payload) -> None:
+    """Registra contenido de mensajes solo para una muestra de LOG_PAYLOAD_SAMPLE_RATE"""
+    if config.LOG_PAYLOAD_SAMPLE_RATE > 0 and random.random() < config.LOG_PAYLOAD_SAMPLE_RATE:
+        details = ", ".join(f"{key}={value!r}" for key, value in payload.items())
+        logger.info(f"{event} [sampled] {details}")
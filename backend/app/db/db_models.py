@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, TIMESTAMP
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, TIMESTAMP, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .db_connection import Base
@@ -7,7 +7,7 @@ class Conversation(Base):
     __tablename__ = "conversations"
 
     id = Column(Integer, primary_key=True)
-    user_email = Column(String(255), nullable=False)
+    user_email = Column(String(255), nullable=False, unique=True, index=True)
     user_name = Column(String(255), nullable=False)
     created_at = Column(TIMESTAMP, default=datetime.utcnow)
     
@@ -22,6 +22,54 @@ class Interaction(Base):
     timestamp = Column(TIMESTAMP, nullable=False)
     user_message = Column(Text, nullable=False)
     bot_response = Column(Text, nullable=False)
+    # positive / negative / neutral, classified when the interaction is written
+    sentiment = Column(String(8))
     
     # Relationship with the conversation
-    conversation = relationship("Conversation", back_populates="interactions")
\ No newline at end of file
+    conversation = relationship("Conversation", back_populates="interactions")
+
+    # Per-conversation history in time order; search indexes live in migrations.py
+    __table_args__ = (
+        Index("ix_interactions_conversation_id_timestamp", "conversation_id", "timestamp"),
+    )
+
+# Aggregates for /api/interactions/stats, updated in the same transaction that
+# writes each batch of interactions (see db/stats.py)
+class StatsSummary(Base):
+    __tablename__ = "interaction_stats_summary"
+
+    id = Column(Integer, primary_key=True)
+    conversations = Column(Integer, nullable=False, default=0)
+    interactions = Column(Integer, nullable=False, default=0)
+    positive = Column(Integer, nullable=False, default=0)
+    negative = Column(Integer, nullable=False, default=0)
+    neutral = Column(Integer, nullable=False, default=0)
+    # Bumped on every change; the stats ETag
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(TIMESTAMP)
+
+class HourlyStats(Base):
+    __tablename__ = "interaction_stats_hourly"
+
+    bucket = Column(TIMESTAMP, primary_key=True)
+    interactions = Column(Integer, nullable=False, default=0)
+    positive = Column(Integer, nullable=False, default=0)
+    negative = Column(Integer, nullable=False, default=0)
+    neutral = Column(Integer, nullable=False, default=0)
+
+class ConversationStats(Base):
+    __tablename__ = "conversation_stats"
+
+    conversation_id = Column(Integer, ForeignKey("conversations.id", ondelete="CASCADE"), primary_key=True)
+    interactions = Column(Integer, nullable=False, default=0)
+    positive = Column(Integer, nullable=False, default=0)
+    negative = Column(Integer, nullable=False, default=0)
+    neutral = Column(Integer, nullable=False, default=0)
+    last_interaction_at = Column(TIMESTAMP)
+    last_sentiment = Column(String(8))
+
+    # Top users and recently active users without scanning every conversation
+    __table_args__ = (
+        Index("ix_conversation_stats_interactions", "interactions"),
+        Index("ix_conversation_stats_last_interaction_at", "last_interaction_at"),
+    )
@@ -0,0 +1,141 @@
+"""Idempotent schema migrations applied on startup after create_all.
+
+create_all only creates missing tables, so columns and indexes added to
+existing tables, dialect-specific search structures (pg_trgm / tsvector GIN
+indexes on Postgres, FTS5 tables on SQLite) and the seeding of the stats
+aggregates are applied here, in order, once per database. Applied versions
+are recorded in the schema_migrations table.
+
+Run manually with:
+
+    python -m app.db.migrations
+"""
+import logging
+from datetime import datetime
+from typing import Callable, List, Tuple
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+logger = logging.getLogger(__name__)
+
+# Expression shared by the Postgres GIN index and the queries in search.py
+PG_MESSAGE_TSVECTOR = "to_tsvector('simple', user_message || ' ' || bot_response)"
+
+
+def _unique_user_email(conn: Connection, dialect: str) -> None:
+    # Merge duplicate conversations into the oldest one before enforcing uniqueness
+    conn.execute(text("""
+        UPDATE interactions SET conversation_id = (
+            SELECT MIN(c2.id) FROM conversations c1
+            JOIN conversations c2 ON c2.user_email = c1.user_email
+            WHERE c1.id = interactions.conversation_id
+        )
+    """))
+    conn.execute(text("""
+        DELETE FROM conversations WHERE id NOT IN (
+            SELECT MIN(id) FROM conversations GROUP BY user_email
+        )
+    """))
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_conversations_user_email ON conversations (user_email)"
+    ))
+
+
+def _interaction_history_index(conn: Connection, dialect: str) -> None:
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_interactions_conversation_id_timestamp "
+        "ON interactions (conversation_id, timestamp)"
+    ))
+
+
+def _search_indexes(conn: Connection, dialect: str) -> None:
+    if dialect == "postgresql":
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_conversations_user_name_trgm "
+            "ON conversations USING gin (user_name gin_trgm_ops)"
+        ))
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_interactions_messages_fts "
+            f"ON interactions USING gin ({PG_MESSAGE_TSVECTOR})"
+        ))
+    elif dialect == "sqlite":
+        # External-content FTS5 tables kept in sync with triggers
+        conn.execute(text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS conversations_fts USING fts5("
+            "user_name, content='conversations', content_rowid='id', tokenize='trigram')"
+        ))
+        conn.execute(text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS interactions_fts USING fts5("
+            "user_message, bot_response, content='interactions', content_rowid='id')"
+        ))
+        for table, columns in (
+            ("conversations", ("user_name",)),
+            ("interactions", ("user_message", "bot_response")),
+        ):
+            cols = ", ".join(columns)
+            new_cols = ", ".join(f"new.{c}" for c in columns)
+            old_cols = ", ".join(f"old.{c}" for c in columns)
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {table}_fts_ai AFTER INSERT ON {table} BEGIN "
+                f"INSERT INTO {table}_fts(rowid, {cols}) VALUES (new.id, {new_cols}); END"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {table}_fts_ad AFTER DELETE ON {table} BEGIN "
+                f"INSERT INTO {table}_fts({table}_fts, rowid, {cols}) VALUES ('delete', old.id, {old_cols}); END"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {table}_fts_au AFTER UPDATE ON {table} BEGIN "
+                f"INSERT INTO {table}_fts({table}_fts, rowid, {cols}) VALUES ('delete', old.id, {old_cols}); "
+                f"INSERT INTO {table}_fts(rowid, {cols}) VALUES (new.id, {new_cols}); END"
+            ))
+            conn.execute(text(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')"))
+
+
+def _interaction_stats(conn: Connection, dialect: str) -> None:
+    # Tables created before the column existed; create_all adds it on fresh databases
+    columns = {column["name"] for column in inspect(conn).get_columns("interactions")}
+    if "sentiment" not in columns:
+        conn.execute(text("ALTER TABLE interactions ADD COLUMN sentiment VARCHAR(8)"))
+    # Classify existing interactions and seed the aggregates the log writer keeps up to date
+    from .stats import rebuild
+    rebuild(conn)
+
+
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection, str], None]]] = [
+    (1, "unique_user_email", _unique_user_email),
+    (2, "interaction_history_index", _interaction_history_index),
+    (3, "search_indexes", _search_indexes),
+    (4, "interaction_stats", _interaction_stats),
+]
+
+
+def run_migrations(engine: Engine) -> None:
+    dialect = engine.dialect.name
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version INTEGER PRIMARY KEY, name VARCHAR(255) NOT NULL, applied_at TIMESTAMP NOT NULL)"
+        ))
+        applied = {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+    for version, name, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        logger.info(f"Applying migration {version}: {name}")
+        with engine.begin() as conn:
+            migrate(conn, dialect)
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, name, applied_at) VALUES (:v, :n, :t)"),
+                {"v": version, "n": name, "t": datetime.utcnow()}
+            )
+
+
+if __name__ == "__main__":
+    from .db_connection import engine
+    from .db_models import Base
+
+    logging.basicConfig(level=logging.INFO)
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
@@ -0,0 +1,43 @@
+import re
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from .db_models import Conversation, Interaction
+from .migrations import PG_MESSAGE_TSVECTOR
+
+
+def _fts5_phrase(term: str) -> str:
+    # Quote every token so user input can't inject FTS5 query syntax
+    return " ".join('"' + token.replace('"', '""') + '"' for token in term.split())
+
+
+# Filter conversations whose user name contains the term
+def user_name_filter(db: Session, user_name: str):
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite" and len(user_name) >= 3:
+        # The trigram FTS5 table answers substring matches without scanning
+        return Conversation.id.in_(
+            text("SELECT rowid FROM conversations_fts WHERE user_name LIKE :pattern")
+            .bindparams(pattern=f"%{user_name}%")
+        )
+    # On Postgres the pg_trgm GIN index serves ILIKE '%term%' directly
+    return Conversation.user_name.ilike(f"%{user_name}%")
+
+
+# Filter interactions whose message or response contains the words in the term
+def message_filter(db: Session, term: str):
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return text(f"{PG_MESSAGE_TSVECTOR} @@ plainto_tsquery('simple', :term)").bindparams(term=term)
+    if dialect == "sqlite":
+        return Interaction.id.in_(
+            text("SELECT rowid FROM interactions_fts WHERE interactions_fts MATCH :query")
+            .bindparams(query=_fts5_phrase(term))
+        )
+    words = [w for w in re.split(r"\W+", term) if w]
+    clause = None
+    for word in words:
+        match = Interaction.user_message.ilike(f"%{word}%") | Interaction.bot_response.ilike(f"%{word}%")
+        clause = match if clause is None else clause & match
+    return clause if clause is not None else Interaction.id.isnot(None)
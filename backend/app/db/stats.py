@@ -0,0 +1,225 @@
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, case, delete, func, insert, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection
+
+from .db_models import Conversation, ConversationStats, HourlyStats, Interaction, StatsSummary
+
+SENTIMENTS = ("positive", "negative", "neutral")
+SUMMARY_ID = 1
+
+
+def naive_utc(timestamp: datetime) -> datetime:
+    # Columns are naive UTC; aware timestamps (e.g. "...Z" from the client) are converted
+    if timestamp.tzinfo is not None:
+        return timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+
+def hour_bucket(timestamp: datetime) -> datetime:
+    return naive_utc(timestamp).replace(minute=0, second=0, microsecond=0)
+
+
+def _counts(sentiment: Optional[str]) -> Dict[str, int]:
+    counts = {name: 0 for name in SENTIMENTS}
+    counts[sentiment if sentiment in counts else "neutral"] = 1
+    return dict(counts, interactions=1)
+
+
+def _aggregate(interactions: Iterable[dict]) -> Tuple[Dict[datetime, dict], Dict[int, dict]]:
+    """Suma las interacciones por hora y por conversación"""
+    hourly: Dict[datetime, dict] = defaultdict(lambda: dict.fromkeys(("interactions",) + SENTIMENTS, 0))
+    conversations: Dict[int, dict] = {}
+    for row in interactions:
+        counts = _counts(row["sentiment"])
+        bucket = hourly[hour_bucket(row["timestamp"])]
+        for key, value in counts.items():
+            bucket[key] += value
+        entry = conversations.setdefault(row["conversation_id"], dict(
+            dict.fromkeys(("interactions",) + SENTIMENTS, 0), last_interaction_at=None, last_sentiment=None
+        ))
+        for key, value in counts.items():
+            entry[key] += value
+        timestamp = naive_utc(row["timestamp"])
+        if entry["last_interaction_at"] is None or timestamp >= entry["last_interaction_at"]:
+            entry["last_interaction_at"] = timestamp
+            entry["last_sentiment"] = row["sentiment"]
+    return hourly, conversations
+
+
+def _upsert(conn: Connection, model, key: str, rows: List[dict], latest: Tuple[str, ...] = ()) -> None:
+    """Suma los contadores de rows a los existentes; las columnas de latest toman el valor más reciente"""
+    if not rows:
+        return
+    table = model.__table__
+    counters = ("interactions",) + SENTIMENTS
+    dialect = conn.dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        stmt = (postgresql.insert(table) if dialect == "postgresql" else sqlite.insert(table))
+        newer = None
+        if latest:
+            newer = or_(table.c[latest[0]].is_(None), stmt.excluded[latest[0]] >= table.c[latest[0]])
+        set_ = {column: table.c[column] + stmt.excluded[column] for column in counters}
+        for column in latest:
+            set_[column] = case((newer, stmt.excluded[column]), else_=table.c[column])
+        conn.execute(stmt.on_conflict_do_update(index_elements=[key], set_=set_), rows)
+        return
+
+    # Other databases: update in place, insert what wasn't there
+    for row in rows:
+        values = {column: table.c[column] + row[column] for column in counters}
+        result = conn.execute(update(table).where(table.c[key] == row[key]).values(**values))
+        if result.rowcount == 0:
+            conn.execute(insert(table), [row])
+        elif latest:
+            conn.execute(
+                update(table)
+                .where(table.c[key] == row[key])
+                .where(or_(table.c[latest[0]].is_(None), table.c[latest[0]] <= row[latest[0]]))
+                .values(**{column: row[column] for column in latest})
+            )
+
+
+def _bump_summary(conn: Connection, conversations: int, totals: Dict[str, int]) -> None:
+    table = StatsSummary.__table__
+    values = {column: table.c[column] + totals.get(column, 0) for column in ("interactions",) + SENTIMENTS}
+    result = conn.execute(
+        update(table).where(table.c.id == SUMMARY_ID).values(
+            conversations=table.c.conversations + conversations,
+            version=table.c.version + 1,
+            updated_at=datetime.utcnow(),
+            **values
+        )
+    )
+    if result.rowcount == 0:
+        conn.execute(insert(table), [dict(
+            {column: totals.get(column, 0) for column in ("interactions",) + SENTIMENTS},
+            id=SUMMARY_ID, conversations=conversations, version=1, updated_at=datetime.utcnow()
+        )])
+
+
+def apply_batch(conn: Connection, new_conversations: int, interactions: List[dict]) -> None:
+    """Suma un lote recién escrito a los agregados, dentro de la misma transacción
+
+    interactions son las filas insertadas (conversation_id, timestamp y
+    sentiment). El costo depende del lote, no del total de interacciones.
+    """
+    if not new_conversations and not interactions:
+        return
+    hourly, conversations = _aggregate(interactions)
+    _upsert(conn, HourlyStats, "bucket", [dict(counts, bucket=bucket) for bucket, counts in hourly.items()])
+    _upsert(
+        conn, ConversationStats, "conversation_id",
+        [dict(counts, conversation_id=conversation_id) for conversation_id, counts in conversations.items()],
+        latest=("last_interaction_at", "last_sentiment")
+    )
+    totals = {column: sum(counts[column] for counts in hourly.values()) for column in ("interactions",) + SENTIMENTS}
+    _bump_summary(conn, new_conversations, totals)
+
+
+def rebuild(conn: Connection, batch_size: int = 5000) -> None:
+    """Recalcula todos los agregados desde las tablas, clasificando lo que no tenga sentimiento"""
+    from ..services.sentiment import classify_many
+
+    # Versions keep increasing across rebuilds so old ETags never match again
+    previous_version = stats_version(conn)
+    for model in (HourlyStats, ConversationStats, StatsSummary):
+        conn.execute(delete(model.__table__))
+
+    table = Interaction.__table__
+    set_sentiment = update(table).where(table.c.id == bindparam("_id")).values(sentiment=bindparam("_sentiment"))
+    rows: List[dict] = []
+    last_id = 0
+    while True:
+        # Keyset pagination keeps memory flat however large the table is
+        batch = conn.execute(
+            select(table.c.id, table.c.conversation_id, table.c.timestamp, table.c.user_message, table.c.sentiment)
+            .where(table.c.id > last_id).order_by(table.c.id).limit(batch_size)
+        ).all()
+        if not batch:
+            break
+        last_id = batch[-1].id
+        missing = [row for row in batch if row.sentiment is None]
+        if missing:
+            sentiments = classify_many([row.user_message for row in missing])
+            conn.execute(set_sentiment, [
+                {"_id": row.id, "_sentiment": sentiment} for row, sentiment in zip(missing, sentiments)
+            ])
+            classified = {row.id: sentiment for row, sentiment in zip(missing, sentiments)}
+        else:
+            classified = {}
+        rows.extend(
+            {
+                "conversation_id": row.conversation_id,
+                "timestamp": row.timestamp,
+                "sentiment": classified.get(row.id, row.sentiment),
+            }
+            for row in batch
+        )
+        if len(rows) >= batch_size:
+            apply_batch(conn, 0, rows)
+            rows = []
+    apply_batch(conn, 0, rows)
+
+    conversations = conn.execute(select(func.count()).select_from(Conversation.__table__)).scalar_one()
+    summary = StatsSummary.__table__
+    values = dict(conversations=conversations, version=previous_version + 1, updated_at=datetime.utcnow())
+    if conn.execute(update(summary).where(summary.c.id == SUMMARY_ID).values(**values)).rowcount == 0:
+        conn.execute(insert(summary), [dict(dict.fromkeys(("interactions",) + SENTIMENTS, 0), id=SUMMARY_ID, **values)])
+
+
+def stats_version(conn: Connection) -> int:
+    version = conn.execute(
+        select(StatsSummary.version).where(StatsSummary.id == SUMMARY_ID)
+    ).scalar_one_or_none()
+    return version or 0
+
+
+def read_stats(conn: Connection, bucket: str = "day", days: int = 30, top: int = 10) -> dict:
+    """Totales, actividad por hora o día en la ventana, sentimiento y usuarios más activos"""
+    summary = conn.execute(select(StatsSummary).where(StatsSummary.id == SUMMARY_ID)).mappings().first()
+    since = hour_bucket(datetime.utcnow()) - timedelta(days=days)
+
+    hourly = conn.execute(
+        select(HourlyStats).where(HourlyStats.bucket >= since).order_by(HourlyStats.bucket)
+    ).mappings().all()
+    activity: Dict[datetime, dict] = {}
+    for row in hourly:
+        key = row["bucket"] if bucket == "hour" else row["bucket"].replace(hour=0)
+        entry = activity.setdefault(key, dict.fromkeys(("interactions",) + SENTIMENTS, 0))
+        for column in entry:
+            entry[column] += row[column]
+
+    active_users = conn.execute(
+        select(func.count()).select_from(ConversationStats).where(ConversationStats.last_interaction_at >= since)
+    ).scalar_one()
+    top_users = conn.execute(
+        select(
+            Conversation.user_email, Conversation.user_name, ConversationStats.interactions,
+            ConversationStats.last_interaction_at, ConversationStats.last_sentiment
+        )
+        .join(Conversation, Conversation.id == ConversationStats.conversation_id)
+        .order_by(ConversationStats.interactions.desc(), ConversationStats.conversation_id)
+        .limit(top)
+    ).mappings().all()
+
+    return {
+        "conversations": summary["conversations"] if summary else 0,
+        "interactions": summary["interactions"] if summary else 0,
+        "active_users": active_users,
+        "sentiment": {name: summary[name] if summary else 0 for name in SENTIMENTS},
+        "bucket": bucket,
+        "since": since.isoformat(),
+        "activity": [dict(counts, bucket=key.isoformat()) for key, counts in activity.items()],
+        "top_users": [
+            dict(
+                user,
+                last_interaction_at=user["last_interaction_at"].isoformat() if user["last_interaction_at"] else None
+            )
+            for user in top_users
+        ],
+        "updated_at": summary["updated_at"].isoformat() if summary and summary["updated_at"] else None,
+    }
@@ -1,15 +1,16 @@
 from dotenv import load_dotenv
 load_dotenv()
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from .api import chat, user_activity
-from .core.events import startup_event
-from .db.db_connection import engine
-from .db.db_models import Base
+from .api import chat, health, metrics as metrics_api, user_activity
+from .core import config, metrics, tracing
+from .core.events import lifespan
 import os
+import time
 
-app = FastAPI()
+# Models, DB setup and background workers are managed by the lifespan in core/events.py
+app = FastAPI(lifespan=lifespan)
 
 # Get environment and URLs from environment variables
 ENV = os.getenv("ENV", "development")
@@ -36,29 +37,50 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
-    expose_headers=["*"],
+    # Credentialed requests ignore the wildcard, so the pager's header is listed by name
+    expose_headers=["*", "X-Next-Cursor"],
     max_age=3600
 )
 
-# Register the startup event
-@app.on_event("startup")
-async def init_db():
-    Base.metadata.create_all(bind=engine)
-
-# Add after the app is created but before the routers
-@app.on_event("startup")
-async def init_db():
-    Base.metadata.create_all(bind=engine)
+# Request latency per route, plus per-stage timings in Server-Timing when enabled
+@app.middleware("http")
+async def observe_request(request: Request, call_next):
+    start = time.perf_counter()
+    trace = tracing.start_trace()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    # The route template ("/api/interactions/{user_email}") keeps label cardinality bounded
+    metrics.histogram(
+        "http_request_duration_seconds",
+        "Duración de las peticiones HTTP hasta los headers de la respuesta",
+        method=request.method,
+        path=getattr(route, "path", "unmatched")
+    ).observe(time.perf_counter() - start)
+    if config.SERVER_TIMING_ENABLED:
+        # Streaming responses only include the stages finished before the first byte
+        response.headers["Server-Timing"] = trace.server_timing()
+    return response
 
 # Register routers
+app.include_router(health.router)
 app.include_router(chat.router)
 app.include_router(user_activity.router)
+app.include_router(metrics_api.router)
 
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))
     host = "0.0.0.0"
-    
+
+    if config.WEB_WORKERS > 1:
+        # uvicorn --workers spawns fresh interpreters that each load the models;
+        # the pre-fork server loads them once and forks the workers from there
+        import logging
+        from .core import prefork
+        logging.basicConfig(level=logging.INFO)
+        prefork.serve(app, host, port, config.WEB_WORKERS)
+        raise SystemExit(0)
+
     uvicorn.run(
         "app.main:app",
         host=host,
@@ -0,0 +1,199 @@
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Deque, Generic, Optional, TypeVar
+
+from ..core import config
+
+T = TypeVar("T")
+
+
+class OverloadedError(Exception):
+    """Se alcanzó el límite global de generaciones; el cliente debe reintentar más tarde"""
+
+
+class RateLimitedError(Exception):
+    """El usuario agotó su cuota; retry_after indica en cuántos segundos tendrá un token"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Rate limit exceeded, retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class RequestCancelledError(Exception):
+    """La petición se abandonó (el cliente se desconectó) antes de terminar"""
+
+
+class DeadlineExceededError(Exception):
+    """La petición superó su plazo en la cola o durante la generación"""
+
+
+class Cancellation:
+    """Señal cooperativa de cancelación, consultada entre tokens por generate()
+
+    Se activa al llamar a cancel() (p. ej. cuando el cliente se desconecta)
+    o al vencer el plazo de la petición.
+    """
+    __slots__ = ("_event", "deadline")
+
+    def __init__(self, timeout: Optional[float] = None):
+        self._event = threading.Event()
+        timeout = config.CHAT_DEADLINE_S if timeout is None else timeout
+        self.deadline = time.monotonic() + timeout if timeout > 0 else None
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    @property
+    def expired(self) -> bool:
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def should_stop(self) -> bool:
+        return self.cancelled or self.expired
+
+    def error(self) -> Exception:
+        if self.cancelled:
+            return RequestCancelledError("Request cancelled")
+        return DeadlineExceededError("Request deadline exceeded")
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Consume un token; si no hay, devuelve los segundos hasta el próximo"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class Admission:
+    """Plaza de generación concedida; se libera una sola vez al salir del with"""
+    __slots__ = ("_controller", "_released")
+
+    def __init__(self, controller: "AdmissionController"):
+        self._controller = controller
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._controller._release()
+
+    def __enter__(self) -> "Admission":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+
+class AdmissionController:
+    """Límite global de generaciones en curso y cuota por usuario con token buckets
+
+    Cada usuario (ChatRequest.user_email) recupera USER_RATE_PER_MINUTE
+    tokens por minuto hasta USER_BURST; las peticiones sin token reciben
+    RateLimitedError. Solo se guardan los buckets de los max_users usuarios
+    más recientes.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: Optional[int] = None,
+        rate_per_minute: Optional[float] = None,
+        burst: Optional[int] = None,
+        max_users: int = 10000
+    ):
+        self.max_concurrent = max_concurrent or config.CHAT_MAX_CONCURRENT
+        self.rate = (rate_per_minute if rate_per_minute is not None else config.USER_RATE_PER_MINUTE) / 60
+        self.burst = burst or config.USER_BURST
+        self.max_users = max_users
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.active = 0
+        self.rejected_overloaded = 0
+        self.rejected_rate_limited = 0
+
+    def admit(self, user_key: str) -> Admission:
+        with self._lock:
+            if self.active >= self.max_concurrent:
+                self.rejected_overloaded += 1
+                raise OverloadedError("Too many concurrent generations")
+            if self.rate > 0:
+                wait = self._bucket(user_key).take()
+                if wait > 0:
+                    self.rejected_rate_limited += 1
+                    raise RateLimitedError(wait)
+            self.active += 1
+        return Admission(self)
+
+    def _bucket(self, user_key: str) -> TokenBucket:
+        bucket = self._buckets.get(user_key)
+        if bucket is None:
+            bucket = self._buckets[user_key] = TokenBucket(self.rate, self.burst)
+            if len(self._buckets) > self.max_users:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(user_key)
+        return bucket
+
+    def _release(self) -> None:
+        with self._lock:
+            self.active -= 1
+
+
+class FairQueue(Generic[T]):
+    """Cola acotada que reparte los get() en round-robin entre claves (usuarios)
+
+    Con la misma interfaz que queue.Queue para el scheduler: un usuario con
+    cien peticiones encoladas no retrasa a los demás más que una vuelta.
+    """
+
+    def __init__(self, maxsize: int, key: Callable[[T], str]):
+        self.maxsize = maxsize
+        self.key = key
+        self._queues: "OrderedDict[str, Deque[T]]" = OrderedDict()
+        self._size = 0
+        self._not_empty = threading.Condition()
+
+    def qsize(self) -> int:
+        return self._size
+
+    def empty(self) -> bool:
+        return self._size == 0
+
+    def put_nowait(self, item: T) -> None:
+        with self._not_empty:
+            if self._size >= self.maxsize:
+                raise queue.Full
+            self._queues.setdefault(self.key(item), deque()).append(item)
+            self._size += 1
+            self._not_empty.notify()
+
+    def get(self, timeout: Optional[float] = None) -> T:
+        with self._not_empty:
+            if not self._not_empty.wait_for(lambda: self._size > 0, timeout):
+                raise queue.Empty
+            key, items = next(iter(self._queues.items()))
+            item = items.popleft()
+            # The served key goes to the back of the rotation
+            if items:
+                self._queues.move_to_end(key)
+            else:
+                del self._queues[key]
+            self._size -= 1
+            return item
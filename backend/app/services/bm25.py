@@ -0,0 +1,85 @@
+import re
+from collections import Counter
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+# Function words only; domain terms ("ai", "data") must stay searchable
+STOPWORDS = frozenset(
+    "a an and are as at be by de del el en es for from how in is it la las los of on or "
+    "our que the their this to un una we what when where which who why with y you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """Índice invertido BM25 en memoria, en formato CSR
+
+    Cada término guarda sus documentos y el peso BM25 ya calculado de cada
+    uno (idf * tf saturado y normalizado por largo), en dos arreglos
+    contiguos; una consulta solo suma los pesos de sus términos.
+    """
+
+    def __init__(self, texts: Sequence[str], k1: float = 1.5, b: float = 0.75):
+        self.size = len(texts)
+        documents = [Counter(tokenize(text)) for text in texts]
+        lengths = np.array([sum(doc.values()) for doc in documents], dtype=np.float32)
+        average = float(lengths.mean()) if self.size and lengths.sum() else 1.0
+
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        for doc_id, doc in enumerate(documents):
+            for term, tf in doc.items():
+                postings.setdefault(term, []).append((doc_id, tf))
+
+        self.terms: Dict[str, int] = {}
+        offsets = [0]
+        doc_ids: List[np.ndarray] = []
+        weights: List[np.ndarray] = []
+        for term, entries in postings.items():
+            ids = np.fromiter((doc_id for doc_id, _ in entries), dtype=np.int32, count=len(entries))
+            tfs = np.fromiter((tf for _, tf in entries), dtype=np.float32, count=len(entries))
+            idf = np.log(1 + (self.size - len(entries) + 0.5) / (len(entries) + 0.5))
+            norm = k1 * (1 - b + b * lengths[ids] / average)
+            self.terms[term] = len(offsets) - 1
+            doc_ids.append(ids)
+            weights.append((idf * tfs * (k1 + 1) / (tfs + norm)).astype(np.float32))
+            offsets.append(offsets[-1] + len(entries))
+
+        self.offsets = np.array(offsets, dtype=np.int64)
+        self.doc_ids = np.concatenate(doc_ids) if doc_ids else np.zeros(0, dtype=np.int32)
+        self.weights = np.concatenate(weights) if weights else np.zeros(0, dtype=np.float32)
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.offsets.nbytes + self.doc_ids.nbytes + self.weights.nbytes)
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """Devuelve (documento, puntaje) de los k mejores; solo documentos con algún término"""
+        scores = np.zeros(self.size, dtype=np.float32)
+        for term in set(tokenize(query)):
+            slot = self.terms.get(term)
+            if slot is None:
+                continue
+            start, end = self.offsets[slot], self.offsets[slot + 1]
+            scores[self.doc_ids[start:end]] += self.weights[start:end]
+
+        matched = np.flatnonzero(scores)
+        if not len(matched):
+            return []
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        matched = matched[np.argsort(-scores[matched], kind="stable")]
+        return [(int(i), float(scores[i])) for i in matched]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], k: int = 60) -> List[Tuple[int, float]]:
+    """Fusiona rankings por RRF: cada lista aporta 1 / (k + posición)"""
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
@@ -1,93 +1,461 @@
-from langchain_community.llms import HuggingFacePipeline
-from langchain.prompts import PromptTemplate
-from langchain.chains import LLMChain
-from transformers import AutoModelForCausalLM, AutoTokenizer, BitsAndBytesConfig
+from transformers import StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer
+from .admission import Cancellation
+from .conversation_memory import ConversationMemory
 from .embedding_service import EmbeddingService
+from .model_loader import load_causal_lm, speculative_kwargs
+from .prompt_builder import BuiltPrompt, PrefixKVCache, PromptBuilder
+from .response_cache import ResponseCache
+from ..core import config, executors, metrics, tracing
 import logging
+import time
 import torch
-import transformers
-import os
-from huggingface_hub import HfApi
+from concurrent.futures import Future
+from typing import Callable, Iterator, List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
-class ChatService:
+ttft_histogram = metrics.histogram(
+    "chat_time_to_first_token_seconds",
+    "Tiempo hasta el primer token emitido en /api/chat/stream"
+)
+prompt_tokens_counter = metrics.counter(
+    "chat_prompt_tokens_total",
+    "Tokens de prompt procesados por generate()"
+)
+generated_tokens_counter = metrics.counter(
+    "chat_generated_tokens_total",
+    "Tokens generados, sin contar el padding"
+)
+tokens_per_second_histogram = metrics.histogram(
+    "chat_generation_tokens_per_second",
+    "Tokens generados por segundo en cada respuesta",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+)
+
+
+def record_generation(prompt_tokens: int, generated_tokens: List[int], seconds: float) -> None:
+    """Cuenta tokens de entrada y salida; tokens/s por respuesta"""
+    prompt_tokens_counter.inc(prompt_tokens)
+    generated_tokens_counter.inc(sum(generated_tokens))
+    if seconds > 0:
+        for count in generated_tokens:
+            tokens_per_second_histogram.observe(count / seconds)
+
+
+ERROR_RESPONSE = "Lo siento, hubo un error al procesar tu consulta. Por favor, intenta de nuevo."
+
+
+def clean_response(response: str) -> str:
+    """Limpia la respuesta de cualquier texto adicional"""
+    # Same rules as the streaming path, applied to the whole text at once
+    cleaner = ResponseCleaner()
+    return (cleaner.feed(response) + cleaner.finish()).strip()
+
+
+class ResponseCleaner:
+    """Limpia la respuesta generada a medida que llegan los tokens
+
+    Quita un "Answer:" inicial y corta la salida cuando el modelo empieza
+    una nueva sección (Answer:/Context:/Question:) o un turno inventado del
+    usuario (User:, el formato del historial), sin esperar al texto completo.
+    """
+    STOP_MARKERS = ("Answer:", "Context:", "Question:", "User:")
+
     def __init__(self):
-        self.tokenizer = None
-        self.model = None
-        self.embedding_service = EmbeddingService()
-        self.llm = None
-        self.chain = None
-        self.prompt_template = PromptTemplate(
-            input_variables=["context", "question", "chat_name"],
-            template="""You are {chat_name}. Use the following context to answer the question. Be concise and direct.
+        self._buffer = ""
+        self._started = False
+        self.stopped = False
+
+    def feed(self, chunk: str) -> str:
+        if self.stopped:
+            return ""
+        self._buffer += chunk
+        if not self._started:
+            stripped = self._buffer.lstrip()
+            # However the chunks fall, every leading "Answer:" goes
+            while stripped.startswith("Answer:"):
+                stripped = stripped[len("Answer:"):].lstrip()
+            self._buffer = stripped
+            if not stripped or "Answer:".startswith(stripped):
+                return ""
+            self._started = True
+
+        cut = min((self._buffer.find(m) for m in self.STOP_MARKERS if m in self._buffer), default=-1)
+        if cut >= 0:
+            self.stopped = True
+            emitted, self._buffer = self._buffer[:cut].rstrip(), ""
+            return emitted
+
+        # Hold back a tail that could be the start of a marker
+        hold = 0
+        for marker in self.STOP_MARKERS:
+            for size in range(len(marker) - 1, 0, -1):
+                if size > hold and self._buffer.endswith(marker[:size]):
+                    hold = size
+                    break
+        # Trailing whitespace is held too, so the final answer ends trimmed
+        emitted = self._buffer[:len(self._buffer) - hold].rstrip()
+        self._buffer = self._buffer[len(emitted):]
+        return emitted
+
+    def finish(self) -> str:
+        if self.stopped:
+            return ""
+        emitted, self._buffer = self._buffer.rstrip(), ""
+        return emitted
 
-Context: {context}
 
-Question: {question}
+class _StopCancelled(StoppingCriteria):
+    """Detiene entre tokens las filas cuya petición se canceló o venció"""
 
-Answer:"""
+    def __init__(self, cancellations: List[Cancellation]):
+        self.cancellations = cancellations
+
+    def __call__(self, input_ids, scores, **kwargs) -> torch.BoolTensor:
+        # One flag per row: finished rows are padded while the rest keep decoding
+        return torch.tensor(
+            [cancellation.should_stop() for cancellation in self.cancellations],
+            dtype=torch.bool, device=input_ids.device
         )
 
+class ChatService:
+    def __init__(self, embedding_service: Optional[EmbeddingService] = None):
+        self.tokenizer = None
+        self.model = None
+        self.inference_mode = None
+        self.embedding_service = embedding_service or EmbeddingService()
+        self.response_cache = ResponseCache() if config.RESPONSE_CACHE_ENABLED else None
+        self.prompt_builder: Optional[PromptBuilder] = None
+        self.prefix_cache: Optional[PrefixKVCache] = None
+        self.memory: Optional[ConversationMemory] = None
+        self.generation_kwargs = {}
+        # Extra generate() kwargs for speculative decoding of single requests
+        self.speculative_kwargs = {}
+
     def _load_model(self):
         if self.model is None:
             try:
-                logger.info("Cargando TinyLlama-1.1B-Chat...")
+                logger.info(f"Cargando {config.LLM_MODEL_NAME}...")
                 
-                self.tokenizer = AutoTokenizer.from_pretrained(
-                    "TinyLlama/TinyLlama-1.1B-Chat-v1.0",
-                    trust_remote_code=True
-                )
-                
-                self.model = AutoModelForCausalLM.from_pretrained(
-                    "TinyLlama/TinyLlama-1.1B-Chat-v1.0",
-                    torch_dtype=torch.float16,
-                    device_map="auto",
-                    trust_remote_code=True
-                )
+                self.model, self.tokenizer, self.inference_mode = load_causal_lm()
+                if self.tokenizer.pad_token is None:
+                    self.tokenizer.pad_token = self.tokenizer.eos_token
                 
-                # Configurar pipeline con parámetros optimizados
-                pipeline = transformers.pipeline(
-                    "text-generation",
-                    model=self.model,
-                    tokenizer=self.tokenizer,
-                    max_length=512,
+                # Answers get a fixed token allowance; the prompt builder fits the rest
+                self.generation_kwargs = dict(
+                    max_new_tokens=config.MAX_NEW_TOKENS,
                     temperature=0.7,
                     top_p=0.95,
                     repetition_penalty=1.15,
                     do_sample=True,
                     pad_token_id=self.tokenizer.eos_token_id
                 )
-                
-                self.llm = HuggingFacePipeline(pipeline=pipeline)
-                self.chain = LLMChain(llm=self.llm, prompt=self.prompt_template)
+                model_window = getattr(self.model.config, "max_position_embeddings", 2048)
+                context_window = min(config.LLM_CONTEXT_TOKENS or model_window, model_window)
+                self.prompt_builder = PromptBuilder(self.tokenizer, context_window)
+                if config.CONVERSATION_MEMORY_ENABLED:
+                    self.memory = ConversationMemory(self.embedding_service, self.prompt_builder)
+                # ONNX Runtime sessions manage their own cache layout
+                if config.PREFIX_CACHE_ENABLED and self.inference_mode != "onnx":
+                    self.prefix_cache = PrefixKVCache(self.model, self.tokenizer)
+                if self.inference_mode != "onnx":
+                    self.speculative_kwargs = speculative_kwargs(self.tokenizer, self.model.device)
+                elif config.SPECULATIVE_DECODING != "off":
+                    logger.warning("La decodificación especulativa no está disponible con ONNX")
                 
             except Exception as e:
                 logger.error(f"Error al cargar el modelo: {str(e)}")
                 raise ValueError("Error al cargar el modelo")
 
+    def warm_up(self):
+        """Ejecuta encodes y generaciones cortas para que la primera petición no pague la inicialización"""
+        if self.model is None:
+            self._load_model()
+
+        questions = ["What services do you offer?", "Tell me about your case studies"]
+        contexts = self.embedding_service.get_relevant_context_many(questions)
+
+        # Exercise both the single-prompt and the batch paths; this also
+        # prefills the prefix cache for the default assistant
+        warm_up_kwargs = dict(self.generation_kwargs, max_new_tokens=8)
+        prompts = [
+            self.prompt_builder.build(question, "Promtior", "Promtior AI Assistant", context)
+            for question, context in zip(questions, contexts)
+        ]
+        for batch in (prompts[:1], prompts):
+            with torch.no_grad():
+                self.model.generate(**self._prepare_inputs(batch), **warm_up_kwargs)
+        logger.info("Modelos precalentados")
+
+    def _build_prompts(
+        self,
+        requests: List[Tuple[str, str, str]],
+        query_embeddings,
+        histories: Optional[List[List[str]]] = None
+    ) -> List[BuiltPrompt]:
+        contexts = self.embedding_service.get_relevant_context_many(
+            [question for question, _, _ in requests],
+            query_embeddings=query_embeddings,
+            company_names=[company_name for _, company_name, _ in requests]
+        )
+        histories = histories or [None] * len(requests)
+        with tracing.span("prompt"):
+            return [
+                self.prompt_builder.build(question, company_name, chat_name, context, history)
+                for (question, company_name, chat_name), context, history in zip(requests, contexts, histories)
+            ]
+
+    def _histories(self, conversations: List[Optional[str]], questions: List[str], query_embeddings) -> List[List[str]]:
+        """Historial que entra al prompt de cada fila; vacío si ningún turno previo viene al caso"""
+        if self.memory is None:
+            return [[] for _ in questions]
+        return [
+            self.memory.history(conversation, query_embedding, question) if conversation else []
+            for conversation, question, query_embedding in zip(conversations, questions, query_embeddings)
+        ]
+
+    def _remember(self, conversation: Optional[str], question: str, reply: str, query_embedding) -> None:
+        if self.memory is not None and conversation and reply and reply != ERROR_RESPONSE:
+            self.memory.append(conversation, question, reply, query_embedding)
+
+    def _prepare_inputs(self, prompts: List[BuiltPrompt]) -> dict:
+        """Tokeniza prefijo y resto por separado y arma el lote para generate()
+
+        Si todos comparten el prefijo y hay caché, el padding va entre el
+        prefijo y el resto: el caché del prefijo vale para todas las filas y
+        las posiciones salen de la attention_mask, así que solo se hace el
+        prefill de la parte propia de cada petición.
+        """
+        device = self.model.device
+        suffixes = [
+            torch.tensor(self.tokenizer(prompt.suffix, add_special_tokens=False)["input_ids"], dtype=torch.long)
+            for prompt in prompts
+        ]
+        width = max(len(ids) for ids in suffixes)
+        pad_id = self.tokenizer.pad_token_id
+        padded = torch.full((len(prompts), width), pad_id, dtype=torch.long)
+        mask = torch.zeros((len(prompts), width), dtype=torch.long)
+        for row, ids in enumerate(suffixes):
+            padded[row, width - len(ids):] = ids
+            mask[row, width - len(ids):] = 1
+
+        if self.prefix_cache is not None and len({prompt.prefix for prompt in prompts}) == 1:
+            prefix_ids, past = self.prefix_cache.get(prompts[0].prefix, len(prompts))
+            prefix_ids = prefix_ids.to("cpu").expand(len(prompts), -1)
+            return dict(
+                input_ids=torch.cat([prefix_ids, padded], dim=1).to(device),
+                attention_mask=torch.cat([torch.ones_like(prefix_ids), mask], dim=1).to(device),
+                past_key_values=past
+            )
+
+        # Mixed prefixes: plain left padding over the full prompts
+        rows = [
+            torch.cat([
+                torch.tensor(self.tokenizer(prompt.prefix)["input_ids"], dtype=torch.long),
+                ids
+            ])
+            for prompt, ids in zip(prompts, suffixes)
+        ]
+        width = max(len(ids) for ids in rows)
+        input_ids = torch.full((len(rows), width), pad_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(rows), width), dtype=torch.long)
+        for row, ids in enumerate(rows):
+            input_ids[row, width - len(ids):] = ids
+            attention_mask[row, width - len(ids):] = 1
+        return dict(input_ids=input_ids.to(device), attention_mask=attention_mask.to(device))
+
+    def _decoding_kwargs(self, batch_size: int) -> dict:
+        """kwargs de generate() para un lote; siempre una copia, el llamador puede modificarla"""
+        # transformers only runs assisted generation one sequence at a time
+        if batch_size == 1 and self.speculative_kwargs:
+            return dict(self.generation_kwargs, **self.speculative_kwargs)
+        return dict(self.generation_kwargs)
+
     def generate_response(self, input_text: str, company_name: str, chat_name: str = "Promtior AI Assistant") -> str:
+        return self.generate_batch([(input_text, company_name, chat_name)])[0]
+
+    def generate_batch(
+        self,
+        requests: List[Tuple[str, str, str]],
+        cancellations: Optional[List[Cancellation]] = None,
+        conversations: Optional[List[Optional[str]]] = None
+    ) -> List[str]:
+        """Genera las respuestas de varias consultas en un único generate() con padding
+
+        Las filas cuya cancelación se activa dejan de decodificarse; su texto
+        parcial no se guarda en la caché ni en la memoria. conversations
+        identifica la conversación de cada fila (el email del usuario): su
+        historial entra al prompt y el turno nuevo se suma a la memoria.
+        """
         try:
             if self.model is None:
                 self._load_model()
-                
-            formatted_context, _ = self.embedding_service.get_formatted_context(input_text, company_name)
-            
-            response = self.chain.run(
-                context=formatted_context,
-                question=input_text,
-                chat_name=chat_name
+
+            # One batched encode serves both the semantic cache and retrieval
+            query_embeddings = self.embedding_service.encode_queries(
+                [question for question, _, _ in requests]
             )
-            
-            # Limpiar la respuesta de cualquier texto adicional
-            clean_response = response.split("Answer:")[-1].strip()
-            if "Context:" in clean_response:
-                clean_response = clean_response.split("Context:")[0].strip()
-            if "Question:" in clean_response:
-                clean_response = clean_response.split("Question:")[0].strip()
-            
-            return clean_response
-            
+            conversations = conversations or [None] * len(requests)
+            histories = self._histories(conversations, [question for question, _, _ in requests], query_embeddings)
+            # Answers that draw on earlier turns skip the response cache both ways
+            replies = [
+                None if history else self._cached_response(question, company_name, chat_name, query_embedding)
+                for (question, company_name, chat_name), query_embedding, history
+                in zip(requests, query_embeddings, histories)
+            ]
+            pending = [i for i, reply in enumerate(replies) if reply is None]
+            if pending:
+                prompts = self._build_prompts(
+                    [requests[i] for i in pending], query_embeddings[pending], [histories[i] for i in pending]
+                )
+                inputs = self._prepare_inputs(prompts)
+                # Per-call stopping criteria must never land in the shared generation_kwargs
+                generation = dict(self._decoding_kwargs(len(prompts)))
+                if cancellations is not None:
+                    stop = _StopCancelled([cancellations[i] for i in pending])
+                    generation["stopping_criteria"] = StoppingCriteriaList([stop])
+                start = time.perf_counter()
+                with torch.no_grad(), tracing.span("generate"):
+                    outputs = self.model.generate(**inputs, **generation)
+
+                generated = outputs[:, inputs["input_ids"].shape[1]:]
+                # Rows that finish early are padded with pad_token_id (= eos) up to the longest
+                record_generation(
+                    int(inputs["attention_mask"].sum()),
+                    (generated != self.tokenizer.pad_token_id).sum(dim=1).tolist(),
+                    time.perf_counter() - start
+                )
+                for i, text in zip(pending, self.tokenizer.batch_decode(generated, skip_special_tokens=True)):
+                    replies[i] = clean_response(text)
+                    if not histories[i] and (cancellations is None or not cancellations[i].should_stop()):
+                        self._cache_response(*requests[i], replies[i], query_embeddings[i])
+
+            for i, reply in enumerate(replies):
+                if cancellations is None or not cancellations[i].should_stop():
+                    self._remember(conversations[i], requests[i][0], reply, query_embeddings[i])
+            return replies
+
         except Exception as e:
-            logger.error(f"Error generando respuesta: {str(e)}")
-            return "Lo siento, hubo un error al procesar tu consulta. Por favor, intenta de nuevo."
\ No newline at end of file
+            logger.error(f"Error generando respuestas en lote: {str(e)}")
+            return [ERROR_RESPONSE] * len(requests)
+
+    def stream_response(
+        self,
+        input_text: str,
+        company_name: str,
+        chat_name: str = "Promtior AI Assistant",
+        cancellation: Optional[Cancellation] = None,
+        conversation: Optional[str] = None,
+        submit: Optional[Callable[[Callable[[], None]], Future]] = None
+    ) -> Iterator[str]:
+        """Genera la respuesta token a token, ya limpia
+
+        Si la cancelación se activa a mitad de respuesta (plazo vencido),
+        la decodificación se detiene y se lanza el error correspondiente.
+        Con conversation, usa y actualiza la memoria como generate_batch.
+        submit pone la decodificación en el pool de modelos; el scheduler
+        pasa el suyo para que los streams respeten su cola y su límite.
+        """
+        cancellation = cancellation or Cancellation()
+        submit = submit or executors.model_executor.submit
+        start = time.perf_counter()
+        if self.model is None:
+            self._load_model()
+
+        query_embedding = self.embedding_service.encode_query(input_text)
+        history = self._histories([conversation], [input_text], query_embedding[None, :])[0]
+        cached = None if history else self._cached_response(input_text, company_name, chat_name, query_embedding)
+        if cached is not None:
+            ttft_histogram.observe(time.perf_counter() - start)
+            self._remember(conversation, input_text, cached, query_embedding)
+            yield cached
+            return
+
+        prompts = self._build_prompts(
+            [(input_text, company_name, chat_name)], query_embedding[None, :], [history]
+        )
+        inputs = self._prepare_inputs(prompts)
+
+        streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True)
+        errors = []
+        started = []
+
+        def generate():
+            started.append(time.perf_counter())
+            try:
+                self.model.generate(
+                    **inputs,
+                    **self._decoding_kwargs(1),
+                    streamer=streamer,
+                    stopping_criteria=StoppingCriteriaList([_StopCancelled([cancellation])])
+                )
+            except Exception as e:
+                # Unblock the consumer instead of leaving it waiting on the queue
+                errors.append(e)
+                streamer.end()
+
+        first_token = True
+        reply = []
+        cleaner = ResponseCleaner()
+        def dropped(future: Future) -> None:
+            # Cancelled or expired while queued: generate() never runs, so end the stream here
+            if not future.cancelled() and future.exception() is not None:
+                errors.append(future.exception())
+                streamer.end()
+
+        # Decoding runs on the bounded model pool; this generator only drains the streamer
+        submit(generate).add_done_callback(dropped)
+        try:
+            for chunk in streamer:
+                text = cleaner.feed(chunk)
+                if text:
+                    if first_token:
+                        ttft = time.perf_counter() - start
+                        ttft_histogram.observe(ttft)
+                        logger.info(f"Primer token en {ttft * 1000:.0f} ms")
+                        first_token = False
+                    reply.append(text)
+                    yield text
+                if cleaner.stopped:
+                    break
+            if errors:
+                raise errors[0]
+            if not cleaner.stopped and cancellation.should_stop():
+                # Decoding was cut short: don't pass the truncated answer off as complete
+                raise cancellation.error()
+            tail = cleaner.finish()
+            if tail:
+                reply.append(tail)
+                yield tail
+            if not history:
+                self._cache_response(input_text, company_name, chat_name, "".join(reply), query_embedding)
+            self._remember(conversation, input_text, "".join(reply), query_embedding)
+        finally:
+            # Stop decoding when the answer is complete or the client went away
+            cancellation.cancel()
+            if started:
+                elapsed = time.perf_counter() - started[0]
+                tracing.record("generate", elapsed)
+                record_generation(
+                    int(inputs["attention_mask"].sum()),
+                    [len(self.tokenizer("".join(reply), add_special_tokens=False)["input_ids"])],
+                    elapsed
+                )
+
+    def _cached_response(self, input_text: str, company_name: str, chat_name: str, query_embedding) -> Optional[str]:
+        if self.response_cache is None:
+            return None
+        self.response_cache.sync_corpus_version(self.embedding_service.corpus_version)
+        return self.response_cache.get(input_text, company_name, chat_name, query_embedding)
+
+    def _cache_response(self, input_text: str, company_name: str, chat_name: str, reply: str, query_embedding) -> None:
+        if self.response_cache is None or not reply or reply == ERROR_RESPONSE:
+            return
+        self.response_cache.put(input_text, company_name, chat_name, reply, query_embedding)
+
+    def get_cached_reply(self, input_text: str, company_name: str, chat_name: str) -> Optional[str]:
+        """Consulta solo el nivel exacto del caché, sin trabajo de modelo"""
+        if self.response_cache is None:
+            return None
+        self.response_cache.sync_corpus_version(self.embedding_service.corpus_version)
+        return self.response_cache.get_exact(input_text, company_name, chat_name)
@@ -0,0 +1,248 @@
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Deque, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select
+
+from ..core import config
+from ..db.db_models import Conversation, Interaction
+
+logger = logging.getLogger(__name__)
+
+# Each compacted turn leaves at most this many tokens in the summary
+TOPIC_TOKENS = 16
+SENTENCE_END = re.compile(r"(?<=[.?!])\s")
+
+
+def looks_like_follow_up(message: str) -> bool:
+    """Mensajes muy cortos ("why?", "tell me more") solo se entienden con el turno anterior"""
+    return len(message.split()) <= config.MEMORY_FOLLOW_UP_WORDS
+
+
+class Turn:
+    __slots__ = ("text", "question", "topic", "tokens", "embedding")
+
+    def __init__(self, text: str, question: str, topic: str, tokens: int, embedding: Optional[np.ndarray]):
+        self.text = text
+        self.question = question
+        self.topic = topic
+        self.tokens = tokens
+        # Embedding of the user message; turns loaded from the DB get theirs when first compared
+        self.embedding = embedding
+
+
+class _ConversationState:
+    __slots__ = ("recent", "recent_tokens", "archive", "topics", "topic_tokens", "loaded_at")
+
+    def __init__(self, archive_turns: int):
+        self.loaded_at = time.monotonic()
+        self.recent: Deque[Turn] = deque()
+        self.recent_tokens = 0
+        self.archive: Deque[Turn] = deque(maxlen=archive_turns)
+        self.topics: Deque[Tuple[str, int]] = deque()
+        self.topic_tokens = 0
+
+    @property
+    def empty(self) -> bool:
+        return not self.recent and not self.archive
+
+
+class ConversationMemory:
+    """Memoria acotada de cada conversación para los prompts multi-turno
+
+    Se guardan literales los últimos turnos de cada usuario (hasta
+    MEMORY_WINDOW_TOKENS). Los anteriores se compactan: su tema queda en un
+    resumen de a lo sumo MEMORY_SUMMARY_TOKENS y el turno se guarda con su
+    embedding. Al prompt solo entran los turnos parecidos a la pregunta
+    (todos los de la ventana y hasta MEMORY_RECALL_TURNS de los
+    compactados), más el último si el mensaje es una continuación corta.
+    Así el prompt no crece con la conversación y las preguntas que no
+    dependen de turnos previos siguen usando la caché de respuestas.
+
+    Las conversaciones recientes viven en un LRU en memoria; las demás se
+    reconstruyen desde la tabla interactions con load(). Con varios workers
+    se reconstruyen cada MEMORY_REFRESH_S, para ver los turnos que
+    atendieron los demás.
+    """
+
+    def __init__(
+        self,
+        embedding_service,
+        prompt_builder,
+        max_conversations: Optional[int] = None,
+        window_tokens: Optional[int] = None,
+        turn_tokens: Optional[int] = None,
+        summary_tokens: Optional[int] = None,
+        recall_turns: Optional[int] = None,
+        archive_turns: Optional[int] = None,
+        refresh_s: Optional[float] = None,
+        engine=None
+    ):
+        self.embedding_service = embedding_service
+        self.prompt_builder = prompt_builder
+        self.max_conversations = max_conversations or config.MEMORY_CONVERSATIONS
+        self.window_tokens = window_tokens or config.MEMORY_WINDOW_TOKENS
+        self.turn_tokens = turn_tokens or config.MEMORY_TURN_TOKENS
+        self.summary_tokens = summary_tokens if summary_tokens is not None else config.MEMORY_SUMMARY_TOKENS
+        self.recall_turns = recall_turns if recall_turns is not None else config.MEMORY_RECALL_TURNS
+        self.archive_turns = archive_turns or config.MEMORY_ARCHIVE_TURNS
+        self.refresh_s = refresh_s if refresh_s is not None else config.MEMORY_REFRESH_S
+        self._engine = engine
+        self._states: "OrderedDict[str, _ConversationState]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            from ..db.db_connection import engine
+            self._engine = engine
+        return self._engine
+
+    def touch(self, user_key: str) -> bool:
+        """True si la conversación está en memoria (y la marca como reciente); si no, hay que load()"""
+        with self._lock:
+            state = self._states.get(user_key)
+            if state is not None and self.refresh_s and time.monotonic() - state.loaded_at > self.refresh_s:
+                # Other workers may have answered this user since: rebuild from the log
+                del self._states[user_key]
+                state = None
+            if state is not None:
+                self.hits += 1
+                self._states.move_to_end(user_key)
+                return True
+            self.misses += 1
+            return False
+
+    def has_history(self, user_key: str) -> bool:
+        with self._lock:
+            state = self._states.get(user_key)
+            return state is not None and not state.empty
+
+    def load(self, user_key: str) -> None:
+        """Reconstruye la conversación desde la base si no está en memoria; es bloqueante"""
+        with self._lock:
+            if user_key in self._states:
+                return
+
+        table = Interaction.__table__
+        # The last turns are enough to refill the window and the archive
+        limit = self.archive_turns + 16
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(table.c.user_message, table.c.bot_response)
+                .join(Conversation.__table__, Conversation.__table__.c.id == table.c.conversation_id)
+                .where(Conversation.__table__.c.user_email == user_key)
+                .order_by(table.c.timestamp.desc(), table.c.id.desc())
+                .limit(limit)
+            ).all()
+
+        logger.debug(f"Conversación de {user_key} recuperada de la base con {len(rows)} turnos")
+        state = _ConversationState(self.archive_turns)
+        for row in reversed(rows):
+            self._add_turn(state, self._turn(row.user_message, row.bot_response, None))
+        with self._lock:
+            # A concurrent request may have loaded (and extended) it meanwhile
+            if user_key not in self._states:
+                self._put(user_key, state)
+
+    def append(self, user_key: str, user_message: str, reply: str, embedding: Optional[np.ndarray] = None) -> None:
+        """Agrega un turno respondido y compacta los que salen de la ventana
+
+        Solo a conversaciones en memoria: las demás ya tendrán el turno en la
+        base (el cliente lo registra) cuando se reconstruyan.
+        """
+        if not user_key or not reply:
+            return
+        turn = self._turn(user_message, reply, embedding)
+        with self._lock:
+            state = self._states.get(user_key)
+            if state is None:
+                return
+            self._states.move_to_end(user_key)
+            self._add_turn(state, turn)
+
+    def history(self, user_key: str, query_embedding: np.ndarray, question: str = "") -> List[str]:
+        """Líneas de historial para el prompt: resumen, turnos recuperados y ventana reciente
+
+        Vacío si ningún turno previo se relaciona con la pregunta.
+        """
+        with self._lock:
+            state = self._states.get(user_key)
+            if state is None or state.empty:
+                return []
+            recent = list(state.recent)
+            archive = list(state.archive)
+            topics = [topic for topic, _ in state.topics]
+
+        self._embed([turn for turn in recent + archive if turn.embedding is None])
+        threshold = config.MEMORY_RECALL_SIMILARITY
+        follow_up = looks_like_follow_up(question)
+        window = [
+            turn for i, turn in enumerate(recent)
+            if turn.embedding @ query_embedding >= threshold or (follow_up and i == len(recent) - 1)
+        ]
+        recalled = []
+        if archive and self.recall_turns:
+            scores = np.stack([turn.embedding for turn in archive]) @ query_embedding
+            best = np.argsort(-scores)[:self.recall_turns]
+            # Back in conversation order, leaving out turns unrelated to the question
+            recalled = [archive[i] for i in sorted(best) if scores[i] >= threshold]
+        if not window and not recalled:
+            return []
+
+        lines = []
+        if topics:
+            lines.append("Earlier, the user asked about: " + "; ".join(topics))
+        lines.extend(turn.text for turn in recalled + window)
+        return lines
+
+    def _embed(self, turns: List[Turn]) -> None:
+        # Turns rebuilt from the DB (or answered from the exact cache) are embedded once, in one batch
+        if turns:
+            encoded = self.embedding_service.encode_queries([turn.question for turn in turns])
+            for turn, embedding in zip(turns, encoded):
+                turn.embedding = embedding
+
+    def _turn(self, user_message: str, reply: str, embedding: Optional[np.ndarray]) -> Turn:
+        builder = self.prompt_builder
+        question = builder.truncate(user_message.strip(), self.turn_tokens // 3)
+        answer = builder.truncate(reply.strip(), max(self.turn_tokens - builder.count(question), 1))
+        text = f"User: {question}\nAssistant: {answer}"
+        topic = builder.truncate(SENTENCE_END.split(user_message.strip(), 1)[0], TOPIC_TOKENS)
+        return Turn(text, question, topic, builder.count(text) + 1, embedding)
+
+    def _add_turn(self, state: _ConversationState, turn: Turn) -> None:
+        state.recent.append(turn)
+        state.recent_tokens += turn.tokens
+        # The newest turn always stays, even if it alone exceeds the window
+        while state.recent_tokens > self.window_tokens and len(state.recent) > 1:
+            old = state.recent.popleft()
+            state.recent_tokens -= old.tokens
+            state.archive.append(old)
+            self._add_topic(state, old.topic)
+
+    def _add_topic(self, state: _ConversationState, topic: str) -> None:
+        if not self.summary_tokens:
+            return
+        tokens = self.prompt_builder.count(topic) + 1
+        state.topics.append((topic, tokens))
+        state.topic_tokens += tokens
+        # The summary keeps the latest topics that fit its budget
+        while state.topic_tokens > self.summary_tokens and state.topics:
+            _, dropped = state.topics.popleft()
+            state.topic_tokens -= dropped
+
+    def _put(self, user_key: str, state: _ConversationState) -> None:
+        self._states[user_key] = state
+        while len(self._states) > self.max_conversations:
+            self._states.popitem(last=False)
+
+    @property
+    def size(self) -> int:
+        return len(self._states)
@@ -0,0 +1,219 @@
+import glob
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..core import config
+from .vector_store import NumpyVectorStore, VectorStore, create_vector_store, load_vector_store
+
+logger = logging.getLogger(__name__)
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class IndexSnapshot:
+    """Matriz, almacén de vectores y textos de una misma versión del corpus
+
+    Se reemplaza entero en cada build, así una búsqueda nunca mezcla los
+    vectores de una versión con los textos de otra.
+    """
+    __slots__ = ("key", "matrix", "store", "items", "resident", "lexical")
+
+    def __init__(
+        self,
+        key: Optional[str],
+        matrix: np.ndarray,
+        store: VectorStore,
+        items: Sequence = (),
+        resident: bool = False,
+        lexical=None
+    ):
+        self.key = key
+        self.matrix = matrix
+        self.store = store
+        self.items = items
+        # True when vectors live in process memory; False when searched off the mmap'd file
+        self.resident = resident
+        # Optional keyword index over the same items (BM25), swapped together with them
+        self.lexical = lexical
+
+    @property
+    def resident_bytes(self) -> int:
+        return int(self.matrix.nbytes) if self.resident else 0
+
+
+class EmbeddingIndex:
+    """Índice de embeddings del corpus, persistido en disco y mapeado en memoria"""
+
+    def __init__(self, model, model_name: str, cache_dir: str, backend: Optional[str] = None):
+        self.model = model
+        self.model_name = model_name
+        self.cache_dir = os.path.join(cache_dir, "embeddings")
+        self.faiss_dir = os.path.join(cache_dir, "faiss")
+        self.backend = backend or config.VECTOR_STORE_BACKEND
+        self.snapshot = IndexSnapshot(None, np.zeros((0, 0), dtype=np.float32), NumpyVectorStore(0))
+        self._build_lock = threading.Lock()
+
+    @property
+    def matrix(self) -> np.ndarray:
+        return self.snapshot.matrix
+
+    @property
+    def store(self) -> VectorStore:
+        return self.snapshot.store
+
+    @property
+    def key(self) -> Optional[str]:
+        return self.snapshot.key
+
+    @property
+    def _prefix(self) -> str:
+        return self.model_name.replace("/", "__")
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        base = os.path.join(self.cache_dir, f"{self._prefix}-{key}")
+        return f"{base}.npy", f"{base}.json"
+
+    # Build (or load from disk) the embedding matrix for the given texts
+    def build(
+        self,
+        texts: List[str],
+        source_digest: str,
+        items: Optional[Sequence] = None,
+        resident: bool = True,
+        lexical=None
+    ) -> IndexSnapshot:
+        """Carga la matriz del disco o la construye re-embebiendo solo los textos nuevos
+
+        Las búsquedas siguen usando el snapshot anterior hasta que el nuevo
+        está completo; items (por defecto los textos) viaja con él. Con
+        resident=False se busca directamente sobre el archivo mapeado.
+        """
+        with self._build_lock:
+            return self._build(texts, source_digest, texts if items is None else items, resident, lexical)
+
+    def set_resident(self, resident: bool) -> IndexSnapshot:
+        """Sube el índice actual a memoria o lo baja al archivo mapeado, sin re-embeber"""
+        with self._build_lock:
+            snapshot = self.snapshot
+            if snapshot.key is None or snapshot.resident == resident:
+                return snapshot
+            matrix_path, _ = self._paths(snapshot.key)
+            return self._activate(
+                snapshot.key, np.load(matrix_path, mmap_mode="r"), snapshot.items, resident, snapshot.lexical
+            )
+
+    def _build(self, texts: List[str], source_digest: str, items: Sequence, resident: bool, lexical) -> IndexSnapshot:
+        key = hashlib.sha256(
+            f"{self.model_name}\0{source_digest}".encode("utf-8")
+        ).hexdigest()[:16]
+        matrix_path, manifest_path = self._paths(key)
+        hashes = [text_hash(text) for text in texts]
+
+        if os.path.exists(matrix_path) and os.path.exists(manifest_path):
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("hashes") == hashes:
+                snapshot = self._activate(key, np.load(matrix_path, mmap_mode="r"), items, resident, lexical)
+                logger.info(f"Índice de embeddings cargado desde disco ({len(texts)} textos)")
+                return snapshot
+
+        cached = self._load_previous_rows()
+        missing = [i for i, h in enumerate(hashes) if h not in cached]
+        matrix = None
+        if missing:
+            new_rows = self.model.encode(
+                [texts[i] for i in missing],
+                normalize_embeddings=True,
+                convert_to_numpy=True,
+            ).astype(np.float32)
+            matrix = np.empty((len(texts), new_rows.shape[1]), dtype=np.float32)
+            for row, i in zip(new_rows, missing):
+                matrix[i] = row
+        for i, h in enumerate(hashes):
+            if h in cached:
+                if matrix is None:
+                    matrix = np.empty((len(texts), cached[h].shape[0]), dtype=np.float32)
+                matrix[i] = cached[h]
+        if matrix is None:
+            matrix = np.zeros((0, 0), dtype=np.float32)
+        logger.info(f"Embeddings calculados para {len(missing)} de {len(texts)} textos")
+
+        self._save(key, np.ascontiguousarray(matrix), hashes)
+        return self._activate(key, np.load(matrix_path, mmap_mode="r"), items, resident, lexical)
+
+    def _activate(self, key: str, matrix: np.ndarray, items: Sequence, resident: bool, lexical=None) -> IndexSnapshot:
+        """Publica la matriz y su almacén de vectores para las búsquedas"""
+        dim = matrix.shape[1] if matrix.ndim == 2 else 0
+        if not resident:
+            # Spilled: exact search over the mmap'd file; the OS pages it in and out
+            store = NumpyVectorStore(dim, matrix=matrix)
+        elif self.backend == "numpy":
+            matrix = np.array(matrix)
+            store = NumpyVectorStore(dim, matrix=matrix)
+        else:
+            os.makedirs(self.faiss_dir, exist_ok=True)
+            path = os.path.join(self.faiss_dir, f"{self._prefix}-{key}-{self.backend}")
+            if os.path.exists(f"{path}.faiss"):
+                store = load_vector_store(path, self.backend)
+            else:
+                for stale in glob.glob(os.path.join(self.faiss_dir, f"{self._prefix}-*")):
+                    os.remove(stale)
+                store = create_vector_store(dim, self.backend)
+                if len(matrix):
+                    store.add(range(len(matrix)), matrix)
+                store.save(path)
+        # A single attribute swap publishes the new version to concurrent readers
+        self.snapshot = IndexSnapshot(key, matrix, store, items, resident, lexical)
+        return self.snapshot
+
+    def _load_previous_rows(self) -> dict:
+        """Devuelve hash -> vector del índice más reciente de este modelo"""
+        manifests = glob.glob(os.path.join(self.cache_dir, f"{self._prefix}-*.json"))
+        if not manifests:
+            return {}
+        latest = max(manifests, key=os.path.getmtime)
+        try:
+            with open(latest, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            matrix = np.load(latest[:-len(".json")] + ".npy", mmap_mode="r")
+            return {h: matrix[i] for i, h in enumerate(manifest["hashes"])}
+        except Exception as e:
+            logger.warning(f"No se pudo reutilizar el índice previo: {str(e)}")
+            return {}
+
+    def _save(self, key: str, matrix: np.ndarray, hashes: List[str]) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        matrix_path, manifest_path = self._paths(key)
+        stale = [
+            path for path in glob.glob(os.path.join(self.cache_dir, f"{self._prefix}-*"))
+            if not path.startswith(matrix_path[:-len(".npy")])
+        ]
+
+        # Write to temporary files and rename so readers never see a partial index
+        tmp_matrix = f"{matrix_path}.tmp"
+        with open(tmp_matrix, "wb") as f:
+            np.save(f, matrix)
+        os.replace(tmp_matrix, matrix_path)
+        tmp_manifest = f"{manifest_path}.tmp"
+        with open(tmp_manifest, "w", encoding="utf-8") as f:
+            json.dump({"model_name": self.model_name, "key": key, "hashes": hashes}, f)
+        os.replace(tmp_manifest, manifest_path)
+
+        for path in stale:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    # Top-k search delegated to the configured vector store
+    def search(self, query_embedding: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        """Devuelve (posición, similitud) de los k vectores más cercanos"""
+        return self.snapshot.store.search(query_embedding, k)
@@ -1,99 +1,162 @@
-from sentence_transformers import SentenceTransformer
-import json
-import os
-from typing import List, Dict, Any, Tuple
+from typing import Dict, List, Optional
 import logging
+import numpy as np
+from ..core import config, tracing
+from .bm25 import reciprocal_rank_fusion
+from .embedding_index import IndexSnapshot
+from .ingestion import Chunk, TextChunker
+from .query_cache import QueryEmbeddingCache
+from .reranker import Reranker
+from .tenant_indexes import TenantIndexes
 
 logger = logging.getLogger(__name__)
 
 class EmbeddingService:
-    def __init__(self):
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
-        self.texts = []
+    def __init__(self, model=None):
+        if model is None:
+            from sentence_transformers import SentenceTransformer
+            model = SentenceTransformer(config.EMBEDDING_MODEL_NAME)
+        # Anything with SentenceTransformer's encode() works (benchmarks pass a stub)
+        self.model = model
+        self.chunker = TextChunker(getattr(self.model, "tokenizer", None))
+        # Bumped on every (re)initialization so caches built on the old corpus can drop
+        self.corpus_version = 0
+        # One index per company, routed by ChatRequest.company_name
+        self.tenants = TenantIndexes(self.model, config.EMBEDDING_MODEL_NAME, self.chunker)
+        self.reranker = Reranker() if config.RERANK_MODEL_NAME else None
+        self.query_cache = QueryEmbeddingCache(
+            lowercase=getattr(getattr(self.model, "tokenizer", None), "do_lower_case", False)
+        ) if config.QUERY_CACHE_MAX_MB > 0 else None
         self._initialize_data()
-    # Using the json files in the data folder to initialize the data for the embedding model
+
+    @property
+    def chunks(self) -> List[Chunk]:
+        snapshot = self.tenants.snapshot()
+        return list(snapshot.items) if snapshot is not None else []
+
+    @property
+    def texts(self) -> List[str]:
+        return [chunk.text for chunk in self.chunks]
+
+    # Ingest every json file in the data folder into the embedding indexes
     def _initialize_data(self):
-        """Inicializa los datos desde los JSONs locales"""
+        """Trocea las fuentes de datos y reconstruye los índices sin cortar las búsquedas
+
+        Solo se embeben los chunks nuevos o modificados; cada índice sigue
+        respondiendo hasta que el nuevo lo reemplaza. Las empresas que aún no
+        se consultaron se cargan en su primer uso.
+        """
         try:
-            texts = []
-            json_files = [
-                "app/data/company_info.json",
-                "app/data/services_info.json",
-                "app/data/case_studies_info.json"
-            ]
-            
-            for json_path in json_files:
-                if os.path.exists(json_path):
-                    with open(json_path, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                        texts.extend(self._extract_texts_from_json(data))
-            
-            if not texts:
+            if not self.tenants.discover():
                 raise FileNotFoundError("No se encontraron archivos de información")
-            
-            self.texts = texts
-            
+            self.tenants.reload()
+            # The default company is always warm
+            self.tenants.snapshot()
         except Exception as e:
             logger.error(f"Error al inicializar datos: {str(e)}")
-            self.texts = ["No se pudo obtener información de la empresa"]
-
-    # Extract texts from the json files in the data folder
-    def _extract_texts_from_json(self, data: Dict[str, Any]) -> List[str]:
-        """Extrae textos de un diccionario JSON de forma recursiva"""
-        texts = []
-        
-        def process_value(value, prefix=''):
-            if isinstance(value, str):
-                texts.append(f"{prefix}{value}".strip())
-            elif isinstance(value, list):
-                for item in value:
-                    process_value(item, prefix)
-            elif isinstance(value, dict):
-                for k, v in value.items():
-                    if k not in ['metadata', 'last_updated']:
-                        new_prefix = f"{k}: " if prefix == '' else f"{prefix} {k}: "
-                        process_value(v, new_prefix)
-        
-        process_value(data)
-        return texts
+        self.corpus_version += 1
+
+    # Encode queries into normalized vectors comparable with the corpus matrix
+    def encode_queries(self, queries: List[str]) -> np.ndarray:
+        """Codifica en un solo lote las consultas que no están en caché; devuelve float32 (n, dim)"""
+        if self.query_cache is None:
+            with tracing.span("embed"):
+                return self.model.encode(queries, normalize_embeddings=True, convert_to_numpy=True)
+        if not queries:
+            return np.zeros((0, self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+
+        keys = [self.query_cache.key(query) for query in queries]
+        vectors = self.query_cache.get_many(keys)
+        # Repeated queries within the batch are encoded once
+        missing = list(dict.fromkeys(key for key, vector in zip(keys, vectors) if vector is None))
+        if missing:
+            with tracing.span("embed"):
+                encoded = self.model.encode(missing, normalize_embeddings=True, convert_to_numpy=True)
+            self.query_cache.put_many(missing, encoded)
+            fresh = dict(zip(missing, encoded.astype(np.float32)))
+            vectors = [fresh[key] if vector is None else vector for key, vector in zip(keys, vectors)]
+        return np.stack(vectors)
+
+    def encode_query(self, query: str) -> np.ndarray:
+        return self.encode_queries([query])[0]
 
     # Get the most relevant texts for a query
-    def get_relevant_context(self, query: str, k: int = 3) -> List[str]:
-        """Recupera los k textos más relevantes para una consulta"""
-        if not self.texts:
-            return ["No hay información disponible"]
-        
-        query_embedding = self.model.encode([query])
-        text_embeddings = self.model.encode(self.texts)
-        
-        # Calculate cosine similarity
-        similarities = [(text, similarity) for text, similarity in 
-                       zip(self.texts, text_embeddings @ query_embedding.T)]
-        
-        # Sort by similarity and get the k most relevant
-        relevant_texts = sorted(similarities, key=lambda x: x[1], reverse=True)[:k]
-        return [text for text, _ in relevant_texts]
-
-    # Get the formatted context for a query
-    def get_formatted_context(self, query: str, company_name: str, k: int = 3) -> Tuple[str, List[str]]:
-        relevant_texts = self.get_relevant_context(query, k)
-        context_text = ' '.join(relevant_texts)
-        
-        formatted_context = f"""
-        You are a helpful AI assistant for {company_name}. Use the following information to answer questions in a natural, conversational way.
-
-        Context:
-        {context_text}
-
-        Guidelines:
-        - If asked about services, provide specific examples from our case studies
-        - For technical questions, reference our capabilities and technologies
-        - Always maintain a professional but friendly tone
-        - If information is not available, be honest and suggest contacting the company directly
-
-        Question: {query}
-
-        Please provide a detailed, helpful response:
+    def get_relevant_context(
+        self,
+        query: str,
+        k: int = 3,
+        query_embedding: Optional[np.ndarray] = None,
+        company_name: Optional[str] = None
+    ) -> List[str]:
+        """Recupera los k textos más relevantes de la empresa para una consulta"""
+        query_embeddings = None if query_embedding is None else np.asarray(query_embedding)[None, :]
+        return self.get_relevant_context_many([query], k, query_embeddings, [company_name])[0]
+
+    # Get the most relevant texts for several queries with a single encode call
+    def get_relevant_context_many(
+        self,
+        queries: List[str],
+        k: int = 3,
+        query_embeddings: Optional[np.ndarray] = None,
+        company_names: Optional[List[Optional[str]]] = None
+    ) -> List[List[str]]:
+        """Recupera los k textos más relevantes para cada consulta, cada una en el índice de su empresa
+
+        Las consultas de una misma empresa se puntúan juntas: una sola
+        multiplicación de matrices contra su corpus.
         """
-        
-        return formatted_context, relevant_texts
\ No newline at end of file
+        if not queries:
+            return []
+        if query_embeddings is None:
+            query_embeddings = self.encode_queries(queries)
+        query_embeddings = np.asarray(query_embeddings, dtype=np.float32)
+        if company_names is None:
+            company_names = [None] * len(queries)
+
+        by_company: Dict[Optional[str], List[int]] = {}
+        for position, company_name in enumerate(company_names):
+            by_company.setdefault(company_name, []).append(position)
+
+        results: List[List[str]] = [[] for _ in queries]
+        with tracing.span("retrieve"):
+            self._retrieve_by_company(queries, k, query_embeddings, by_company, results)
+        return results
+
+    def _retrieve_by_company(
+        self,
+        queries: List[str],
+        k: int,
+        query_embeddings: np.ndarray,
+        by_company: Dict[Optional[str], List[int]],
+        results: List[List[str]]
+    ) -> None:
+        for company_name, positions in by_company.items():
+            snapshot = self.tenants.snapshot(company_name)
+            if snapshot is None or not snapshot.items:
+                for position in positions:
+                    results[position] = ["No hay información disponible"]
+                continue
+            ranked = self._search_many(
+                snapshot, [queries[p] for p in positions], query_embeddings[positions], k
+            )
+            for position, ids in zip(positions, ranked):
+                results[position] = [snapshot.items[i].text for i in ids]
+
+    def _search_many(self, snapshot: IndexSnapshot, queries: List[str], query_embeddings: np.ndarray, k: int) -> List[List[int]]:
+        """Posiciones de los k mejores chunks: denso + BM25 fusionados por RRF y, si hay, rerank"""
+        if snapshot.lexical is None and self.reranker is None:
+            # Cosine similarity against the precomputed corpus matrix
+            return [[i for i, _ in hits] for hits in snapshot.store.search_many(query_embeddings, k)]
+
+        candidates = max(k, config.RETRIEVAL_CANDIDATES)
+        results = []
+        for query, dense_hits in zip(queries, snapshot.store.search_many(query_embeddings, candidates)):
+            ranked = [i for i, _ in dense_hits]
+            if snapshot.lexical is not None:
+                lexical = [i for i, _ in snapshot.lexical.search(query, candidates)]
+                ranked = [i for i, _ in reciprocal_rank_fusion([ranked, lexical], config.RRF_K)]
+            if self.reranker is not None:
+                with tracing.span("rerank"):
+                    ranked = self.reranker.rerank(query, ranked, {i: snapshot.items[i].text for i in ranked})
+            results.append(ranked[:k])
+        return results
@@ -0,0 +1,257 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Iterator, List, Optional
+
+from ..core import config, executors, metrics, tracing
+from .admission import Cancellation, FairQueue
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """La cola de inferencia está llena; el cliente debe reintentar más tarde"""
+
+
+class _PendingRequest:
+    __slots__ = (
+        "message", "company_name", "chat_name", "user_key", "cancellation", "job", "future", "trace", "enqueued_at"
+    )
+
+    def __init__(
+        self,
+        message: Optional[str],
+        company_name: Optional[str],
+        chat_name: Optional[str],
+        user_key: str,
+        cancellation: Cancellation,
+        job: Optional[Callable[[], None]] = None
+    ):
+        self.message = message
+        self.company_name = company_name
+        self.chat_name = chat_name
+        self.user_key = user_key
+        self.cancellation = cancellation
+        # Model work that runs on its own (a stream) instead of joining a batch
+        self.job = job
+        self.future: Future = Future()
+        # The batch runs on another thread: keep the caller's trace to attribute its stages
+        self.trace = tracing.current_trace()
+        self.enqueued_at = time.perf_counter()
+
+
+batch_size_histogram = metrics.histogram(
+    "inference_batch_size",
+    "Peticiones por micro-lote de generación",
+    buckets=(1, 2, 4, 8, 16, 32, 64)
+)
+
+
+class InferenceScheduler:
+    """Agrupa las peticiones concurrentes en micro-lotes para ChatService.generate_batch
+
+    Un hilo dedicado espera la primera petición y sigue acumulando hasta
+    llenar el lote o agotar la ventana de espera; luego genera todo el lote
+    en una sola pasada en el pool de modelos y resuelve los futures de cada
+    petición. Nunca hay más lotes en vuelo que hilos en ese pool.
+
+    La cola reparte los turnos entre usuarios en round-robin. Las peticiones
+    canceladas o vencidas se descartan al armar el lote, y las que se
+    cancelan durante la generación dejan de decodificarse entre tokens.
+    Los streams pasan por la misma cola y ocupan un hilo del pool de
+    modelos para ellos solos.
+    """
+
+    def __init__(
+        self,
+        chat_service,
+        max_batch_size: Optional[int] = None,
+        max_wait_ms: Optional[float] = None,
+        max_queue_depth: Optional[int] = None
+    ):
+        self.chat_service = chat_service
+        self.max_batch_size = max_batch_size or config.BATCH_MAX_SIZE
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else config.BATCH_MAX_WAIT_MS) / 1000
+        self._queue: "FairQueue[_PendingRequest]" = FairQueue(
+            max_queue_depth or config.BATCH_MAX_QUEUE_DEPTH, key=lambda pending: pending.user_key
+        )
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._in_flight = threading.Semaphore(config.MODEL_WORKERS)
+        # A job met while filling a batch opens the next one
+        self._deferred: Optional[_PendingRequest] = None
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() + (self._deferred is not None)
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping.clear()
+                self._thread = threading.Thread(
+                    target=self._run, name="inference-scheduler", daemon=True
+                )
+                self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def submit(
+        self,
+        message: str,
+        company_name: str,
+        chat_name: str,
+        user_key: str = "",
+        cancellation: Optional[Cancellation] = None
+    ) -> Future:
+        """Encola una petición; lanza QueueFullError si se supera la profundidad máxima"""
+        self.start()
+        pending = _PendingRequest(message, company_name, chat_name, user_key, cancellation or Cancellation())
+        try:
+            self._queue.put_nowait(pending)
+        except queue.Full:
+            raise QueueFullError("Inference queue is full")
+        return pending.future
+
+    def submit_job(self, job: Callable[[], None], user_key: str = "", cancellation: Optional[Cancellation] = None) -> Future:
+        """Encola trabajo de modelo que no se agrupa; corre en el pool de modelos cuando le toca"""
+        self.start()
+        pending = _PendingRequest(None, None, None, user_key, cancellation or Cancellation(), job)
+        try:
+            self._queue.put_nowait(pending)
+        except queue.Full:
+            raise QueueFullError("Inference queue is full")
+        return pending.future
+
+    def stream(
+        self,
+        message: str,
+        company_name: str,
+        chat_name: str,
+        user_key: str = "",
+        cancellation: Optional[Cancellation] = None
+    ) -> Iterator[str]:
+        """ChatService.stream_response con la decodificación encolada como las demás peticiones"""
+        cancellation = cancellation or Cancellation()
+        return self.chat_service.stream_response(
+            message,
+            company_name,
+            chat_name,
+            cancellation=cancellation,
+            conversation=user_key,
+            submit=lambda job: self.submit_job(job, user_key, cancellation)
+        )
+
+    async def generate(
+        self,
+        message: str,
+        company_name: str,
+        chat_name: str,
+        user_key: str = "",
+        cancellation: Optional[Cancellation] = None
+    ) -> str:
+        cancellation = cancellation or Cancellation()
+        future = self.submit(message, company_name, chat_name, user_key, cancellation)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # The caller went away: drop it from the queue or stop its row of the batch
+            cancellation.cancel()
+            raise
+
+    def _next(self, timeout: float) -> Optional[_PendingRequest]:
+        """Siguiente petición viva; las canceladas o vencidas se resuelven sin generar"""
+        deadline = time.monotonic() + timeout
+        while True:
+            pending = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+            # Marks the future running, so later cancels can't race the result
+            if not pending.future.set_running_or_notify_cancel():
+                continue
+            if pending.cancellation.should_stop():
+                pending.future.set_exception(pending.cancellation.error())
+                continue
+            return pending
+
+    def _collect_batch(self) -> List[_PendingRequest]:
+        first, self._deferred = self._deferred, None
+        if first is None:
+            try:
+                first = self._next(0.1)
+            except queue.Empty:
+                return []
+        if first.job is not None:
+            return [first]
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                pending = self._next(remaining)
+            except queue.Empty:
+                break
+            if pending.job is not None:
+                self._deferred = pending
+                break
+            batch.append(pending)
+        return batch
+
+    def _run(self) -> None:
+        while not self._stopping.is_set() or self.depth:
+            # Keep requests queued (and subject to back-pressure) until a model worker is free
+            if not self._in_flight.acquire(timeout=0.1):
+                continue
+            batch = self._collect_batch()
+            if not batch:
+                self._in_flight.release()
+                continue
+            executors.model_executor.submit(self._process, batch)
+
+    def _process(self, batch: List[_PendingRequest]) -> None:
+        logger.debug(f"Generando lote de {len(batch)} peticiones")
+        started = time.perf_counter()
+        for pending in batch:
+            with tracing.use_traces([pending.trace]):
+                tracing.record("queue", started - pending.enqueued_at)
+        if batch[0].job is not None:
+            self._run_job(batch[0])
+            return
+        batch_size_histogram.observe(len(batch))
+        try:
+            with tracing.use_traces([p.trace for p in batch]):
+                replies = self.chat_service.generate_batch(
+                    [(p.message, p.company_name, p.chat_name) for p in batch],
+                    [p.cancellation for p in batch],
+                    # Requests are keyed by user, which is also their conversation
+                    [p.user_key for p in batch]
+                )
+            for pending, reply in zip(batch, replies):
+                if pending.cancellation.should_stop():
+                    # Decoding was cut short: the partial reply is not an answer
+                    pending.future.set_exception(pending.cancellation.error())
+                else:
+                    pending.future.set_result(reply)
+        except Exception as e:
+            logger.error(f"Error en el lote de inferencia: {str(e)}", exc_info=True)
+            for pending in batch:
+                if not pending.future.done():
+                    pending.future.set_exception(e)
+        finally:
+            self._in_flight.release()
+
+    def _run_job(self, pending: _PendingRequest) -> None:
+        try:
+            pending.future.set_result(pending.job())
+        except Exception as e:
+            logger.error(f"Error en el trabajo de inferencia: {str(e)}", exc_info=True)
+            pending.future.set_exception(e)
+        finally:
+            self._in_flight.release()
@@ -0,0 +1,190 @@
+import glob
+import hashlib
+import json
+import logging
+import os
+import re
+from typing import Any, Iterator, List, Optional, Tuple
+
+from ..core import config
+from .embedding_index import text_hash
+
+logger = logging.getLogger(__name__)
+
+# Keys that describe the file rather than the company
+SKIPPED_KEYS = ("metadata", "last_updated")
+
+
+class Chunk:
+    """Fragmento del corpus listo para embeber, con su origen"""
+    __slots__ = ("text", "source", "key_path", "company", "hash")
+
+    def __init__(self, text: str, source: str, key_path: str, company: Optional[str] = None):
+        self.text = text
+        self.source = source
+        self.key_path = key_path
+        self.company = company
+        self.hash = text_hash(text)
+
+    def to_dict(self) -> dict:
+        return {"source": self.source, "key_path": self.key_path, "company": self.company, "hash": self.hash}
+
+
+class TextChunker:
+    """Cuenta y corta texto en tokens del tokenizer del modelo de embeddings
+
+    Sin tokenizer (o si no es "fast" y no da offsets) cada palabra cuenta
+    como un token, lo que sobreestima poco para textos en inglés.
+    """
+
+    def __init__(self, tokenizer=None, max_tokens: Optional[int] = None, overlap: Optional[int] = None):
+        self.tokenizer = tokenizer if getattr(tokenizer, "is_fast", False) else None
+        self.max_tokens = max_tokens or config.CHUNK_MAX_TOKENS
+        self.overlap = min(overlap if overlap is not None else config.CHUNK_OVERLAP_TOKENS, self.max_tokens // 2)
+
+    def _spans(self, text: str) -> List[Tuple[int, int]]:
+        if self.tokenizer is not None:
+            encoded = self.tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)
+            return [span for span in encoded["offset_mapping"] if span[1] > span[0]]
+        return [match.span() for match in re.finditer(r"\S+", text)]
+
+    def count(self, text: str) -> int:
+        return len(self._spans(text))
+
+    def split(self, text: str, max_tokens: Optional[int] = None) -> List[str]:
+        """Ventanas de hasta max_tokens tokens que se solapan en self.overlap tokens"""
+        max_tokens = max_tokens or self.max_tokens
+        spans = self._spans(text)
+        if len(spans) <= max_tokens:
+            return [text.strip()] if text.strip() else []
+        step = max(1, max_tokens - min(self.overlap, max_tokens // 2))
+        pieces = []
+        for start in range(0, len(spans), step):
+            window = spans[start:start + max_tokens]
+            pieces.append(text[window[0][0]:window[-1][1]].strip())
+            if start + max_tokens >= len(spans):
+                break
+        return pieces
+
+
+def discover_sources(data_dir: Optional[str] = None) -> List[str]:
+    """Todos los JSON del directorio de datos, en orden estable"""
+    return sorted(glob.glob(os.path.join(data_dir or config.DATA_DIR, "*.json")))
+
+
+def _render(value: Any, path: str = "") -> Iterator[str]:
+    """Aplana un subárbol a líneas "ruta: valor" relativas al nodo"""
+    if isinstance(value, dict):
+        for k, v in value.items():
+            if k not in SKIPPED_KEYS:
+                yield from _render(v, f"{path}.{k}" if path else k)
+    elif isinstance(value, list):
+        if all(not isinstance(item, (dict, list)) for item in value):
+            # Lists of short strings read better (and embed better) as one line
+            items = [str(item).strip() for item in value if str(item).strip()]
+            if items:
+                yield f"{path}: {'; '.join(items)}" if path else "; ".join(items)
+        else:
+            for item in value:
+                yield from _render(item, path)
+    elif value is not None and str(value).strip():
+        yield f"{path}: {str(value).strip()}" if path else str(value).strip()
+
+
+def _heading(key_path: str) -> str:
+    return re.sub(r"\[\d+\]", "", key_path).replace(".", " > ")
+
+
+def _sections(value: Any, key_path: str, chunker: TextChunker) -> Iterator[Tuple[str, List[str]]]:
+    """Divide el documento en secciones que entran en un chunk
+
+    Un subárbol que cabe entero es una sola sección, así los campos de un
+    mismo objeto (título y descripción de un servicio) quedan juntos; si no
+    cabe, sus campos simples forman una sección y los hijos compuestos se
+    tratan por separado.
+    """
+    lines = list(_render(value))
+    if not lines:
+        return
+    if chunker.count("\n".join(lines)) <= chunker.max_tokens or not isinstance(value, (dict, list)):
+        yield key_path, lines
+        return
+
+    if isinstance(value, list):
+        if all(not isinstance(item, (dict, list)) for item in value):
+            yield key_path, lines
+            return
+        for i, item in enumerate(value):
+            yield from _sections(item, f"{key_path}[{i}]", chunker)
+        return
+
+    simple = []
+    for k, v in value.items():
+        if k in SKIPPED_KEYS:
+            continue
+        child_path = f"{key_path}.{k}" if key_path else k
+        if isinstance(v, dict) or (isinstance(v, list) and any(isinstance(item, (dict, list)) for item in v)):
+            yield from _sections(v, child_path, chunker)
+        else:
+            simple.extend(_render(v, k))
+    if simple:
+        yield key_path, simple
+
+
+def chunk_document(data: Any, source: str, chunker: TextChunker) -> List[Chunk]:
+    company = data.get("metadata", {}).get("company_name") if isinstance(data, dict) else None
+    chunks = []
+    for key_path, lines in _sections(data, "", chunker):
+        heading = _heading(key_path)
+        prefix = f"{heading}\n" if heading else ""
+        budget = max(chunker.max_tokens - chunker.count(prefix), chunker.max_tokens // 2)
+
+        # Pack whole lines up to the budget; a line longer than that is split with overlap
+        current: List[str] = []
+        current_tokens = 0
+        for line in lines:
+            tokens = chunker.count(line)
+            if tokens > budget:
+                # Short fields before a long one (a heading, a title) are repeated on
+                # every piece of it instead of ending up as a chunk of their own
+                if current_tokens > budget // 4:
+                    chunks.append(Chunk(prefix + "\n".join(current), source, key_path, company))
+                    current, current_tokens = [], 0
+                lead = prefix + "".join(f"{text}\n" for text in current)
+                for piece in chunker.split(line, budget - current_tokens):
+                    chunks.append(Chunk(lead + piece, source, key_path, company))
+                current, current_tokens = [], 0
+                continue
+            if current and current_tokens + tokens > budget:
+                chunks.append(Chunk(prefix + "\n".join(current), source, key_path, company))
+                current, current_tokens = [], 0
+            current.append(line)
+            current_tokens += tokens
+        if current:
+            chunks.append(Chunk(prefix + "\n".join(current), source, key_path, company))
+    return chunks
+
+
+def load_chunks(chunker: TextChunker, data_dir: Optional[str] = None) -> Tuple[List[Chunk], str]:
+    """Lee todas las fuentes y devuelve los chunks sin duplicados y un digest del resultado"""
+    chunks: List[Chunk] = []
+    seen = set()
+    for path in discover_sources(data_dir):
+        source = os.path.basename(path)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"No se pudo leer {path}: {str(e)}")
+            continue
+        for chunk in chunk_document(data, source, chunker):
+            if chunk.hash not in seen:
+                seen.add(chunk.hash)
+                chunks.append(chunk)
+
+    digest = hashlib.sha256()
+    digest.update(f"{chunker.max_tokens}:{chunker.overlap}".encode("utf-8"))
+    for chunk in chunks:
+        digest.update(chunk.hash.encode("ascii"))
+    logger.info(f"{len(chunks)} chunks de {len(discover_sources(data_dir))} fuentes")
+    return chunks, digest.hexdigest()
@@ -0,0 +1,195 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from ..core import config
+from ..core.executors import run_in_db_pool
+from ..db import stats
+from ..db.db_models import Conversation, Interaction
+from .sentiment import classify_many
+
+logger = logging.getLogger(__name__)
+
+
+class InteractionRecord:
+    """Interacción pendiente de escribir; sin mensaje solo registra al usuario"""
+    __slots__ = ("user_email", "user_name", "timestamp", "user_message", "bot_response")
+
+    def __init__(
+        self,
+        user_email: str,
+        user_name: str,
+        timestamp: Optional[datetime] = None,
+        user_message: Optional[str] = None,
+        bot_response: Optional[str] = None
+    ):
+        self.user_email = user_email
+        self.user_name = user_name
+        self.timestamp = timestamp
+        self.user_message = user_message
+        self.bot_response = bot_response
+
+
+class InteractionLogWriter:
+    """Escritura diferida de interacciones en lotes
+
+    Los endpoints encolan registros sin tocar la base de datos; una tarea en
+    segundo plano los vuelca cuando se junta un lote o vence el intervalo,
+    con un upsert de conversaciones y un único executemany de interacciones.
+    """
+
+    def __init__(
+        self,
+        engine=None,
+        max_queue: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None
+    ):
+        self._engine = engine
+        self.max_queue = max_queue or config.LOG_QUEUE_SIZE
+        self.batch_size = batch_size or config.LOG_BATCH_SIZE
+        self.flush_interval = flush_interval if flush_interval is not None else config.LOG_FLUSH_INTERVAL
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._pending: List[InteractionRecord] = []
+        self._in_flight: Optional[asyncio.Future] = None
+        self.dropped = 0
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            from ..db.db_connection import engine
+            self._engine = engine
+        return self._engine
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Detiene la tarea y vuelca lo que quede en la cola"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        if self._in_flight is not None:
+            await self._in_flight
+        records, self._pending = self._pending, []
+        records.extend(self._drain(self._queue.qsize()))
+        for start in range(0, len(records), self.batch_size):
+            await self._flush(records[start:start + self.batch_size])
+
+    def log(self, record: InteractionRecord) -> bool:
+        """Encola un registro; devuelve False si la cola está llena y se descarta"""
+        if self._queue is None:
+            raise RuntimeError("InteractionLogWriter is not started")
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning(f"Interaction log queue full, dropped record for {record.user_email}")
+            return False
+
+    def _drain(self, limit: int) -> List[InteractionRecord]:
+        records = []
+        while len(records) < limit and not self._queue.empty():
+            records.append(self._queue.get_nowait())
+        return records
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            # Records being collected stay in _pending so stop() can still write them
+            self._pending = [await self._queue.get()]
+            deadline = loop.time() + self.flush_interval
+            while len(self._pending) < self.batch_size:
+                self._pending.extend(self._drain(self.batch_size - len(self._pending)))
+                remaining = deadline - loop.time()
+                if len(self._pending) >= self.batch_size or remaining <= 0:
+                    break
+                try:
+                    self._pending.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            records, self._pending = self._pending, []
+            # Shielded so a shutdown mid-write neither loses nor duplicates the batch
+            self._in_flight = asyncio.ensure_future(self._flush(records))
+            await asyncio.shield(self._in_flight)
+
+    async def _flush(self, records: List[InteractionRecord]) -> None:
+        if not records:
+            return
+        for attempt in range(2):
+            try:
+                await run_in_db_pool(self.write_batch, records)
+                return
+            except Exception as e:
+                logger.error(f"Error writing {len(records)} interactions (attempt {attempt + 1}): {str(e)}")
+                await asyncio.sleep(0.5)
+        self.dropped += len(records)
+
+    def write_batch(self, records: List[InteractionRecord]) -> None:
+        """Upsert de conversaciones e inserción en bloque de interacciones, en una transacción"""
+        users: Dict[str, str] = {}
+        for record in records:
+            users.setdefault(record.user_email, record.user_name)
+
+        with self.engine.begin() as conn:
+            dialect = conn.dialect.name
+            rows = [{"user_email": email, "user_name": name} for email, name in users.items()]
+            if dialect == "postgresql":
+                stmt = postgresql.insert(Conversation).on_conflict_do_nothing(index_elements=["user_email"])
+            elif dialect == "sqlite":
+                stmt = sqlite.insert(Conversation).on_conflict_do_nothing(index_elements=["user_email"])
+            else:
+                existing = set(conn.execute(
+                    select(Conversation.user_email).where(Conversation.user_email.in_(users))
+                ).scalars())
+                rows = [row for row in rows if row["user_email"] not in existing]
+                stmt = insert(Conversation)
+            created = 0
+            if rows:
+                rows = [dict(row, created_at=datetime.utcnow()) for row in rows]
+                if dialect in ("postgresql", "sqlite"):
+                    # RETURNING yields only the rows the conflict clause didn't skip
+                    created = len(conn.execute(stmt.returning(Conversation.id), rows).all())
+                else:
+                    conn.execute(stmt, rows)
+                    created = len(rows)
+
+            ids = dict(conn.execute(
+                select(Conversation.user_email, Conversation.id).where(Conversation.user_email.in_(users))
+            ).all())
+            messages = [record for record in records if record.user_message is not None]
+            sentiments = classify_many([record.user_message for record in messages])
+            interactions = [
+                {
+                    "conversation_id": ids[record.user_email],
+                    "timestamp": record.timestamp,
+                    "user_message": record.user_message,
+                    "bot_response": record.bot_response,
+                    "sentiment": sentiment
+                }
+                for record, sentiment in zip(messages, sentiments)
+            ]
+            if interactions:
+                conn.execute(insert(Interaction), interactions)
+            # Dashboard aggregates move with the data, in the same transaction
+            stats.apply_batch(conn, created, interactions)
+
+
+interaction_log = InteractionLogWriter()
@@ -0,0 +1,136 @@
+import logging
+import os
+from typing import Optional, Tuple
+
+import torch
+from transformers import AutoModelForCausalLM, AutoTokenizer
+
+from ..core import config
+
+logger = logging.getLogger(__name__)
+
+INFERENCE_MODES = ("auto", "fp16", "fp32", "bf16", "int8", "onnx")
+SPECULATIVE_METHODS = ("off", "prompt_lookup", "draft")
+
+
+def configure_threads() -> None:
+    """Aplica TORCH_NUM_THREADS / TORCH_INTEROP_THREADS si están definidos"""
+    if config.TORCH_NUM_THREADS > 0:
+        torch.set_num_threads(config.TORCH_NUM_THREADS)
+    if config.TORCH_INTEROP_THREADS > 0:
+        try:
+            torch.set_num_interop_threads(config.TORCH_INTEROP_THREADS)
+        except RuntimeError:
+            # Only allowed before the first parallel op; keep whatever is already set
+            logger.warning("No se pudo cambiar el número de hilos inter-op")
+    logger.info(f"torch usa {torch.get_num_threads()} hilos")
+
+
+def cpu_supports_bf16() -> bool:
+    """True si la CPU tiene instrucciones bf16 nativas (AVX512-BF16 o AMX)"""
+    try:
+        with open("/proc/cpuinfo", "r", encoding="utf-8") as f:
+            flags = f.read()
+    except OSError:
+        return False
+    return "avx512_bf16" in flags or "amx_bf16" in flags
+
+
+def resolve_mode(mode: Optional[str] = None) -> str:
+    mode = mode or config.INFERENCE_MODE
+    if mode not in INFERENCE_MODES:
+        raise ValueError(f"Modo de inferencia desconocido: {mode}")
+    if mode == "auto":
+        return "fp16" if torch.cuda.is_available() else "fp32"
+    if mode == "fp16" and not torch.cuda.is_available():
+        # fp16 matmuls on CPU are slow or silently upcast
+        logger.warning("fp16 sin CUDA; se usa fp32")
+        return "fp32"
+    if mode == "bf16" and not torch.cuda.is_available() and not cpu_supports_bf16():
+        logger.warning("La CPU no soporta bf16 nativo; se usa fp32")
+        return "fp32"
+    return mode
+
+
+def _load_onnx(model_name: str):
+    try:
+        from optimum.onnxruntime import ORTModelForCausalLM
+    except ImportError as e:
+        raise RuntimeError("INFERENCE_MODE=onnx requiere optimum[onnxruntime]") from e
+
+    export_dir = os.path.join(config.CACHE_DIR, "onnx", model_name.replace("/", "__"))
+    if os.path.isdir(export_dir):
+        return ORTModelForCausalLM.from_pretrained(export_dir)
+    logger.info(f"Exportando {model_name} a ONNX en {export_dir}")
+    model = ORTModelForCausalLM.from_pretrained(model_name, export=True)
+    model.save_pretrained(export_dir)
+    return model
+
+
+def load_causal_lm(model_name: Optional[str] = None, mode: Optional[str] = None) -> Tuple[object, object, str]:
+    """Carga tokenizer y modelo para el modo pedido; devuelve (modelo, tokenizer, modo efectivo)"""
+    model_name = model_name or config.LLM_MODEL_NAME
+    mode = resolve_mode(mode)
+    configure_threads()
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name, trust_remote_code=True)
+
+    if mode == "onnx":
+        return _load_onnx(model_name), tokenizer, mode
+
+    dtype = {"fp16": torch.float16, "bf16": torch.bfloat16}.get(mode, torch.float32)
+    if mode in ("fp16", "bf16") and torch.cuda.is_available():
+        model = AutoModelForCausalLM.from_pretrained(
+            model_name,
+            torch_dtype=dtype,
+            device_map="auto",
+            trust_remote_code=True
+        )
+    else:
+        model = AutoModelForCausalLM.from_pretrained(
+            model_name,
+            torch_dtype=dtype,
+            low_cpu_mem_usage=True,
+            trust_remote_code=True
+        )
+        if mode == "int8":
+            # Dynamic quantization: int8 weights for every Linear, activations quantized on the fly
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    model.eval()
+    logger.info(f"Modelo {model_name} cargado en modo {mode}")
+    return model, tokenizer, mode
+
+
+def speculative_kwargs(tokenizer, device=None, method: Optional[str] = None) -> dict:
+    """kwargs de generate() para la decodificación especulativa pedida; vacío si está apagada
+
+    La verificación de transformers acepta los tokens propuestos con el
+    criterio de muestreo especulativo, así que con do_sample la distribución
+    de salida es la del modelo principal, y con greedy la salida es idéntica.
+    """
+    method = method or config.SPECULATIVE_DECODING
+    if method not in SPECULATIVE_METHODS:
+        raise ValueError(f"Decodificación especulativa desconocida: {method}")
+    if method == "off":
+        return {}
+    if method == "prompt_lookup":
+        return {"prompt_lookup_num_tokens": config.PROMPT_LOOKUP_TOKENS}
+
+    if not config.DRAFT_MODEL_NAME:
+        raise ValueError("SPECULATIVE_DECODING=draft requiere DRAFT_MODEL_NAME")
+    draft = AutoModelForCausalLM.from_pretrained(
+        config.DRAFT_MODEL_NAME,
+        low_cpu_mem_usage=True,
+        trust_remote_code=True
+    )
+    if device is not None:
+        draft = draft.to(device)
+    draft.eval()
+    kwargs = {"assistant_model": draft}
+    draft_tokenizer = AutoTokenizer.from_pretrained(config.DRAFT_MODEL_NAME, trust_remote_code=True)
+    if draft_tokenizer.get_vocab() != tokenizer.get_vocab():
+        # Different vocabularies: drafts are re-tokenized for the main model (universal assisted decoding)
+        kwargs.update(tokenizer=tokenizer, assistant_tokenizer=draft_tokenizer)
+    logger.info(f"Decodificación especulativa con {config.DRAFT_MODEL_NAME} como borrador")
+    return kwargs
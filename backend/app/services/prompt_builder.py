@@ -0,0 +1,183 @@
+import copy
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+import torch
+
+from ..core import config
+
+logger = logging.getLogger(__name__)
+
+# Static per (chat_name, company_name): its KV cache is computed once and reused
+SYSTEM_TEMPLATE = """You are {chat_name}, a helpful AI assistant for {company_name}. Use the context to answer the question in a natural, conversational way. Be concise and direct.
+
+Guidelines:
+- If asked about services, give specific examples from the case studies
+- For technical questions, reference the company's capabilities and technologies
+- Keep a professional but friendly tone
+- If the information is not in the context, say so and suggest contacting the company directly
+
+"""
+# Earlier turns of the conversation, when there are any; part of the per-request suffix
+HISTORY_TEMPLATE = """Conversation so far:
+{history}
+
+"""
+# Per request: only this part is prefilled when the prefix KV cache is warm
+REQUEST_TEMPLATE = """Context:
+{context}
+
+Question: {question}
+
+Answer:"""
+
+# Below this many free tokens a partially fitting chunk is dropped rather than cut
+MIN_TRUNCATED_CHUNK_TOKENS = 32
+
+
+class BuiltPrompt:
+    __slots__ = ("prefix", "suffix", "context", "prompt_tokens")
+
+    def __init__(self, prefix: str, suffix: str, context: List[str], prompt_tokens: int):
+        self.prefix = prefix
+        self.suffix = suffix
+        self.context = context
+        self.prompt_tokens = prompt_tokens
+
+    @property
+    def text(self) -> str:
+        return self.prefix + self.suffix
+
+
+class PromptBuilder:
+    """Arma el prompt dentro del presupuesto de tokens del modelo
+
+    Cada sección aparece una sola vez: instrucciones fijas (prefijo), luego
+    historial de la conversación, contexto, pregunta y "Answer:". Los chunks
+    recuperados entran en orden de relevancia hasta agotar la ventana menos
+    los tokens reservados para la respuesta; el último que no entra entero
+    se recorta. El historial ocupa a lo sumo un cuarto del presupuesto.
+    """
+
+    def __init__(self, tokenizer, context_window: int, max_new_tokens: Optional[int] = None):
+        self.tokenizer = tokenizer
+        self.max_new_tokens = max_new_tokens or config.MAX_NEW_TOKENS
+        self.budget = context_window - self.max_new_tokens
+        if self.budget <= 0:
+            raise ValueError(f"MAX_NEW_TOKENS ({self.max_new_tokens}) no deja lugar al prompt en {context_window} tokens")
+
+    def _ids(self, text: str) -> List[int]:
+        return self.tokenizer(text, add_special_tokens=False)["input_ids"]
+
+    def count(self, text: str) -> int:
+        return len(self._ids(text))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        ids = self._ids(text)
+        if len(ids) <= max_tokens:
+            return text
+        return self.tokenizer.decode(ids[:max_tokens], skip_special_tokens=True).rstrip() + " ..."
+
+    def prefix(self, company_name: str, chat_name: str) -> str:
+        return SYSTEM_TEMPLATE.format(chat_name=chat_name, company_name=company_name)
+
+    def _fit_history(self, history: List[str]) -> str:
+        # Lines come oldest first (summary, recalled turns, recent turns): drop from the front
+        lines = list(history)
+        while lines:
+            text = HISTORY_TEMPLATE.format(history="\n".join(lines))
+            if self.count(text) <= self.budget // 4:
+                return text
+            lines.pop(0)
+        return ""
+
+    def build(
+        self,
+        question: str,
+        company_name: str,
+        chat_name: str,
+        context: List[str],
+        history: Optional[List[str]] = None
+    ) -> BuiltPrompt:
+        prefix = self.prefix(company_name, chat_name)
+        # A runaway question may take at most a quarter of the budget
+        question = self.truncate(question.strip(), self.budget // 4)
+        history_text = self._fit_history(history) if history else ""
+        # +1 for BOS; the scaffold counts every fixed token around the context
+        used = 1 + self.count(prefix) + self.count(history_text + REQUEST_TEMPLATE.format(context="", question=question))
+        remaining = self.budget - used
+
+        fitted = []
+        for text in context:
+            tokens = self.count(text) + 1  # newline separator
+            if tokens <= remaining:
+                fitted.append(text)
+                remaining -= tokens
+                continue
+            if remaining >= MIN_TRUNCATED_CHUNK_TOKENS:
+                fitted.append(self.truncate(text, remaining - 3))
+                remaining = 0
+            break
+
+        suffix = history_text + REQUEST_TEMPLATE.format(context="\n".join(fitted), question=question)
+        return BuiltPrompt(prefix, suffix, fitted, self.budget - remaining)
+
+
+def _expand_cache(past, batch_size: int):
+    if batch_size == 1:
+        return past
+    if hasattr(past, "batch_repeat_interleave"):
+        past.batch_repeat_interleave(batch_size)
+        return past
+    # Legacy tuple-of-tuples format
+    return tuple(
+        tuple(tensor.repeat_interleave(batch_size, dim=0) for tensor in layer)
+        for layer in past
+    )
+
+
+class PrefixKVCache:
+    """Caché LRU de past_key_values del prefijo fijo del prompt
+
+    El prefijo depende solo del modelo, el nombre del chat y la empresa,
+    así que su prefill se hace una vez; generate() recibe una copia y solo
+    procesa el resto del prompt.
+    """
+
+    def __init__(self, model, tokenizer, max_entries: Optional[int] = None):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.max_entries = max_entries or config.PREFIX_CACHE_SIZE
+        self._entries: "OrderedDict[str, Tuple[torch.Tensor, object]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _compute(self, prefix: str) -> Tuple[torch.Tensor, object]:
+        ids = self.tokenizer(prefix, return_tensors="pt")["input_ids"].to(self.model.device)
+        with torch.no_grad():
+            past = self.model(input_ids=ids, use_cache=True).past_key_values
+        return ids, past
+
+    def get(self, prefix: str, batch_size: int = 1) -> Tuple[torch.Tensor, object]:
+        """Devuelve los ids del prefijo y una copia de su caché, repetida batch_size veces"""
+        with self._lock:
+            entry = self._entries.get(prefix)
+            if entry is None:
+                self.misses += 1
+                entry = self._compute(prefix)
+                self._entries[prefix] = entry
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            else:
+                self.hits += 1
+                self._entries.move_to_end(prefix)
+        ids, past = entry
+        # generate() appends to the cache in place, so each call gets its own copy
+        return ids, _expand_cache(copy.deepcopy(past), batch_size)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
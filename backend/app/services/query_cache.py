@@ -0,0 +1,84 @@
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+import numpy as np
+
+from ..core import config
+
+QUERY_CACHE_DTYPES = ("float32", "float16")
+
+
+class QueryEmbeddingCache:
+    """LRU de embeddings de consultas, acotado en bytes
+
+    La clave es el texto con los espacios colapsados (y en minúsculas si el
+    modelo no distingue mayúsculas), así que solo une consultas que el
+    modelo codificaría igual. Los vectores se guardan en float16 o float32
+    y se devuelven en float32.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None, dtype: Optional[str] = None, lowercase: bool = False):
+        self.max_bytes = max_bytes if max_bytes is not None else int(config.QUERY_CACHE_MAX_MB * 1024 * 1024)
+        dtype = dtype or config.QUERY_CACHE_DTYPE
+        if dtype not in QUERY_CACHE_DTYPES:
+            raise ValueError(f"QUERY_CACHE_DTYPE desconocido: {dtype}")
+        self.dtype = np.dtype(dtype)
+        self.lowercase = lowercase
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, query: str) -> str:
+        key = " ".join(query.split())
+        return key.lower() if self.lowercase else key
+
+    def get_many(self, keys: List[str]) -> List[Optional[np.ndarray]]:
+        found = []
+        with self._lock:
+            for key in keys:
+                vector = self._entries.get(key)
+                if vector is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+                    self._entries.move_to_end(key)
+                found.append(vector)
+        return [vector.astype(np.float32) if vector is not None else None for vector in found]
+
+    def put_many(self, keys: List[str], vectors: np.ndarray) -> None:
+        with self._lock:
+            for key, vector in zip(keys, vectors):
+                stored = np.ascontiguousarray(vector, dtype=self.dtype)
+                if self._size(key, stored) > self.max_bytes:
+                    continue
+                previous = self._entries.pop(key, None)
+                if previous is not None:
+                    self.nbytes -= self._size(key, previous)
+                self._entries[key] = stored
+                self.nbytes += self._size(key, stored)
+                while self.nbytes > self.max_bytes:
+                    evicted_key, evicted = self._entries.popitem(last=False)
+                    self.nbytes -= self._size(evicted_key, evicted)
+
+    @staticmethod
+    def _size(key: str, vector: np.ndarray) -> int:
+        # The key counts too: long queries cost more than their vector alone
+        return vector.nbytes + len(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.nbytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
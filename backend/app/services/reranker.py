@@ -0,0 +1,65 @@
+import logging
+import threading
+import time
+from typing import List, Optional, Sequence
+
+from ..core import config
+
+logger = logging.getLogger(__name__)
+
+
+class Reranker:
+    """Reordena los mejores candidatos con un cross-encoder, dentro de un presupuesto de tiempo
+
+    Mide el costo por par (media móvil) y solo puntúa tantos candidatos
+    como entran en RERANK_BUDGET_MS; además corta entre lotes si el
+    presupuesto se agota. Los candidatos no puntuados quedan detrás, en el
+    orden de la fusión.
+    """
+
+    def __init__(
+        self,
+        model_name: Optional[str] = None,
+        top_n: Optional[int] = None,
+        budget_ms: Optional[float] = None,
+        batch_size: int = 8
+    ):
+        from sentence_transformers import CrossEncoder
+
+        self.model_name = model_name or config.RERANK_MODEL_NAME
+        self.model = CrossEncoder(self.model_name)
+        self.top_n = top_n or config.RERANK_TOP_N
+        self.budget = (budget_ms if budget_ms is not None else config.RERANK_BUDGET_MS) / 1000
+        self.batch_size = batch_size
+        self._seconds_per_pair: Optional[float] = None
+        self._lock = threading.Lock()
+        self.truncated = 0
+
+    def rerank(self, query: str, candidates: Sequence[int], texts: Sequence[str]) -> List[int]:
+        """Devuelve los candidatos reordenados; texts[i] es el texto del candidato i"""
+        limit = min(self.top_n, len(candidates))
+        with self._lock:
+            if self._seconds_per_pair:
+                limit = min(limit, max(1, int(self.budget / self._seconds_per_pair)))
+
+        start = time.perf_counter()
+        scored = []
+        for offset in range(0, limit, self.batch_size):
+            batch = candidates[offset:min(offset + self.batch_size, limit)]
+            scores = self.model.predict([(query, texts[i]) for i in batch])
+            scored.extend(zip(batch, scores))
+            if time.perf_counter() - start > self.budget:
+                break
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            per_pair = elapsed / max(len(scored), 1)
+            self._seconds_per_pair = (
+                per_pair if self._seconds_per_pair is None
+                else 0.8 * self._seconds_per_pair + 0.2 * per_pair
+            )
+            if len(scored) < min(self.top_n, len(candidates)):
+                self.truncated += 1
+
+        reranked = [i for i, _ in sorted(scored, key=lambda item: item[1], reverse=True)]
+        return reranked + list(candidates[len(scored):])
@@ -0,0 +1,160 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from ..core import config
+
+CacheKey = Tuple[str, str, str]
+
+
+def normalize_message(message: str) -> str:
+    """Minúsculas, espacios colapsados y sin puntuación final"""
+    return re.sub(r"\s+", " ", message).strip().lower().rstrip("?!.¿¡ ")
+
+
+class _Entry:
+    __slots__ = ("reply", "embedding", "expires_at")
+
+    def __init__(self, reply: str, embedding: Optional[np.ndarray], expires_at: float):
+        self.reply = reply
+        self.embedding = embedding
+        self.expires_at = expires_at
+
+
+class ResponseCache:
+    """Caché de respuestas en dos niveles: exacto (LRU) y semántico (coseno)
+
+    Las entradas se agrupan por (company_name, chat_name); el nivel semántico
+    solo compara embeddings dentro del mismo grupo. Todo el caché se vacía
+    cuando cambia la versión del corpus.
+    """
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        ttl_seconds: Optional[float] = None,
+        similarity_threshold: Optional[float] = None
+    ):
+        self.max_entries = max_entries or config.RESPONSE_CACHE_SIZE
+        self.ttl = ttl_seconds if ttl_seconds is not None else config.RESPONSE_CACHE_TTL
+        self.similarity_threshold = (
+            similarity_threshold if similarity_threshold is not None
+            else config.RESPONSE_CACHE_SIMILARITY
+        )
+        self._entries: "OrderedDict[CacheKey, _Entry]" = OrderedDict()
+        # Per-partition embedding matrices, rebuilt lazily after inserts/evictions
+        self._partitions: Dict[Tuple[str, str], Tuple[list, np.ndarray]] = {}
+        self._corpus_version = None
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    def sync_corpus_version(self, version) -> None:
+        """Invalida todo el caché si el corpus se reinicializó"""
+        with self._lock:
+            if version != self._corpus_version:
+                self._clear()
+                self._corpus_version = version
+
+    def get_exact(self, message: str, company_name: str, chat_name: str) -> Optional[str]:
+        with self._lock:
+            entry = self._lookup((normalize_message(message), company_name, chat_name))
+            if entry is None:
+                return None
+            self.exact_hits += 1
+            return entry.reply
+
+    def get(
+        self,
+        message: str,
+        company_name: str,
+        chat_name: str,
+        query_embedding: Optional[np.ndarray] = None
+    ) -> Optional[str]:
+        key = (normalize_message(message), company_name, chat_name)
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is not None:
+                self.exact_hits += 1
+                return entry.reply
+            if query_embedding is not None:
+                match = self._semantic_lookup(company_name, chat_name, query_embedding)
+                if match is not None:
+                    self.semantic_hits += 1
+                    return match.reply
+            self.misses += 1
+            return None
+
+    def put(
+        self,
+        message: str,
+        company_name: str,
+        chat_name: str,
+        reply: str,
+        query_embedding: Optional[np.ndarray] = None
+    ) -> None:
+        key = (normalize_message(message), company_name, chat_name)
+        embedding = None
+        if query_embedding is not None:
+            embedding = np.asarray(query_embedding, dtype=np.float32).ravel()
+        with self._lock:
+            self._entries[key] = _Entry(reply, embedding, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            self._partitions.pop(key[1:], None)
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self._partitions.pop(evicted[1:], None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+            }
+
+    def _clear(self) -> None:
+        self._entries.clear()
+        self._partitions.clear()
+
+    def _lookup(self, key: CacheKey) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at < time.monotonic():
+            del self._entries[key]
+            self._partitions.pop(key[1:], None)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _semantic_lookup(self, company_name: str, chat_name: str, query_embedding: np.ndarray) -> Optional[_Entry]:
+        partition = (company_name, chat_name)
+        if partition not in self._partitions:
+            keys = [
+                key for key, entry in self._entries.items()
+                if key[1:] == partition and entry.embedding is not None
+            ]
+            if not keys:
+                return None
+            matrix = np.stack([self._entries[key].embedding for key in keys])
+            self._partitions[partition] = (keys, matrix)
+        keys, matrix = self._partitions[partition]
+        scores = matrix @ np.asarray(query_embedding, dtype=np.float32).ravel()
+        candidates = np.flatnonzero(scores >= self.similarity_threshold)
+        # Best first; expired entries are evicted by _lookup and the next one is tried
+        for i in candidates[np.argsort(-scores[candidates])]:
+            entry = self._lookup(keys[i])
+            if entry is not None:
+                return entry
+        return None
@@ -0,0 +1,62 @@
+"""Sentimiento de los mensajes del usuario con una heurística de léxico, no con un modelo
+
+Es una lista de palabras con peso (inglés y español) más un manejo simple
+de negaciones: no entiende ironía, contexto ni otros idiomas. Se eligió
+por costo: corre dentro de la transacción del log de interacciones y de
+la migración que clasifica lo existente, sin cargar un modelo ni competir
+con el LLM por CPU/GPU. Para etiquetas más precisas, un clasificador por
+lotes puede reemplazar a classify_many() con la misma interfaz.
+"""
+import re
+from typing import List, Optional
+
+# Labels shown in the admin dashboard
+POSITIVE = "positive"
+NEGATIVE = "negative"
+NEUTRAL = "neutral"
+
+# Small English/Spanish lexicon; weights are summed over the message
+LEXICON = {
+    # positive
+    "thanks": 2, "thank": 2, "thx": 1, "great": 2, "good": 1, "excellent": 2, "awesome": 2,
+    "perfect": 2, "helpful": 2, "useful": 1, "love": 2, "nice": 1, "amazing": 2, "clear": 1,
+    "appreciate": 2, "happy": 1, "works": 1, "solved": 2, "cool": 1,
+    "gracias": 2, "genial": 2, "bueno": 1, "buena": 1, "excelente": 2, "perfecto": 2,
+    "útil": 2, "util": 2, "claro": 1, "encanta": 2, "increíble": 2, "funciona": 1, "resuelto": 2,
+    # negative
+    "bad": -1, "wrong": -2, "error": -1, "useless": -2, "terrible": -2, "awful": -2, "hate": -2,
+    "broken": -2, "slow": -1, "confusing": -1, "frustrated": -2, "frustrating": -2, "annoying": -2,
+    "fail": -2, "failed": -2, "problem": -1, "issue": -1, "doesn't": -1, "poor": -1, "worst": -2,
+    "malo": -1, "mala": -1, "mal": -1, "inútil": -2, "inutil": -2, "horrible": -2, "lento": -1,
+    "falla": -2, "fallo": -2, "problema": -1, "incorrecto": -2, "odio": -2, "peor": -2,
+}
+# A negation flips the words that follow it, up to NEGATION_SCOPE tokens
+NEGATIONS = {"not", "no", "never", "don't", "isn't", "wasn't", "didn't", "nunca", "ni", "tampoco"}
+NEGATION_SCOPE = 3
+
+TOKEN_PATTERN = re.compile(r"[\w']+")
+
+
+def classify(message: Optional[str]) -> str:
+    """positive / negative / neutral según la suma de pesos del léxico"""
+    if not message:
+        return NEUTRAL
+    score = 0
+    negated = 0
+    for token in TOKEN_PATTERN.findall(message.lower()):
+        if token in NEGATIONS:
+            negated = NEGATION_SCOPE
+            continue
+        weight = LEXICON.get(token, 0)
+        score += -weight if negated else weight
+        negated = max(negated - 1, 0)
+    if score > 0:
+        return POSITIVE
+    if score < 0:
+        return NEGATIVE
+    return NEUTRAL
+
+
+def classify_many(messages: List[Optional[str]]) -> List[str]:
+    """Clasifica un lote de mensajes, p. ej. el de cada escritura del log de interacciones"""
+    return [classify(message) for message in messages]
@@ -0,0 +1,222 @@
+import json
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from ..core import config
+from .bm25 import BM25Index
+from .embedding_index import EmbeddingIndex, IndexSnapshot
+from .ingestion import Chunk, TextChunker, discover_sources, load_chunks
+
+logger = logging.getLogger(__name__)
+
+
+def tenant_slug(company_name: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", company_name.lower()).strip("-")
+
+
+class _Tenant:
+    __slots__ = ("slug", "company", "data_dir", "index", "load_lock")
+
+    def __init__(self, slug: str, company: str, data_dir: str, index: EmbeddingIndex):
+        self.slug = slug
+        self.company = company
+        self.data_dir = data_dir
+        self.index = index
+        self.load_lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self.index.snapshot.key is not None
+
+
+class TenantIndexes:
+    """Un índice de embeddings por empresa, cargado bajo demanda
+
+    Las fuentes de la raíz de DATA_DIR son de la empresa indicada en su
+    metadata; cada subdirectorio con JSON es otra empresa. Los índices se
+    abren al primer uso sobre su archivo mapeado ("spilled") y pasan a
+    memoria mientras quepan en TENANT_INDEX_MEMORY_MB, en orden LRU.
+
+    La admisión es por frecuencia (como TinyLFU): para hacer lugar, una
+    empresa solo desplaza a las residentes menos usadas que ella; si no, se
+    sigue sirviendo desde el mmap. Así una ráfaga de empresas frías no saca
+    de memoria a las calientes. Las frecuencias se dividen por dos cada
+    cierto número de accesos para que el historial viejo pierda peso.
+    """
+
+    def __init__(
+        self,
+        model,
+        model_name: str,
+        chunker: TextChunker,
+        data_dir: Optional[str] = None,
+        cache_dir: Optional[str] = None,
+        memory_cap_mb: Optional[float] = None
+    ):
+        self.model = model
+        self.model_name = model_name
+        self.chunker = chunker
+        self.data_dir = data_dir or config.DATA_DIR
+        self.cache_dir = os.path.join(cache_dir or config.CACHE_DIR, "tenants")
+        cap = memory_cap_mb if memory_cap_mb is not None else config.TENANT_INDEX_MEMORY_MB
+        self.memory_cap = int(cap * 1024 * 1024)
+        self.default_slug: Optional[str] = None
+        self._tenants: Dict[str, _Tenant] = {}
+        self._resident: "OrderedDict[str, int]" = OrderedDict()
+        self._frequency: Dict[str, int] = {}
+        self._accesses = 0
+        self._lock = threading.Lock()
+        self.spills = 0
+        self.rejected_admissions = 0
+
+    @property
+    def resident_bytes(self) -> int:
+        return sum(self._resident.values())
+
+    def discover(self) -> List[str]:
+        """Relee DATA_DIR y registra las empresas; devuelve sus slugs"""
+        found = {}
+        default_slug = None
+        root_sources = discover_sources(self.data_dir)
+        if root_sources:
+            company = self._company_of(root_sources) or config.DEFAULT_COMPANY
+            default_slug = tenant_slug(company)
+            found[default_slug] = (company, self.data_dir)
+        for entry in sorted(os.listdir(self.data_dir)) if os.path.isdir(self.data_dir) else []:
+            path = os.path.join(self.data_dir, entry)
+            sources = discover_sources(path) if os.path.isdir(path) else []
+            if sources:
+                company = self._company_of(sources) or entry
+                found.setdefault(tenant_slug(company), (company, path))
+
+        with self._lock:
+            for slug, (company, path) in found.items():
+                if slug not in self._tenants:
+                    index = EmbeddingIndex(self.model, self.model_name, os.path.join(self.cache_dir, slug))
+                    self._tenants[slug] = _Tenant(slug, company, path, index)
+            for slug in set(self._tenants) - set(found):
+                self._resident.pop(slug, None)
+                del self._tenants[slug]
+            self.default_slug = default_slug
+        return list(found)
+
+    @staticmethod
+    def _company_of(sources: List[str]) -> Optional[str]:
+        for path in sources:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    company = json.load(f).get("metadata", {}).get("company_name")
+            except (OSError, ValueError, AttributeError):
+                continue
+            if company:
+                return company
+        return None
+
+    def resolve(self, company_name: Optional[str]) -> Optional[_Tenant]:
+        """Empresa que atiende la petición; None si no hay datos para ese nombre"""
+        slug = tenant_slug(company_name) if company_name else self.default_slug
+        return self._tenants.get(slug) if slug else None
+
+    def snapshot(self, company_name: Optional[str] = None) -> Optional[IndexSnapshot]:
+        tenant = self.resolve(company_name)
+        if tenant is None:
+            return None
+        if not tenant.loaded:
+            self._load(tenant, resident=False)
+        self._admit(tenant)
+        return tenant.index.snapshot
+
+    def _load(self, tenant: _Tenant, resident: bool) -> None:
+        with tenant.load_lock:
+            if tenant.loaded:
+                return
+            chunks, digest = load_chunks(self.chunker, tenant.data_dir)
+            if not chunks:
+                chunks = [Chunk("No hay información disponible", "fallback", "", tenant.company)]
+            # Unchanged sources hit the on-disk cache, so this is just opening the mmap
+            tenant.index.build(
+                [chunk.text for chunk in chunks], digest, items=chunks, resident=resident,
+                lexical=self._lexical(chunks)
+            )
+            logger.info(f"Índice de {tenant.company} abierto ({len(chunks)} chunks)")
+
+    @staticmethod
+    def _lexical(chunks: List[Chunk]) -> Optional[BM25Index]:
+        # Built at ingest with the chunks so both swap in together
+        return BM25Index([chunk.text for chunk in chunks]) if config.HYBRID_RETRIEVAL else None
+
+    def _touch(self, slug: str) -> int:
+        self._accesses += 1
+        if self._accesses >= 32 * max(len(self._tenants), 1):
+            self._accesses = 0
+            self._frequency = {s: f // 2 for s, f in self._frequency.items() if f > 1}
+        self._frequency[slug] = self._frequency.get(slug, 0) + 1
+        return self._frequency[slug]
+
+    def _admit(self, tenant: _Tenant) -> None:
+        with self._lock:
+            frequency = self._touch(tenant.slug)
+            if tenant.slug in self._resident:
+                self._resident.move_to_end(tenant.slug)
+                return
+            size = int(tenant.index.matrix.nbytes)
+            if size > self.memory_cap:
+                return
+
+            # Walk the LRU order for victims; any victim used at least as often wins
+            victims, freed = [], 0
+            needed = self.resident_bytes + size - self.memory_cap
+            for slug, resident_size in self._resident.items():
+                if freed >= needed:
+                    break
+                if self._frequency.get(slug, 0) >= frequency:
+                    self.rejected_admissions += 1
+                    return
+                victims.append(slug)
+                freed += resident_size
+            for slug in victims:
+                del self._resident[slug]
+            # Reserve the space now; the copy into memory happens outside the lock
+            self._resident[tenant.slug] = size
+
+        for slug in victims:
+            victim = self._tenants.get(slug)
+            if victim is not None:
+                victim.index.set_resident(False)
+                self.spills += 1
+        tenant.index.set_resident(True)
+
+    def reload(self) -> None:
+        """Relee las fuentes de las empresas ya cargadas; el resto se abrirá al usarlas"""
+        self.discover()
+        for tenant in list(self._tenants.values()):
+            if not tenant.loaded:
+                continue
+            chunks, digest = load_chunks(self.chunker, tenant.data_dir)
+            if not chunks:
+                chunks = [Chunk("No hay información disponible", "fallback", "", tenant.company)]
+            with self._lock:
+                resident = tenant.slug in self._resident
+            tenant.index.build(
+                [chunk.text for chunk in chunks], digest, items=chunks, resident=resident,
+                lexical=self._lexical(chunks)
+            )
+            with self._lock:
+                if tenant.slug in self._resident:
+                    self._resident[tenant.slug] = tenant.index.snapshot.resident_bytes
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "tenants": len(self._tenants),
+                "loaded": sum(1 for tenant in self._tenants.values() if tenant.loaded),
+                "resident": list(self._resident),
+                "resident_bytes": self.resident_bytes,
+                "memory_cap_bytes": self.memory_cap,
+                "spills": self.spills,
+                "rejected_admissions": self.rejected_admissions,
+            }
@@ -0,0 +1,240 @@
+import logging
+import os
+from abc import ABC, abstractmethod
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from ..core import config
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("numpy", "faiss-flat", "faiss-hnsw", "faiss-ivf")
+
+
+def _as_matrix(vectors: np.ndarray) -> np.ndarray:
+    return np.ascontiguousarray(np.atleast_2d(vectors), dtype=np.float32)
+
+
+class VectorStore(ABC):
+    """Almacén de vectores normalizados con búsqueda por producto interno"""
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    @abstractmethod
+    def add(self, ids: Iterable[int], vectors: np.ndarray) -> None:
+        ...
+
+    @abstractmethod
+    def remove(self, ids: Iterable[int]) -> None:
+        ...
+
+    @abstractmethod
+    def search(self, query: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        """Devuelve (id, similitud) de los k vectores más cercanos"""
+
+    def search_many(self, queries: np.ndarray, k: int) -> List[List[Tuple[int, float]]]:
+        """search() para cada fila de queries"""
+        return [self.search(query, k) for query in _as_matrix(queries)]
+
+    @abstractmethod
+    def save(self, path: str) -> None:
+        ...
+
+    @classmethod
+    @abstractmethod
+    def load(cls, path: str) -> "VectorStore":
+        ...
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+
+class NumpyVectorStore(VectorStore):
+    """Búsqueda exacta sobre una matriz float32 contigua (admite mmap)"""
+
+    def __init__(self, dim: int, matrix: Optional[np.ndarray] = None, ids: Optional[np.ndarray] = None):
+        super().__init__(dim)
+        self.matrix = matrix if matrix is not None else np.zeros((0, dim), dtype=np.float32)
+        if ids is None:
+            ids = np.arange(self.matrix.shape[0], dtype=np.int64)
+        self.ids = np.asarray(ids, dtype=np.int64)
+
+    def add(self, ids: Iterable[int], vectors: np.ndarray) -> None:
+        vectors = _as_matrix(vectors)
+        self.matrix = np.concatenate([self.matrix, vectors]) if len(self) else vectors
+        self.ids = np.concatenate([self.ids, np.asarray(list(ids), dtype=np.int64)])
+
+    def remove(self, ids: Iterable[int]) -> None:
+        keep = ~np.isin(self.ids, np.asarray(list(ids), dtype=np.int64))
+        self.matrix = np.ascontiguousarray(self.matrix[keep])
+        self.ids = self.ids[keep]
+
+    def search(self, query: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        n = len(self)
+        if n == 0 or k <= 0:
+            return []
+        scores = self.matrix @ query.astype(np.float32).ravel()
+        if k < n:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(n)
+        top = top[np.argsort(-scores[top])]
+        return [(int(self.ids[i]), float(scores[i])) for i in top]
+
+    def search_many(self, queries: np.ndarray, k: int) -> List[List[Tuple[int, float]]]:
+        # One matrix multiply scores every query against the corpus
+        queries = _as_matrix(queries)
+        n = len(self)
+        if n == 0 or k <= 0:
+            return [[] for _ in queries]
+        scores = queries @ self.matrix.T
+        if k < n:
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            top = np.broadcast_to(np.arange(n), (len(queries), n))
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        return [
+            [(int(self.ids[i]), float(score)) for i, score in zip(row, row_scores)]
+            for row, row_scores in zip(top, top_scores)
+        ]
+
+    def save(self, path: str) -> None:
+        np.save(f"{path}.npy", np.ascontiguousarray(self.matrix))
+        np.save(f"{path}.ids.npy", self.ids)
+
+    @classmethod
+    def load(cls, path: str) -> "NumpyVectorStore":
+        matrix = np.load(f"{path}.npy", mmap_mode="r")
+        ids = np.load(f"{path}.ids.npy")
+        return cls(matrix.shape[1], matrix=matrix, ids=ids)
+
+    def __len__(self) -> int:
+        return int(self.matrix.shape[0])
+
+
+class FaissVectorStore(VectorStore):
+    """Índice FAISS (flat, HNSW o IVF) sobre producto interno"""
+
+    def __init__(self, dim: int, kind: str = "flat", index=None):
+        super().__init__(dim)
+        try:
+            import faiss
+        except ImportError as e:
+            raise RuntimeError("faiss-cpu no está instalado") from e
+        self._faiss = faiss
+        self.kind = kind
+        # HNSW can't delete in place, so removed ids are filtered at query time
+        self.deleted = set()
+        self.index = index if index is not None else self._new_index()
+        if kind == "hnsw":
+            self._hnsw().hnsw.efSearch = config.HNSW_EF_SEARCH
+        elif kind == "ivf" and self.index.is_trained:
+            self._ivf().nprobe = config.IVF_NPROBE
+
+    def _new_index(self, nlist: Optional[int] = None):
+        faiss = self._faiss
+        if self.kind == "flat":
+            inner = faiss.IndexFlatIP(self.dim)
+        elif self.kind == "hnsw":
+            inner = faiss.IndexHNSWFlat(self.dim, config.HNSW_M, faiss.METRIC_INNER_PRODUCT)
+            inner.hnsw.efConstruction = config.HNSW_EF_CONSTRUCTION
+        elif self.kind == "ivf":
+            quantizer = faiss.IndexFlatIP(self.dim)
+            # IVF stores ids natively; an IDMap would desync on remove_ids
+            return faiss.IndexIVFFlat(
+                quantizer, self.dim, nlist or config.IVF_NLIST, faiss.METRIC_INNER_PRODUCT
+            )
+        else:
+            raise ValueError(f"Tipo de índice FAISS desconocido: {self.kind}")
+        return faiss.IndexIDMap2(inner)
+
+    def _hnsw(self):
+        return self._faiss.downcast_index(self.index.index)
+
+    def _ivf(self):
+        return self._faiss.extract_index_ivf(self.index)
+
+    def add(self, ids: Iterable[int], vectors: np.ndarray) -> None:
+        vectors = _as_matrix(vectors)
+        ids = np.asarray(list(ids), dtype=np.int64)
+        if self.kind == "ivf" and not self.index.is_trained:
+            # IVF needs ~39 training points per list; shrink nlist for small corpora
+            nlist = max(1, min(config.IVF_NLIST, len(vectors) // 39))
+            self.index = self._new_index(nlist)
+            self.index.train(vectors)
+            self._ivf().nprobe = min(config.IVF_NPROBE, nlist)
+        self.deleted.difference_update(ids.tolist())
+        self.index.add_with_ids(vectors, ids)
+
+    def remove(self, ids: Iterable[int]) -> None:
+        ids = np.asarray(list(ids), dtype=np.int64)
+        if self.kind == "hnsw":
+            self.deleted.update(ids.tolist())
+        else:
+            self.index.remove_ids(ids)
+
+    def search(self, query: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        if len(self) == 0 or k <= 0:
+            return []
+        fetch = min(k + len(self.deleted), self.index.ntotal)
+        scores, ids = self.index.search(_as_matrix(query), fetch)
+        results = [
+            (int(i), float(s)) for i, s in zip(ids[0], scores[0])
+            if i != -1 and int(i) not in self.deleted
+        ]
+        return results[:k]
+
+    def search_many(self, queries: np.ndarray, k: int) -> List[List[Tuple[int, float]]]:
+        queries = _as_matrix(queries)
+        if len(self) == 0 or k <= 0:
+            return [[] for _ in queries]
+        fetch = min(k + len(self.deleted), self.index.ntotal)
+        scores, ids = self.index.search(queries, fetch)
+        return [
+            [
+                (int(i), float(s)) for i, s in zip(row_ids, row_scores)
+                if i != -1 and int(i) not in self.deleted
+            ][:k]
+            for row_ids, row_scores in zip(ids, scores)
+        ]
+
+    def save(self, path: str) -> None:
+        self._faiss.write_index(self.index, f"{path}.faiss")
+        np.save(f"{path}.deleted.npy", np.asarray(sorted(self.deleted), dtype=np.int64))
+
+    @classmethod
+    def load(cls, path: str, kind: str = "flat") -> "FaissVectorStore":
+        import faiss
+        index = faiss.read_index(f"{path}.faiss")
+        store = cls(index.d, kind=kind, index=index)
+        if os.path.exists(f"{path}.deleted.npy"):
+            store.deleted = set(np.load(f"{path}.deleted.npy").tolist())
+        return store
+
+    def __len__(self) -> int:
+        return int(self.index.ntotal) - len(self.deleted)
+
+
+def create_vector_store(dim: int, backend: Optional[str] = None) -> VectorStore:
+    """Crea el almacén configurado en VECTOR_STORE_BACKEND"""
+    backend = backend or config.VECTOR_STORE_BACKEND
+    if backend == "numpy":
+        return NumpyVectorStore(dim)
+    if backend.startswith("faiss-"):
+        return FaissVectorStore(dim, kind=backend[len("faiss-"):])
+    raise ValueError(f"Backend de vectores desconocido: {backend}")
+
+
+def load_vector_store(path: str, backend: Optional[str] = None) -> VectorStore:
+    backend = backend or config.VECTOR_STORE_BACKEND
+    if backend == "numpy":
+        return NumpyVectorStore.load(path)
+    if backend.startswith("faiss-"):
+        return FaissVectorStore.load(path, kind=backend[len("faiss-"):])
+    raise ValueError(f"Backend de vectores desconocido: {backend}")
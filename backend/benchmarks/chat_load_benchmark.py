@@ -0,0 +1,266 @@
+"""Concurrent load and retrieval benchmark for the chat backend, without real models.
+
+The load phase drives the /api/chat path (exact cache check, micro-batching
+scheduler, generate_batch) and the interaction log with many concurrent users.
+StubEmbedder and FakeLLM from benchmarks/fakes.py stand in for the models, and
+SQLite stands in for Postgres. It reports throughput and p50/p95/p99 latency for
+the end-to-end request and each stage (embed, retrieve, generate, db_write,
+db_read).
+
+The micro phase times get_relevant_context and get_relevant_context_many
+against synthetic corpora of 1k, 100k and 1M chunks.
+
+    python -m benchmarks.chat_load_benchmark --concurrency 64 --requests 5000 --output results.json
+    python -m benchmarks.chat_load_benchmark --skip-load --micro-sizes 1000 100000 1000000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import datetime
+from typing import List
+
+import numpy as np
+
+# Settle the environment before app modules read it: scratch DB and cache dirs
+os.environ.setdefault("DATABASE_URL", "sqlite:///chat_load_benchmark.db")
+os.environ.setdefault("CACHE_DIR", tempfile.mkdtemp(prefix="chat-bench-cache-"))
+
+from sqlalchemy.orm import selectinload, sessionmaker
+
+from app.core import executors
+from app.db.db_connection import engine
+from app.db.db_models import Base, Conversation
+from app.db.migrations import run_migrations
+from app.services.embedding_index import IndexSnapshot
+from app.services.embedding_service import EmbeddingService
+from app.services.inference_scheduler import InferenceScheduler, QueueFullError
+from app.services.interaction_logger import InteractionLogWriter, InteractionRecord
+from app.services.vector_store import NumpyVectorStore, create_vector_store
+
+from benchmarks.fakes import FakeChatService, FakeLLM, StageRecorder, StubEmbedder, percentile
+
+QUESTIONS = [
+    "What services does Promtior offer?",
+    "Tell me about your case studies",
+    "When was the company founded?",
+    "Do you work with banks?",
+    "What is a bionic organization?",
+    "How do you apply predictive analytics?",
+    "Which industries do you serve?",
+    "How can I contact you?",
+    "What results did the retail case study get?",
+    "Do you build chatbots for customer service?",
+]
+TOPICS = "pricing onboarding latency integration security training roadmap budget data privacy".split()
+
+
+def make_questions(total: int, repeat_ratio: float, seed: int = 0) -> List[str]:
+    """Mezcla preguntas frecuentes (aciertos de caché) con preguntas únicas"""
+    rng = random.Random(seed)
+    return [
+        rng.choice(QUESTIONS) if rng.random() < repeat_ratio
+        else f"Question {i}: how does Promtior handle {rng.choice(TOPICS)} for {rng.choice(TOPICS)}?"
+        for i in range(total)
+    ]
+
+
+async def run_load(args, embedding_service: EmbeddingService) -> dict:
+    recorder = StageRecorder()
+    llm = FakeLLM(args.prefill_ms_per_token, args.decode_ms_per_step, args.max_new_tokens)
+    chat_service = FakeChatService(embedding_service, llm, recorder)
+    scheduler = InferenceScheduler(chat_service, max_queue_depth=args.queue_depth)
+    scheduler.start()
+
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    writer = InteractionLogWriter(engine=engine)
+    write_batch = writer.write_batch
+
+    def timed_write_batch(records):
+        with recorder.timed("db_write"):
+            write_batch(records)
+
+    writer.write_batch = timed_write_batch
+    await writer.start()
+    Session = sessionmaker(bind=engine)
+
+    def read_history(user_email: str):
+        # Same query as GET /api/interactions/{user_email}
+        db = Session()
+        try:
+            return db.query(Conversation).options(
+                selectinload(Conversation.interactions)
+            ).filter(Conversation.user_email == user_email).first()
+        finally:
+            db.close()
+
+    questions = make_questions(args.requests, args.repeat_ratio)
+    next_index = iter(range(len(questions)))
+    rejected = 0
+
+    async def user(user_id: int) -> None:
+        nonlocal rejected
+        email = f"bench{user_id}@example.com"
+        for i in next_index:
+            question = questions[i]
+            start = time.perf_counter()
+            try:
+                reply = chat_service.get_cached_reply(question, "Promtior", "Promtior AI Assistant")
+                if reply is None:
+                    reply = await scheduler.generate(question, "Promtior", "Promtior AI Assistant", user_key=email)
+            except QueueFullError:
+                rejected += 1
+                continue
+            recorder.record("chat", time.perf_counter() - start)
+            writer.log(InteractionRecord(
+                user_email=email,
+                user_name=f"Bench User {user_id}",
+                timestamp=datetime.utcnow(),
+                user_message=question,
+                bot_response=reply
+            ))
+            if args.read_every and i % args.read_every == 0:
+                with recorder.timed("db_read"):
+                    await executors.run_in_db_pool(read_history, email)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user(u) for u in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+    await writer.stop()
+    scheduler.stop(timeout=30)
+
+    completed = len(recorder.samples.get("chat", []))
+    cache = chat_service.response_cache.stats() if chat_service.response_cache else None
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "completed": completed,
+        "rejected": rejected,
+        "dropped_log_records": writer.dropped,
+        "throughput_rps": round(completed / elapsed, 2),
+        "mean_batch_size": round(float(np.mean(chat_service.batch_sizes)), 2) if chat_service.batch_sizes else 0,
+        "response_cache": cache,
+        "stages": recorder.summary(elapsed),
+    }
+
+
+class _SyntheticItem:
+    __slots__ = ("text",)
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _SyntheticItems:
+    """Secuencia de n chunks que arma cada texto al pedirlo, para no ocupar memoria"""
+
+    def __init__(self, size: int):
+        self.size = size
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __getitem__(self, i: int) -> _SyntheticItem:
+        return _SyntheticItem(f"synthetic chunk {i}")
+
+
+class _FixedTenants:
+    def __init__(self, snapshot: IndexSnapshot):
+        self._snapshot = snapshot
+
+    def snapshot(self, company_name=None) -> IndexSnapshot:
+        return self._snapshot
+
+
+def random_unit_rows(rng: np.random.Generator, n: int, dim: int) -> np.ndarray:
+    matrix = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, 100_000):
+        rows = rng.standard_normal((min(100_000, n - start), dim), dtype=np.float32)
+        matrix[start:start + len(rows)] = rows / np.linalg.norm(rows, axis=1, keepdims=True)
+    return matrix
+
+
+def run_micro(args, embedding_service: EmbeddingService) -> dict:
+    rng = np.random.default_rng(0)
+    queries = random_unit_rows(rng, args.micro_queries, args.dim)
+    results = {}
+    original = embedding_service.tenants
+    try:
+        for size in args.micro_sizes:
+            matrix = random_unit_rows(rng, size, args.dim)
+            if args.backend == "numpy":
+                store = NumpyVectorStore(args.dim, matrix=matrix)
+            else:
+                store = create_vector_store(args.dim, args.backend)
+                store.add(range(size), matrix)
+            embedding_service.tenants = _FixedTenants(
+                IndexSnapshot("micro", matrix, store, _SyntheticItems(size), resident=True)
+            )
+
+            single = []
+            for query in queries:
+                start = time.perf_counter()
+                embedding_service.get_relevant_context("q", k=args.k, query_embedding=query)
+                single.append((time.perf_counter() - start) * 1000)
+
+            batched = []
+            for start_row in range(0, len(queries), args.micro_batch):
+                batch = queries[start_row:start_row + args.micro_batch]
+                start = time.perf_counter()
+                embedding_service.get_relevant_context_many(["q"] * len(batch), k=args.k, query_embeddings=batch)
+                batched.append((time.perf_counter() - start) * 1000 / len(batch))
+
+            results[str(size)] = {
+                "single_p50_ms": round(percentile(single, 50), 3),
+                "single_p95_ms": round(percentile(single, 95), 3),
+                "single_p99_ms": round(percentile(single, 99), 3),
+                f"batch{args.micro_batch}_per_query_p50_ms": round(percentile(batched, 50), 3),
+            }
+            print(f"{size} chunks: {results[str(size)]}")
+            del matrix, store
+    finally:
+        embedding_service.tenants = original
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--repeat-ratio", type=float, default=0.3, help="share of repeated (cacheable) questions")
+    parser.add_argument("--read-every", type=int, default=10, help="read a user's history every N requests (0 = never)")
+    parser.add_argument("--queue-depth", type=int, default=1024)
+    parser.add_argument("--embed-base-ms", type=float, default=1.0)
+    parser.add_argument("--embed-per-text-ms", type=float, default=0.2)
+    parser.add_argument("--prefill-ms-per-token", type=float, default=0.05)
+    parser.add_argument("--decode-ms-per-step", type=float, default=2.0)
+    parser.add_argument("--max-new-tokens", type=int, default=32)
+    parser.add_argument("--micro-sizes", type=int, nargs="*", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--micro-queries", type=int, default=200)
+    parser.add_argument("--micro-batch", type=int, default=32)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("-k", type=int, default=3)
+    parser.add_argument("--backend", default="numpy", help="vector store for the micro phase")
+    parser.add_argument("--skip-load", action="store_true")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    embedding_service = EmbeddingService(model=StubEmbedder(args.dim, args.embed_base_ms, args.embed_per_text_ms))
+    results = {}
+    if not args.skip_load:
+        results["load"] = asyncio.run(run_load(args, embedding_service))
+        print(json.dumps(results["load"], indent=2))
+    if args.micro_sizes:
+        results["micro"] = run_micro(args, embedding_service)
+    executors.shutdown()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"params": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
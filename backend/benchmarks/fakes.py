@@ -0,0 +1,227 @@
+"""Deterministic stand-ins for the models, for benchmarks that must not load them.
+
+StubEmbedder hashes words into a fixed-size vector (so related texts still land
+close together) and FakeLLM charges a fixed cost per prompt token and per decode
+step. FakeChatService runs the same pipeline as ChatService (embed, response
+cache, retrieval, prompt, generate) on top of them, and records how long each
+stage takes in a StageRecorder.
+"""
+import hashlib
+import re
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app.core import config
+from app.services.response_cache import ResponseCache
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def percentile(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+class StageRecorder:
+    """Duraciones por etapa, en segundos; append es atómico bajo el GIL"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float) -> None:
+        samples = self.samples.get(stage)
+        if samples is None:
+            with self._lock:
+                samples = self.samples.setdefault(stage, [])
+        samples.append(seconds)
+
+    def timed(self, stage: str):
+        recorder = self
+
+        class _Span:
+            def __enter__(self):
+                self.start = time.perf_counter()
+
+            def __exit__(self, *exc):
+                recorder.record(stage, time.perf_counter() - self.start)
+
+        return _Span()
+
+    def summary(self, elapsed: Optional[float] = None) -> Dict[str, dict]:
+        result = {}
+        for stage, samples in sorted(self.samples.items()):
+            ms = [s * 1000 for s in samples]
+            result[stage] = {
+                "count": len(ms),
+                "mean_ms": round(sum(ms) / len(ms), 3),
+                "p50_ms": round(percentile(ms, 50), 3),
+                "p95_ms": round(percentile(ms, 95), 3),
+                "p99_ms": round(percentile(ms, 99), 3),
+            }
+            if elapsed:
+                result[stage]["per_s"] = round(len(ms) / elapsed, 2)
+        return result
+
+
+class StubEmbedder:
+    """Bag-of-words con hashing: determinista y sin modelo
+
+    encode() cuesta base_ms por llamada más per_text_ms por texto, para que
+    el batching de consultas se note igual que con un modelo real.
+    """
+
+    tokenizer = None
+
+    def __init__(self, dim: int = 384, base_ms: float = 0.0, per_text_ms: float = 0.0):
+        self.dim = dim
+        self.base_ms = base_ms
+        self.per_text_ms = per_text_ms
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def _vector(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in WORD_PATTERN.findall(text.lower()):
+            digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+            slot = int.from_bytes(digest[:4], "little") % self.dim
+            vector[slot] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def encode(self, texts: List[str], normalize_embeddings: bool = True, convert_to_numpy: bool = True, **kwargs):
+        cost = self.base_ms + self.per_text_ms * len(texts)
+        if cost:
+            time.sleep(cost / 1000)
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.stack([self._vector(text) for text in texts])
+
+
+class FakeLLM:
+    """Modelo de costo fijo: prefill por token de prompt y decode por paso del lote
+
+    Todas las filas de un lote decodifican en paralelo, como en generate()
+    con padding, así que un lote cuesta casi lo mismo que una petición sola.
+    La respuesta sale de las primeras palabras del contexto: siempre la misma
+    para el mismo prompt.
+    """
+
+    def __init__(self, prefill_ms_per_token: float = 0.05, decode_ms_per_step: float = 2.0, max_new_tokens: int = 32):
+        self.prefill_ms_per_token = prefill_ms_per_token
+        self.decode_ms_per_step = decode_ms_per_step
+        self.max_new_tokens = max_new_tokens
+
+    def reply_words(self, prompt: str) -> List[str]:
+        words = WORD_PATTERN.findall(prompt.split("Context:")[-1])
+        return words[:self.max_new_tokens] or ["ok"]
+
+    def generate(self, prompts: List[str]) -> List[str]:
+        prompt_tokens = sum(len(prompt.split()) for prompt in prompts)
+        time.sleep((prompt_tokens * self.prefill_ms_per_token + self.max_new_tokens * self.decode_ms_per_step) / 1000)
+        return [" ".join(self.reply_words(prompt)) for prompt in prompts]
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        time.sleep(len(prompt.split()) * self.prefill_ms_per_token / 1000)
+        for word in self.reply_words(prompt):
+            time.sleep(self.decode_ms_per_step / 1000)
+            yield f"{word} "
+
+
+class FakeChatService:
+    """Misma interfaz que ChatService, con StubEmbedder/FakeLLM detrás"""
+
+    def __init__(self, embedding_service, llm: Optional[FakeLLM] = None, recorder: Optional[StageRecorder] = None):
+        self.embedding_service = embedding_service
+        self.llm = llm or FakeLLM()
+        self.recorder = recorder or StageRecorder()
+        self.response_cache = ResponseCache() if config.RESPONSE_CACHE_ENABLED else None
+        self.model = self.llm
+        # No conversation memory: every request is answered on its own
+        self.memory = None
+        self.batch_sizes: List[int] = []
+
+    def warm_up(self) -> None:
+        self.generate_batch([("warm up", "Promtior", "Promtior AI Assistant")])
+
+    def _prompt(self, question: str, company_name: str, chat_name: str, context: List[str]) -> str:
+        return (
+            f"You are {chat_name}, a helpful AI assistant for {company_name}.\n\n"
+            "Context:\n" + "\n".join(context) + f"\n\nQuestion: {question}\n\nAnswer:"
+        )
+
+    def generate_response(self, input_text: str, company_name: str, chat_name: str = "Promtior AI Assistant") -> str:
+        return self.generate_batch([(input_text, company_name, chat_name)])[0]
+
+    def generate_batch(
+        self, requests: List[Tuple[str, str, str]], cancellations: Optional[list] = None, conversations: Optional[list] = None
+    ) -> List[str]:
+        with self.recorder.timed("embed"):
+            query_embeddings = self.embedding_service.encode_queries([question for question, _, _ in requests])
+        replies = [
+            self._cached_response(question, company_name, chat_name, embedding)
+            for (question, company_name, chat_name), embedding in zip(requests, query_embeddings)
+        ]
+        pending = [i for i, reply in enumerate(replies) if reply is None]
+        self.batch_sizes.append(len(requests))
+        if not pending:
+            return replies
+
+        with self.recorder.timed("retrieve"):
+            contexts = self.embedding_service.get_relevant_context_many(
+                [requests[i][0] for i in pending],
+                query_embeddings=query_embeddings[pending],
+                company_names=[requests[i][1] for i in pending]
+            )
+        prompts = [
+            self._prompt(requests[i][0], requests[i][1], requests[i][2], context)
+            for i, context in zip(pending, contexts)
+        ]
+        with self.recorder.timed("generate"):
+            texts = self.llm.generate(prompts)
+        for i, text in zip(pending, texts):
+            replies[i] = text
+            self._cache_response(*requests[i], text, query_embeddings[i])
+        return replies
+
+    def stream_response(
+        self, input_text: str, company_name: str, chat_name: str = "Promtior AI Assistant",
+        cancellation=None, conversation: Optional[str] = None, submit=None
+    ) -> Iterator[str]:
+        query_embedding = self.embedding_service.encode_query(input_text)
+        cached = self._cached_response(input_text, company_name, chat_name, query_embedding)
+        if cached is not None:
+            yield cached
+            return
+        context = self.embedding_service.get_relevant_context(
+            input_text, query_embedding=query_embedding, company_name=company_name
+        )
+        reply = []
+        for token in self.llm.stream(self._prompt(input_text, company_name, chat_name, context)):
+            if cancellation is not None and cancellation.should_stop():
+                raise cancellation.error()
+            reply.append(token)
+            yield token
+        self._cache_response(input_text, company_name, chat_name, "".join(reply).strip(), query_embedding)
+
+    def _cached_response(self, input_text: str, company_name: str, chat_name: str, query_embedding) -> Optional[str]:
+        if self.response_cache is None:
+            return None
+        self.response_cache.sync_corpus_version(self.embedding_service.corpus_version)
+        return self.response_cache.get(input_text, company_name, chat_name, query_embedding)
+
+    def _cache_response(self, input_text: str, company_name: str, chat_name: str, reply: str, query_embedding) -> None:
+        if self.response_cache is not None and reply:
+            self.response_cache.put(input_text, company_name, chat_name, reply, query_embedding)
+
+    def get_cached_reply(self, input_text: str, company_name: str, chat_name: str) -> Optional[str]:
+        if self.response_cache is None:
+            return None
+        self.response_cache.sync_corpus_version(self.embedding_service.corpus_version)
+        return self.response_cache.get_exact(input_text, company_name, chat_name)
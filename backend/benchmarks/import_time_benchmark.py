@@ -0,0 +1,89 @@
+"""Import-time profile of the backend, kept as a startup regression check.
+
+Each run imports the target modules in a fresh interpreter with
+`python -X importtime`. It reports the wall time and the slowest modules by
+cumulative import time. It fails (exit code 1) when a module of the ML stack
+gets imported on the way, or when the median import exceeds --budget-ms.
+Models must only load inside the lifespan, never at import.
+
+    python -m benchmarks.import_time_benchmark
+    python -m benchmarks.import_time_benchmark --modules app.api.health app.db.db_connection --budget-ms 500
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+# Heavy dependencies that only the inference lifecycle may import
+FORBIDDEN = ("torch", "transformers", "sentence_transformers", "huggingface_hub", "faiss", "langchain")
+
+
+def profile(modules: List[str]) -> Tuple[float, Dict[str, int], List[str]]:
+    """Importa en un intérprete nuevo; devuelve segundos, µs acumulados por módulo y los prohibidos cargados"""
+    code = (
+        "import json, sys\n"
+        + "".join(f"import {module}\n" for module in modules)
+        + f"print(json.dumps([m for m in {FORBIDDEN!r} if m in sys.modules]))\n"
+    )
+    env = dict(os.environ)
+    # db_connection builds its engine at import; a scratch URL keeps the run self-contained
+    env.setdefault("DATABASE_URL", "sqlite:///import_time_benchmark.db")
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True, env=env, check=True
+    )
+    elapsed = time.perf_counter() - start
+
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, self_us, cumulative_us, name = [part.strip() for part in line.replace("import time:", "|").split("|")]
+        cumulative[name] = int(cumulative_us)
+    return elapsed, cumulative, json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modules", nargs="*", default=["app.main"])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="slowest modules to list")
+    parser.add_argument("--budget-ms", type=float, default=1000, help="fail above this median wall time")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    runs, cumulative, forbidden = [], {}, []
+    for _ in range(args.repeat):
+        elapsed, cumulative, forbidden = profile(args.modules)
+        runs.append(elapsed * 1000)
+    median_ms = statistics.median(runs)
+    slowest = sorted(cumulative.items(), key=lambda item: item[1], reverse=True)[:args.top]
+
+    print(f"import {' '.join(args.modules)}: median {median_ms:.0f} ms over {args.repeat} runs (incl. interpreter start)")
+    for name, us in slowest:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+    if forbidden:
+        print(f"FAIL: ML modules imported at startup: {', '.join(forbidden)}")
+    if median_ms > args.budget_ms:
+        print(f"FAIL: median {median_ms:.0f} ms exceeds the {args.budget_ms:.0f} ms budget")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "params": vars(args),
+                "median_ms": round(median_ms, 1),
+                "runs_ms": [round(ms, 1) for ms in runs],
+                "slowest_ms": {name: round(us / 1000, 1) for name, us in slowest},
+                "forbidden_imported": forbidden,
+            }, f, indent=2)
+    if forbidden or median_ms > args.budget_ms:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
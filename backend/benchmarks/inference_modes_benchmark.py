@@ -0,0 +1,102 @@
+"""Tokens/sec and memory comparison across CPU inference modes.
+
+Each mode is loaded in a fresh process so resident memory is measured in
+isolation. Decoding is greedy with a fixed number of new tokens, so every
+mode does the same amount of work on the same prompts.
+
+    python -m benchmarks.inference_modes_benchmark --modes fp32 bf16 int8 onnx --threads 8
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from typing import Dict, List
+
+PROMPTS = [
+    "You are Promtior AI Assistant. Question: What services does Promtior offer?\nAnswer:",
+    "You are Promtior AI Assistant. Question: When was the company founded?\nAnswer:",
+    "You are Promtior AI Assistant. Question: Describe a case study in retail.\nAnswer:",
+]
+
+
+def _rss_mb() -> Dict[str, float]:
+    values = {}
+    with open("/proc/self/status", "r", encoding="utf-8") as f:
+        for line in f:
+            if line.startswith(("VmRSS:", "VmHWM:")):
+                key, amount, _ = line.split()
+                values[key.rstrip(":")] = round(int(amount) / 1024, 1)
+    return values
+
+
+def _run_mode(mode: str, threads: int, max_new_tokens: int, queue) -> None:
+    if threads:
+        os.environ["TORCH_NUM_THREADS"] = str(threads)
+    import torch
+    from app.services.model_loader import load_causal_lm
+
+    try:
+        start = time.perf_counter()
+        model, tokenizer, effective_mode = load_causal_lm(mode=mode)
+        load_s = time.perf_counter() - start
+        memory_after_load = _rss_mb()
+
+        new_tokens, elapsed = 0, 0.0
+        for prompt in PROMPTS:
+            inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
+            start = time.perf_counter()
+            with torch.no_grad():
+                output = model.generate(
+                    **inputs,
+                    max_new_tokens=max_new_tokens,
+                    min_new_tokens=max_new_tokens,
+                    do_sample=False,
+                    pad_token_id=tokenizer.eos_token_id
+                )
+            elapsed += time.perf_counter() - start
+            new_tokens += output.shape[1] - inputs["input_ids"].shape[1]
+
+        queue.put({
+            "mode": mode,
+            "effective_mode": effective_mode,
+            "threads": torch.get_num_threads(),
+            "load_s": round(load_s, 2),
+            "tokens_per_s": round(new_tokens / elapsed, 2),
+            "rss_after_load_mb": memory_after_load.get("VmRSS"),
+            "peak_rss_mb": _rss_mb().get("VmHWM"),
+        })
+    except Exception as e:
+        queue.put({"mode": mode, "error": str(e)})
+
+
+def run(modes: List[str], threads: int, max_new_tokens: int) -> List[dict]:
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+    for mode in modes:
+        queue = ctx.Queue()
+        process = ctx.Process(target=_run_mode, args=(mode, threads, max_new_tokens, queue))
+        process.start()
+        result = queue.get()
+        process.join()
+        print(result)
+        results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", nargs="+", default=["fp32", "bf16", "int8", "onnx"])
+    parser.add_argument("--threads", type=int, default=0, help="torch threads (0 = default)")
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    results = run(args.modes, args.threads, args.max_new_tokens)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"params": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
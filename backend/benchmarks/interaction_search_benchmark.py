@@ -0,0 +1,138 @@
+"""Interaction lookup/search benchmark on a synthetic dataset.
+
+Fills a database with synthetic conversations and interactions, then times
+the legacy sequential-scan queries against the indexed ones from
+app/db/search.py. Uses a throwaway SQLite file unless --database-url points
+at a scratch Postgres database (its tables are dropped first).
+
+    python -m benchmarks.interaction_search_benchmark --interactions 1000000
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.orm import sessionmaker
+
+# app.db.db_connection builds its engine on import; the benchmark uses its own
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app.db.db_models import Base, Conversation, Interaction
+from app.db.migrations import run_migrations
+from app.db.search import message_filter, user_name_filter
+
+WORDS = (
+    "genai adoption predictive analytics automation consulting chatbot pricing "
+    "services case study retail banking onboarding latency support integration "
+    "workflow assistant training data privacy roadmap budget timeline team"
+).split()
+# Zipf-like vocabulary: a few very common words and a long tail of rare ones
+VOCABULARY = WORDS + [f"term{i}" for i in range(20_000)]
+CUM_WEIGHTS = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(VOCABULARY))))
+NAMES = "Ana Bruno Carla Diego Elena Facundo Gabriela Hugo Ines Juan Laura Martin Nora Pablo Rosa".split()
+
+
+def populate(engine, conversations: int, interactions: int, seed: int = 0) -> None:
+    rng = random.Random(seed)
+    with engine.begin() as conn:
+        # Start from scratch so every migration (and FTS rebuild) runs on the new data
+        conn.execute(text("DROP TABLE IF EXISTS schema_migrations"))
+        if engine.dialect.name == "sqlite":
+            conn.execute(text("DROP TABLE IF EXISTS conversations_fts"))
+            conn.execute(text("DROP TABLE IF EXISTS interactions_fts"))
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    start = datetime(2024, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(Conversation), [
+            {
+                "id": i + 1,
+                "user_email": f"user{i}@example.com",
+                "user_name": f"{rng.choice(NAMES)} {rng.choice(NAMES)}son {i}",
+                "created_at": start,
+            }
+            for i in range(conversations)
+        ])
+        batch = []
+        for i in range(interactions):
+            batch.append({
+                "conversation_id": rng.randint(1, conversations),
+                "timestamp": start + timedelta(seconds=i * 7),
+                "user_message": " ".join(rng.choices(VOCABULARY, cum_weights=CUM_WEIGHTS, k=8)),
+                "bot_response": " ".join(rng.choices(VOCABULARY, cum_weights=CUM_WEIGHTS, k=24)),
+            })
+            if len(batch) == 20_000:
+                conn.execute(insert(Interaction), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(Interaction), batch)
+
+
+def timed(fn, repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {"median_ms": round(statistics.median(samples), 2), "max_ms": round(max(samples), 2)}
+
+
+def run(database_url: str, conversations: int, interactions: int, repeat: int) -> dict:
+    engine = create_engine(database_url)
+    Session = sessionmaker(bind=engine)
+
+    started = time.perf_counter()
+    populate(engine, conversations, interactions)
+    run_migrations(engine)
+    print(f"Populated {interactions} interactions in {time.perf_counter() - started:.1f}s")
+
+    db = Session()
+    email = f"user{conversations // 2}@example.com"
+    conversation_id = conversations // 2
+    name, term = "Carla", "predictive term120"
+
+    results = {
+        "email_lookup": timed(lambda: db.query(Conversation).filter(
+            Conversation.user_email == email).first(), repeat),
+        "history_by_conversation": timed(lambda: db.query(Interaction).filter(
+            Interaction.conversation_id == conversation_id
+        ).order_by(Interaction.timestamp.desc()).limit(50).all(), repeat),
+        "name_search_legacy_ilike": timed(lambda: db.query(Conversation.id).filter(
+            Conversation.user_name.ilike(f"%{name}%")).all(), repeat),
+        "name_search_indexed": timed(lambda: db.query(Conversation.id).filter(
+            user_name_filter(db, name)).all(), repeat),
+        "message_search_legacy_ilike": timed(lambda: db.query(Interaction.id).filter(
+            (Interaction.user_message.ilike("%predictive%") | Interaction.bot_response.ilike("%predictive%"))
+            & (Interaction.user_message.ilike("%term120 %") | Interaction.bot_response.ilike("%term120 %"))
+        ).limit(500).all(), repeat),
+        "message_search_indexed": timed(lambda: db.query(Interaction.id).filter(
+            message_filter(db, term)).limit(500).all(), repeat),
+    }
+    db.close()
+    for name_, result in results.items():
+        print(f"{name_}: {result}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default="sqlite:///interaction_search_benchmark.db")
+    parser.add_argument("--conversations", type=int, default=50_000)
+    parser.add_argument("--interactions", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    results = run(args.database_url, args.conversations, args.interactions, args.repeat)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"params": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""Speculative decoding benchmark: acceptance rate and tokens/sec against plain decoding.
+
+Prompts are built like ChatService builds them: BM25 picks chunks of the
+corpus in app/data and PromptBuilder fits them into the context window. That
+gives prompt lookup real context to copy from. Each method generates the same
+answers. Greedy runs must produce exactly the plain-decoding tokens. Sampled
+runs use ChatService's settings. The optional parity check compares their
+token distributions with plain sampling (total variation distance per
+position).
+
+    python -m benchmarks.speculative_decoding_benchmark --methods off prompt_lookup
+    DRAFT_MODEL_NAME=... python -m benchmarks.speculative_decoding_benchmark --methods off draft --parity-samples 200
+"""
+import argparse
+import json
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+QUESTIONS = [
+    "What services does Promtior offer?",
+    "When was the company founded?",
+    "Tell me about your case studies",
+    "Do you work with banks?",
+    "What is a bionic organization?",
+]
+SAMPLING = dict(temperature=0.7, top_p=0.95, repetition_penalty=1.15, do_sample=True)
+
+
+class DraftCounter:
+    """Cuenta los tokens que propone el generador de candidatos de transformers"""
+
+    def __init__(self):
+        self.proposed = 0
+
+    def install(self) -> None:
+        from transformers.generation import candidate_generator
+
+        for name in (
+            "AssistedCandidateGenerator",
+            "AssistedCandidateGeneratorDifferentTokenizers",
+            "PromptLookupCandidateGenerator",
+        ):
+            cls = getattr(candidate_generator, name, None)
+            if cls is None or "get_candidates" not in vars(cls):
+                continue
+            original = cls.get_candidates
+
+            def get_candidates(generator, input_ids, *args, _original=original, **kwargs):
+                candidates, logits = _original(generator, input_ids, *args, **kwargs)
+                self.proposed += candidates.shape[-1] - input_ids.shape[-1]
+                return candidates, logits
+
+            cls.get_candidates = get_candidates
+
+
+def build_prompts(tokenizer, context_window: int, max_new_tokens: int) -> List[str]:
+    from app.services.bm25 import BM25Index
+    from app.services.ingestion import TextChunker, load_chunks
+    from app.services.prompt_builder import PromptBuilder
+
+    chunks, _ = load_chunks(TextChunker())
+    texts = [chunk.text for chunk in chunks]
+    lexical = BM25Index(texts)
+    builder = PromptBuilder(tokenizer, context_window, max_new_tokens)
+    return [
+        builder.build(question, "Promtior", "Promtior AI Assistant", [texts[i] for i, _ in lexical.search(question, 3)]).text
+        for question in QUESTIONS
+    ]
+
+
+def run_method(model, tokenizer, prompts: List[str], method_kwargs: dict, generation: dict, counter: DraftCounter, seed: int) -> dict:
+    import torch
+
+    forwards = 0
+
+    def count_forward(module, args, output):
+        nonlocal forwards
+        forwards += 1
+
+    hook = model.register_forward_hook(count_forward)
+    counter.proposed = 0
+    outputs, new_tokens, elapsed = [], 0, 0.0
+    try:
+        for i, prompt in enumerate(prompts):
+            inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
+            torch.manual_seed(seed + i)
+            start = time.perf_counter()
+            with torch.no_grad():
+                output = model.generate(**inputs, **generation, **method_kwargs, pad_token_id=tokenizer.eos_token_id)
+            elapsed += time.perf_counter() - start
+            generated = output[0, inputs["input_ids"].shape[1]:].tolist()
+            outputs.append(generated)
+            new_tokens += len(generated)
+    finally:
+        hook.remove()
+
+    # Every verification pass yields its accepted drafts plus one token of its own
+    accepted = new_tokens - forwards
+    return {
+        "new_tokens": new_tokens,
+        "tokens_per_s": round(new_tokens / elapsed, 2),
+        "target_forwards": forwards,
+        "tokens_per_forward": round(new_tokens / max(forwards, 1), 2),
+        "proposed": counter.proposed,
+        "acceptance_rate": round(accepted / counter.proposed, 3) if counter.proposed else None,
+        "outputs": outputs,
+    }
+
+
+def total_variation(samples_a: List[List[int]], samples_b: List[List[int]], positions: int) -> List[float]:
+    """Distancia de variación total entre las distribuciones de token en cada posición"""
+    distances = []
+    for position in range(positions):
+        a = Counter(sample[position] for sample in samples_a if len(sample) > position)
+        b = Counter(sample[position] for sample in samples_b if len(sample) > position)
+        total_a, total_b = sum(a.values()) or 1, sum(b.values()) or 1
+        distances.append(round(0.5 * sum(abs(a[t] / total_a - b[t] / total_b) for t in set(a) | set(b)), 3))
+    return distances
+
+
+def sample_many(model, tokenizer, prompt: str, method_kwargs: dict, samples: int, tokens: int, seed: int) -> List[List[int]]:
+    import torch
+
+    inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
+    results = []
+    for i in range(samples):
+        torch.manual_seed(seed + i)
+        with torch.no_grad():
+            output = model.generate(
+                **inputs, **SAMPLING, **method_kwargs,
+                max_new_tokens=tokens, pad_token_id=tokenizer.eos_token_id
+            )
+        results.append(output[0, inputs["input_ids"].shape[1]:].tolist())
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--methods", nargs="+", default=["off", "prompt_lookup", "draft"])
+    parser.add_argument("--mode", default=None, help="INFERENCE_MODE for the chat model")
+    parser.add_argument("--max-new-tokens", type=int, default=128)
+    parser.add_argument("--context-window", type=int, default=1024)
+    parser.add_argument("--parity-samples", type=int, default=0, help="sampled generations per method for the parity check")
+    parser.add_argument("--parity-tokens", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    from app.core import config
+    from app.services.model_loader import load_causal_lm, speculative_kwargs
+
+    model, tokenizer, mode = load_causal_lm(mode=args.mode)
+    prompts = build_prompts(tokenizer, args.context_window, args.max_new_tokens)
+    counter = DraftCounter()
+    counter.install()
+
+    methods: Dict[str, dict] = {}
+    for method in args.methods:
+        if method == "draft" and not config.DRAFT_MODEL_NAME:
+            print("draft: skipped (set DRAFT_MODEL_NAME)")
+            continue
+        methods[method] = speculative_kwargs(tokenizer, model.device, method)
+
+    greedy = dict(max_new_tokens=args.max_new_tokens, do_sample=False)
+    sampled = dict(SAMPLING, max_new_tokens=args.max_new_tokens)
+    results = {}
+    baseline: Optional[List[List[int]]] = None
+    parity_baseline: Optional[List[List[int]]] = None
+    for method, method_kwargs in methods.items():
+        result = {"greedy": run_method(model, tokenizer, prompts, method_kwargs, greedy, counter, args.seed)}
+        result["sampled"] = run_method(model, tokenizer, prompts, method_kwargs, sampled, counter, args.seed)
+        outputs = result["greedy"].pop("outputs")
+        result["sampled"].pop("outputs")
+        if baseline is None:
+            baseline = outputs
+        result["greedy"]["identical_to_first_method"] = outputs == baseline
+
+        if args.parity_samples:
+            samples = sample_many(model, tokenizer, prompts[0], method_kwargs, args.parity_samples, args.parity_tokens, args.seed)
+            if parity_baseline is None:
+                parity_baseline = samples
+            result["parity_tv_distance"] = total_variation(parity_baseline, samples, args.parity_tokens)
+        results[method] = result
+        print(method, json.dumps(result))
+
+    first = next(iter(results.values()), None)
+    if first:
+        for method, result in results.items():
+            for kind in ("greedy", "sampled"):
+                result[kind]["speedup"] = round(result[kind]["tokens_per_s"] / first[kind]["tokens_per_s"], 2)
+        print(json.dumps({method: {kind: r[kind]["speedup"] for kind in ("greedy", "sampled")} for method, r in results.items()}))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"params": vars(args), "inference_mode": mode, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Recall@k and latency comparison between vector store backends.
+
+Run from the backend folder:
+
+    python -m benchmarks.vector_store_benchmark --n 200000 --dim 384 --k 5
+"""
+import argparse
+import json
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from app.services.vector_store import BACKENDS, NumpyVectorStore, create_vector_store
+
+
+def synthetic_corpus(n: int, dim: int, seed: int = 0) -> np.ndarray:
+    """Clustered unit vectors, closer to real sentence embeddings than pure noise"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(1, n // 100), dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), n)] + 0.5 * rng.standard_normal((n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def percentile_ms(samples: List[float], q: float) -> float:
+    return float(np.percentile(samples, q) * 1000)
+
+
+def run(n: int, dim: int, k: int, queries: int, backends: List[str]) -> Dict[str, dict]:
+    corpus = synthetic_corpus(n, dim)
+    query_vectors = synthetic_corpus(queries, dim, seed=1)
+    exact = NumpyVectorStore(dim, matrix=corpus)
+    truth = [{i for i, _ in exact.search(q, k)} for q in query_vectors]
+
+    results = {}
+    for backend in backends:
+        try:
+            store = create_vector_store(dim, backend)
+        except RuntimeError as e:
+            print(f"{backend}: skipped ({e})")
+            continue
+        start = time.perf_counter()
+        store.add(range(n), corpus)
+        build_s = time.perf_counter() - start
+
+        latencies, hits = [], 0
+        for q, expected in zip(query_vectors, truth):
+            start = time.perf_counter()
+            found = store.search(q, k)
+            latencies.append(time.perf_counter() - start)
+            hits += len(expected & {i for i, _ in found})
+
+        results[backend] = {
+            "build_s": round(build_s, 3),
+            f"recall@{k}": round(hits / (k * queries), 4),
+            "p50_ms": round(percentile_ms(latencies, 50), 3),
+            "p95_ms": round(percentile_ms(latencies, 95), 3),
+        }
+        print(f"{backend}: {results[backend]}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--n", type=int, default=100_000, help="corpus size")
+    parser.add_argument("--dim", type=int, default=384, help="embedding dimension")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS))
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    results = run(args.n, args.dim, args.k, args.queries, args.backends)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"params": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Per-process memory of a pre-fork server (WEB_WORKERS > 1), from /proc smaps_rollup.
+
+RSS counts every shared page in full in every process, so summing it over
+workers overstates usage. PSS splits each shared page between the processes
+that map it, so the sum of PSS is what the server really costs. USS (private
+clean + dirty) is what one more worker would add. Run it against the parent's
+pid once the workers have served some traffic (Linux only):
+
+    python -m benchmarks.worker_memory --pid $(pgrep -of "app.main")
+    python -m benchmarks.worker_memory --pid 1234 --watch 5
+"""
+import argparse
+import json
+import os
+import time
+from typing import Dict, List
+
+FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty", "Swap")
+
+
+def read_rollup(pid: int) -> Dict[str, int]:
+    """Campos de /proc/<pid>/smaps_rollup, en kB"""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup", "r", encoding="utf-8") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].rstrip(":") in FIELDS:
+                values[parts[0].rstrip(":")] = int(parts[1])
+    return values
+
+
+def children_of(pid: int) -> List[int]:
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "r", encoding="utf-8") as f:
+                # The command name may hold spaces; ppid is the 2nd field after its ")"
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid:
+            children.append(int(entry))
+    return sorted(children)
+
+
+def snapshot(pid: int) -> dict:
+    processes = []
+    for role, process_pid in [("parent", pid)] + [("worker", child) for child in children_of(pid)]:
+        try:
+            rollup = read_rollup(process_pid)
+        except OSError:
+            continue
+        processes.append({
+            "pid": process_pid,
+            "role": role,
+            "rss_mb": round(rollup.get("Rss", 0) / 1024, 1),
+            "pss_mb": round(rollup.get("Pss", 0) / 1024, 1),
+            "uss_mb": round((rollup.get("Private_Clean", 0) + rollup.get("Private_Dirty", 0)) / 1024, 1),
+            "shared_mb": round((rollup.get("Shared_Clean", 0) + rollup.get("Shared_Dirty", 0)) / 1024, 1),
+        })
+    workers = [p for p in processes if p["role"] == "worker"]
+    return {
+        "processes": processes,
+        "total_rss_mb": round(sum(p["rss_mb"] for p in processes), 1),
+        "total_pss_mb": round(sum(p["pss_mb"] for p in processes), 1),
+        "mean_worker_uss_mb": round(sum(p["uss_mb"] for p in workers) / len(workers), 1) if workers else 0.0,
+    }
+
+
+def print_snapshot(result: dict) -> None:
+    print(f"{'pid':>8} {'role':<7} {'rss_mb':>9} {'pss_mb':>9} {'uss_mb':>9} {'shared_mb':>10}")
+    for p in result["processes"]:
+        print(f"{p['pid']:>8} {p['role']:<7} {p['rss_mb']:>9} {p['pss_mb']:>9} {p['uss_mb']:>9} {p['shared_mb']:>10}")
+    print(
+        f"total rss {result['total_rss_mb']} MB (overcounts shared pages), "
+        f"total pss {result['total_pss_mb']} MB, "
+        f"each extra worker ~{result['mean_worker_uss_mb']} MB"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pid", type=int, required=True, help="pid of the pre-fork parent")
+    parser.add_argument("--watch", type=float, default=0, help="repeat every N seconds")
+    parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    args = parser.parse_args()
+
+    while True:
+        result = snapshot(args.pid)
+        if args.json:
+            print(json.dumps(result))
+        else:
+            print_snapshot(result)
+        if not args.watch:
+            break
+        time.sleep(args.watch)
+
+
+if __name__ == "__main__":
+    main()
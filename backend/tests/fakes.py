@@ -0,0 +1,83 @@
+import numpy as np
+
+from benchmarks.fakes import StubEmbedder
+
+
+class FakeClock:
+    """time.monotonic replacement that only moves when told to"""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+class CountingEmbedder(StubEmbedder):
+    """StubEmbedder that remembers every text it was asked to encode"""
+
+    def __init__(self, dim: int = 32):
+        super().__init__(dim=dim)
+        self.encoded = []
+
+    def encode(self, texts, **kwargs):
+        self.encoded.extend(texts)
+        return super().encode(texts, **kwargs)
+
+
+class WhitespaceTokenizer:
+    """Tokenizer stand-in: one id per whitespace-separated word, decodable"""
+
+    def __init__(self):
+        self.vocabulary = {}
+        self.words = []
+
+    def _id(self, word):
+        if word not in self.vocabulary:
+            self.vocabulary[word] = len(self.words)
+            self.words.append(word)
+        return self.vocabulary[word]
+
+    def __call__(self, text, add_special_tokens=True, return_tensors=None, **kwargs):
+        ids = [self._id(word) for word in text.split()]
+        if return_tensors == "pt":
+            import torch
+            return {"input_ids": torch.tensor([ids], dtype=torch.long)}
+        return {"input_ids": ids}
+
+    def decode(self, ids, skip_special_tokens=True):
+        return " ".join(self.words[int(i)] for i in ids)
+
+
+class WordCounter:
+    """Prompt builder stand-in: one word is one token"""
+
+    def count(self, text: str) -> int:
+        return len(text.split())
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        return " ".join(text.split()[:max_tokens])
+
+
+class KeywordEmbeddings:
+    """Embedding service stand-in: one dimension per keyword, normalized
+
+    Texts without any keyword share one extra dimension, orthogonal to the rest.
+    """
+
+    def __init__(self, vocabulary):
+        self.vocabulary = list(vocabulary)
+
+    def encode_queries(self, queries):
+        vectors = np.array(
+            [[float(word in query.lower()) for word in self.vocabulary] for query in queries],
+            dtype=np.float32
+        )
+        vectors = np.hstack([vectors, ~vectors.any(axis=1, keepdims=True)]).astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    def encode_query(self, query):
+        return self.encode_queries([query])[0]
@@ -0,0 +1,114 @@
+import queue
+
+import pytest
+
+from app.services.admission import (
+    AdmissionController, Cancellation, DeadlineExceededError, FairQueue, OverloadedError, RateLimitedError,
+    RequestCancelledError, TokenBucket
+)
+
+
+def test_token_bucket_allows_a_burst_then_reports_the_wait(clock):
+    bucket = TokenBucket(rate=0.5, capacity=2)
+
+    assert bucket.take() == 0.0
+    assert bucket.take() == 0.0
+    assert bucket.take() == pytest.approx(2.0)
+
+
+def test_token_bucket_refills_at_its_rate_up_to_capacity(clock):
+    bucket = TokenBucket(rate=1.0, capacity=2)
+    bucket.take()
+    bucket.take()
+
+    clock.advance(1.0)
+    assert bucket.take() == 0.0
+    assert bucket.take() > 0
+
+    # A long pause still leaves only `capacity` tokens
+    clock.advance(60.0)
+    assert bucket.take() == 0.0
+    assert bucket.take() == 0.0
+    assert bucket.take() > 0
+
+
+def test_admission_rejects_beyond_max_concurrent_until_released(clock):
+    controller = AdmissionController(max_concurrent=1, rate_per_minute=0)
+
+    slot = controller.admit("a@example.com")
+    with pytest.raises(OverloadedError):
+        controller.admit("b@example.com")
+    assert controller.rejected_overloaded == 1
+
+    slot.release()
+    slot.release()
+    assert controller.active == 0
+    with controller.admit("b@example.com"):
+        assert controller.active == 1
+    assert controller.active == 0
+
+
+def test_admission_rate_limits_each_user_separately(clock):
+    controller = AdmissionController(max_concurrent=10, rate_per_minute=60, burst=1)
+
+    controller.admit("a@example.com").release()
+    with pytest.raises(RateLimitedError) as raised:
+        controller.admit("a@example.com")
+    assert raised.value.retry_after == pytest.approx(1.0)
+    controller.admit("b@example.com").release()
+
+    clock.advance(1.0)
+    controller.admit("a@example.com").release()
+    assert controller.rejected_rate_limited == 1
+
+
+def test_admission_keeps_only_the_most_recent_buckets(clock):
+    controller = AdmissionController(max_concurrent=10, rate_per_minute=60, burst=1, max_users=2)
+
+    for user in ("a", "b", "c"):
+        controller.admit(user).release()
+
+    assert list(controller._buckets) == ["b", "c"]
+    # "a" was forgotten, so it starts again with a full bucket
+    controller.admit("a").release()
+
+
+def test_cancellation_reports_why_it_stopped(clock):
+    cancellation = Cancellation(timeout=5)
+    assert not cancellation.should_stop()
+
+    clock.advance(5)
+    assert cancellation.expired
+    assert isinstance(cancellation.error(), DeadlineExceededError)
+
+    cancellation.cancel()
+    assert isinstance(cancellation.error(), RequestCancelledError)
+    assert Cancellation(timeout=0).deadline is None
+
+
+def test_fair_queue_serves_users_round_robin():
+    fair = FairQueue(maxsize=10, key=lambda item: item[0])
+    for item in [("a", 1), ("a", 2), ("a", 3), ("b", 1), ("c", 1), ("b", 2)]:
+        fair.put_nowait(item)
+
+    served = [fair.get(timeout=0) for _ in range(fair.qsize())]
+
+    assert served == [("a", 1), ("b", 1), ("c", 1), ("a", 2), ("b", 2), ("a", 3)]
+    assert fair.empty()
+
+
+def test_fair_queue_is_bounded():
+    fair = FairQueue(maxsize=2, key=lambda item: item)
+    fair.put_nowait("a")
+    fair.put_nowait("b")
+
+    with pytest.raises(queue.Full):
+        fair.put_nowait("c")
+    assert fair.qsize() == 2
+
+
+def test_fair_queue_get_times_out_when_empty():
+    fair = FairQueue(maxsize=2, key=lambda item: item)
+
+    with pytest.raises(queue.Empty):
+        fair.get(timeout=0.01)
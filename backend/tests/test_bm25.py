@@ -0,0 +1,55 @@
+import numpy as np
+
+from app.services.bm25 import BM25Index, reciprocal_rank_fusion, tokenize
+
+DOCUMENTS = [
+    "Promtior builds RAG assistants for companies",
+    "The company was founded in 2023 in Montevideo",
+    "Services: RAG, agents and AI consulting. RAG is our focus",
+    "Clients include banks and retailers",
+]
+
+
+def test_tokenize_lowercases_and_drops_function_words():
+    assert tokenize("What are the AI services of Promtior?") == ["ai", "services", "promtior"]
+
+
+def test_search_ranks_by_term_frequency_and_rarity():
+    index = BM25Index(DOCUMENTS)
+
+    results = index.search("RAG consulting", k=10)
+
+    assert [doc for doc, _ in results] == [2, 0]
+    assert results[0][1] > results[1][1] > 0
+
+
+def test_search_returns_only_matching_documents_up_to_k():
+    index = BM25Index(DOCUMENTS)
+
+    assert [doc for doc, _ in index.search("montevideo", k=10)] == [1]
+    assert len(index.search("rag clients founded", k=2)) == 2
+    assert index.search("unknown words", k=10) == []
+
+
+def test_csr_layout_holds_one_posting_per_term_and_document():
+    index = BM25Index(DOCUMENTS)
+
+    postings = sum(len(set(tokenize(text))) for text in DOCUMENTS)
+    assert len(index.doc_ids) == len(index.weights) == postings
+    assert index.offsets[-1] == postings
+    assert np.all(np.diff(index.offsets) > 0)
+    assert index.nbytes > 0
+
+
+def test_empty_index():
+    index = BM25Index([])
+
+    assert index.size == 0
+    assert index.search("rag", k=5) == []
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([[1, 2, 3], [3, 1, 4]], k=60)
+
+    assert [doc for doc, _ in fused] == [1, 3, 2, 4]
+    assert fused[0][1] == 1 / 61 + 1 / 62
@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from app.services.admission import Cancellation
+from app.services.chat_service import ChatService
+from app.services.prompt_builder import PromptBuilder
+
+from .fakes import WhitespaceTokenizer
+
+REPLY = "Promtior builds RAG assistants"
+GENERATION_KWARGS = dict(max_new_tokens=8, do_sample=False, pad_token_id=-1)
+
+
+class ChatTokenizer(WhitespaceTokenizer):
+    pad_token_id = -1
+
+    def batch_decode(self, rows, skip_special_tokens=True):
+        return [self.decode([i for i in row.tolist() if i != self.pad_token_id]) for row in rows]
+
+
+class FakeCausalLM:
+    """generate() stand-in: appends the same reply to every row, or streams it"""
+
+    device = "cpu"
+
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+        self.calls = []
+
+    def generate(self, input_ids, attention_mask, **kwargs):
+        self.calls.append(kwargs)
+        streamer = kwargs.get("streamer")
+        if streamer is not None:
+            streamer.on_finalized_text(REPLY, stream_end=True)
+            return None
+        reply = torch.tensor(self.tokenizer(REPLY)["input_ids"], dtype=torch.long)
+        return torch.cat([input_ids, reply.expand(len(input_ids), -1)], dim=1)
+
+
+class FakeEmbeddingService:
+    corpus_version = 0
+
+    def encode_queries(self, questions):
+        return np.ones((len(questions), 4), dtype=np.float32)
+
+    def encode_query(self, question):
+        return self.encode_queries([question])[0]
+
+    def get_relevant_context_many(self, questions, query_embeddings=None, company_names=None):
+        return [["Promtior is an AI consultancy"] for _ in questions]
+
+
+@pytest.fixture
+def service():
+    service = ChatService(FakeEmbeddingService())
+    service.tokenizer = ChatTokenizer()
+    service.model = FakeCausalLM(service.tokenizer)
+    service.prompt_builder = PromptBuilder(service.tokenizer, context_window=400, max_new_tokens=8)
+    service.response_cache = None
+    service.generation_kwargs = dict(GENERATION_KWARGS)
+    return service
+
+
+@pytest.mark.parametrize("speculative", [{}, {"prompt_lookup_num_tokens": 3}])
+@pytest.mark.parametrize("rows", [1, 2])
+def test_cancellable_batch_does_not_leak_into_a_later_stream(service, speculative, rows):
+    service.speculative_kwargs = speculative
+    requests = [(f"question {i}", "Promtior", "bot") for i in range(rows)]
+
+    replies = service.generate_batch(requests, cancellations=[Cancellation() for _ in requests])
+    streamed = "".join(service.stream_response("question", "Promtior", "bot"))
+
+    assert replies == [REPLY] * rows
+    # A leaked stopping_criteria would make the stream's generate() call raise TypeError
+    assert streamed == REPLY
+    assert service.generation_kwargs == GENERATION_KWARGS
+    batch_call, stream_call = service.model.calls
+    assert batch_call["stopping_criteria"] is not stream_call["stopping_criteria"]
+    assert stream_call["streamer"] is not None
+
+
+def test_batch_without_cancellations_gets_no_stopping_criteria(service):
+    service.generate_batch([("question", "Promtior", "bot")], cancellations=[Cancellation()])
+    service.generate_batch([("question", "Promtior", "bot")])
+
+    assert "stopping_criteria" in service.model.calls[0]
+    assert "stopping_criteria" not in service.model.calls[1]
+
+
+def test_decoding_kwargs_are_a_fresh_copy_per_call(service):
+    service.speculative_kwargs = {"prompt_lookup_num_tokens": 3}
+
+    for batch_size in (1, 2):
+        kwargs = service._decoding_kwargs(batch_size)
+        assert kwargs is not service.generation_kwargs
+        kwargs["stopping_criteria"] = object()
+        assert service._decoding_kwargs(batch_size) == dict(
+            GENERATION_KWARGS, **(service.speculative_kwargs if batch_size == 1 else {})
+        )
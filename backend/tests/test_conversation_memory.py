@@ -0,0 +1,136 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.db.db_models import Conversation, Interaction
+from app.services.conversation_memory import ConversationMemory, looks_like_follow_up
+
+from .fakes import KeywordEmbeddings, WordCounter
+
+VOCABULARY = ["pricing", "founded", "services", "clients", "office"]
+USER = "ana@example.com"
+
+
+@pytest.fixture
+def embeddings():
+    return KeywordEmbeddings(VOCABULARY)
+
+
+@pytest.fixture
+def memory(engine, embeddings):
+    return ConversationMemory(
+        embeddings,
+        WordCounter(),
+        max_conversations=2,
+        window_tokens=30,
+        turn_tokens=12,
+        summary_tokens=12,
+        recall_turns=1,
+        archive_turns=3,
+        refresh_s=0,
+        engine=engine
+    )
+
+
+def loaded(memory, user=USER):
+    assert not memory.touch(user)
+    memory.load(user)
+    return memory
+
+
+def test_short_messages_read_as_follow_ups():
+    assert looks_like_follow_up("why?")
+    assert looks_like_follow_up("tell me more")
+    assert not looks_like_follow_up("what services does the company offer to banks")
+
+
+def test_append_ignores_conversations_that_are_not_loaded(memory):
+    memory.append(USER, "what about pricing", "It depends")
+
+    assert memory.size == 0
+    assert not memory.has_history(USER)
+
+
+def test_window_is_compacted_into_summary_and_archive(memory):
+    loaded(memory)
+    for i in range(6):
+        memory.append(USER, f"question {i} about office hours. More detail", f"answer {i} " + "x " * 6)
+
+    state = memory._states[USER]
+    assert state.recent_tokens <= memory.window_tokens
+    assert [turn.question for turn in state.recent][-1].startswith("question 5")
+    # Older turns moved to the bounded archive, their topics to the bounded summary
+    assert len(state.archive) == 3
+    assert state.topic_tokens <= memory.summary_tokens
+    assert state.topics[-1][0] == "question 3 about office hours."
+    assert len(state.recent) + len(state.archive) < 6
+
+
+def test_history_recalls_related_turns_and_summarizes(memory, embeddings):
+    loaded(memory)
+    memory.append(USER, "what is your pricing", "Plans start at 100")
+    for i in range(4):
+        memory.append(USER, f"where is the office {i}", "Montevideo " + "x " * 6)
+
+    lines = memory.history(USER, embeddings.encode_query("pricing for banks"), "what is the pricing for large banks")
+
+    assert lines[0].startswith("Earlier, the user asked about: ")
+    assert "User: what is your pricing\nAssistant: Plans start at 100" in lines
+    assert all("office" not in line for line in lines[1:])
+
+
+def test_history_is_empty_when_nothing_relates_to_the_question(memory, embeddings):
+    loaded(memory)
+    memory.append(USER, "where is the office", "Montevideo")
+
+    question = "which clients have you worked with so far"
+    assert memory.history(USER, embeddings.encode_query(question), question) == []
+
+
+def test_follow_ups_always_get_the_last_turn(memory, embeddings):
+    loaded(memory)
+    memory.append(USER, "where is the office", "Montevideo")
+    memory.append(USER, "when was it founded", "In 2023")
+
+    assert memory.history(USER, embeddings.encode_query("why?"), "why?") == ["User: when was it founded\nAssistant: In 2023"]
+
+
+def test_load_rebuilds_the_conversation_from_the_database(memory, embeddings, session):
+    conversation = Conversation(user_email=USER, user_name="Ana")
+    start = datetime(2026, 1, 1)
+    conversation.interactions = [
+        Interaction(timestamp=start + timedelta(minutes=i), user_message=message, bot_response=reply)
+        for i, (message, reply) in enumerate([("what is your pricing", "From 100"), ("when was it founded", "2023")])
+    ]
+    session.add(conversation)
+    session.commit()
+
+    loaded(memory)
+
+    assert memory.touch(USER)
+    recent = memory._states[USER].recent
+    assert [turn.question for turn in recent] == ["what is your pricing", "when was it founded"]
+    # Turns from the database are embedded when they are first compared
+    lines = memory.history(USER, embeddings.encode_query("pricing"), "pricing plans for companies please")
+    assert lines == ["User: what is your pricing\nAssistant: From 100"]
+    assert recent[1].embedding is not None
+
+
+def test_refresh_drops_conversations_loaded_too_long_ago(memory, clock):
+    memory.refresh_s = 60
+    loaded(memory)
+
+    clock.advance(30)
+    assert memory.touch(USER)
+    clock.advance(31)
+    assert not memory.touch(USER)
+    assert memory.size == 0
+
+
+def test_least_recent_conversations_are_evicted(memory):
+    for user in ("a", "b", "c"):
+        loaded(memory, user)
+
+    assert memory.size == 2
+    assert not memory.touch("a")
+    assert memory.touch("c")
@@ -0,0 +1,102 @@
+import glob
+import json
+import os
+
+import numpy as np
+import pytest
+
+from app.services.embedding_index import EmbeddingIndex
+
+from .fakes import CountingEmbedder
+
+TEXTS = ["Promtior builds RAG assistants", "Founded in 2023", "Offices in Montevideo"]
+
+
+@pytest.fixture
+def embedder():
+    return CountingEmbedder()
+
+
+def stub_vectors(embedder, texts):
+    # Reference vectors, computed without touching the embedder's log
+    return np.stack([embedder._vector(text) for text in texts])
+
+
+def index_files(cache_dir):
+    return sorted(os.path.basename(path) for path in glob.glob(os.path.join(cache_dir, "embeddings", "*")))
+
+
+def test_first_build_embeds_every_text(tmp_path, embedder):
+    index = EmbeddingIndex(embedder, "stub", str(tmp_path), backend="numpy")
+
+    snapshot = index.build(TEXTS, "v1")
+
+    assert embedder.encoded == TEXTS
+    np.testing.assert_allclose(snapshot.matrix, stub_vectors(embedder, TEXTS))
+    assert index.search(snapshot.matrix[1], k=1)[0][0] == 1
+
+
+def test_rebuild_embeds_only_changed_texts(tmp_path, embedder):
+    index = EmbeddingIndex(embedder, "stub", str(tmp_path), backend="numpy")
+    index.build(TEXTS, "v1")
+    embedder.encoded.clear()
+
+    texts = [TEXTS[0], "Founded in 2024", TEXTS[2], "Clients include banks"]
+    snapshot = index.build(texts, "v2")
+
+    assert embedder.encoded == ["Founded in 2024", "Clients include banks"]
+    np.testing.assert_allclose(snapshot.matrix, stub_vectors(embedder, texts))
+
+
+def test_same_corpus_is_loaded_from_the_mmapped_file(tmp_path, embedder):
+    EmbeddingIndex(embedder, "stub", str(tmp_path), backend="numpy").build(TEXTS, "v1")
+    embedder.encoded.clear()
+
+    # A fresh process: nothing in memory, only the files on disk
+    index = EmbeddingIndex(embedder, "stub", str(tmp_path), backend="numpy")
+    snapshot = index.build(TEXTS, "v1", resident=False)
+
+    assert embedder.encoded == []
+    assert isinstance(snapshot.matrix, np.memmap)
+    assert snapshot.resident_bytes == 0
+    np.testing.assert_allclose(snapshot.matrix, stub_vectors(embedder, TEXTS))
+
+    resident = index.set_resident(True)
+    assert not isinstance(resident.matrix, np.memmap)
+    assert resident.resident_bytes == resident.matrix.nbytes
+
+
+def test_another_model_rebuilds_everything(tmp_path, embedder):
+    EmbeddingIndex(embedder, "stub", str(tmp_path), backend="numpy").build(TEXTS, "v1")
+    embedder.encoded.clear()
+
+    EmbeddingIndex(embedder, "org/other-model", str(tmp_path), backend="numpy").build(TEXTS, "v1")
+
+    assert embedder.encoded == TEXTS
+    # Each model keeps its own files
+    assert len(index_files(tmp_path)) == 4
+
+
+def test_manifest_that_does_not_match_forces_a_full_rebuild(tmp_path, embedder):
+    index = EmbeddingIndex(embedder, "stub", str(tmp_path), backend="numpy")
+    index.build(TEXTS, "v1")
+    _, manifest_path = index._paths(index.key)
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump({"model_name": "stub", "key": index.key, "hashes": ["stale"] * len(TEXTS)}, f)
+    embedder.encoded.clear()
+
+    snapshot = EmbeddingIndex(embedder, "stub", str(tmp_path), backend="numpy").build(TEXTS, "v1")
+
+    assert embedder.encoded == TEXTS
+    np.testing.assert_allclose(snapshot.matrix, stub_vectors(embedder, TEXTS))
+
+
+def test_save_removes_the_files_of_previous_versions(tmp_path, embedder):
+    index = EmbeddingIndex(embedder, "stub", str(tmp_path), backend="numpy")
+    index.build(TEXTS, "v1")
+    first = index.key
+
+    index.build(TEXTS + ["Clients include banks"], "v2")
+
+    assert index.key != first
+    assert index_files(tmp_path) == [f"stub-{index.key}.json", f"stub-{index.key}.npy"]
@@ -0,0 +1,26 @@
+import asyncio
+import threading
+
+from app.core import executors
+
+
+def thread_name():
+    return threading.current_thread().name
+
+
+def test_pools_work_again_after_shutdown():
+    async def use_pools():
+        return await asyncio.gather(
+            executors.run_in_model_pool(thread_name),
+            executors.run_in_db_pool(thread_name),
+            executors.run_in_ingest_pool(thread_name),
+        )
+
+    first = asyncio.run(use_pools())
+    executors.shutdown()
+    # A second app lifespan in the same process (tests, --reload) gets working pools
+    second = asyncio.run(use_pools())
+
+    assert [name.split("_")[0] for name in first] == ["model", "db", "ingest"]
+    assert [name.split("_")[0] for name in second] == ["model", "db", "ingest"]
+    executors.model_executor.submit(thread_name).result(5)
@@ -0,0 +1,160 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import chat
+from app.core import config
+from app.services.admission import AdmissionController, Cancellation
+from app.services.inference_scheduler import InferenceScheduler, QueueFullError, _PendingRequest
+
+
+class GatedChatService:
+    """generate_batch stand-in that logs each batch; the first one waits for the gate"""
+
+    memory = None
+
+    def __init__(self):
+        self.batches = []
+        self.started = threading.Event()
+        self.gate = threading.Event()
+
+    def generate_batch(self, requests, cancellations=None, conversations=None):
+        self.batches.append([message for message, _, _ in requests])
+        self.started.set()
+        self.gate.wait(5)
+        return [f"re: {message}" for message, _, _ in requests]
+
+    def get_cached_reply(self, message, company_name, chat_name):
+        return None
+
+
+@pytest.fixture
+def service():
+    service = GatedChatService()
+    yield service
+    service.gate.set()
+
+
+@pytest.fixture
+def make_scheduler(service, monkeypatch):
+    # One batch in flight at a time, so the batch boundaries are deterministic
+    monkeypatch.setattr(config, "MODEL_WORKERS", 1)
+    schedulers = []
+
+    def make(**kwargs):
+        scheduler = InferenceScheduler(service, **kwargs)
+        schedulers.append(scheduler)
+        return scheduler
+
+    yield make
+    service.gate.set()
+    for scheduler in schedulers:
+        scheduler.stop(timeout=5)
+
+
+def occupy_model_worker(scheduler, service):
+    """Starts a batch that holds the only model worker until the gate opens"""
+    future = scheduler.submit("first", "Promtior", "bot", user_key="first")
+    assert service.started.wait(5)
+    return future
+
+
+def test_concurrent_requests_within_the_wait_window_share_a_batch(make_scheduler, service):
+    service.gate.set()
+    scheduler = make_scheduler(max_batch_size=8, max_wait_ms=200)
+
+    async def ask():
+        return await asyncio.gather(*(
+            scheduler.generate(f"q{i}", "Promtior", "bot", user_key=f"user{i}") for i in range(3)
+        ))
+
+    assert asyncio.run(ask()) == ["re: q0", "re: q1", "re: q2"]
+    assert service.batches == [["q0", "q1", "q2"]]
+
+
+def test_batches_are_capped_at_max_batch_size(make_scheduler, service):
+    scheduler = make_scheduler(max_batch_size=3, max_wait_ms=200)
+    first = occupy_model_worker(scheduler, service)
+    futures = [scheduler.submit(f"q{i}", "Promtior", "bot", user_key=f"user{i}") for i in range(5)]
+
+    service.gate.set()
+
+    assert [future.result(5) for future in futures] == [f"re: q{i}" for i in range(5)]
+    assert first.result(5) == "re: first"
+    assert service.batches == [["first"], ["q0", "q1", "q2"], ["q3", "q4"]]
+
+
+def test_requests_after_the_wait_window_go_in_the_next_batch(make_scheduler, service):
+    service.gate.set()
+    scheduler = make_scheduler(max_batch_size=8, max_wait_ms=10)
+
+    assert scheduler.submit("early", "Promtior", "bot").result(5) == "re: early"
+    assert scheduler.submit("late", "Promtior", "bot").result(5) == "re: late"
+    assert service.batches == [["early"], ["late"]]
+
+
+def test_full_queue_rejects_new_requests(make_scheduler, service):
+    scheduler = make_scheduler(max_batch_size=8, max_wait_ms=10, max_queue_depth=2)
+    occupy_model_worker(scheduler, service)
+    queued = [scheduler.submit(f"q{i}", "Promtior", "bot", user_key=f"user{i}") for i in range(2)]
+
+    with pytest.raises(QueueFullError):
+        scheduler.submit("one too many", "Promtior", "bot")
+    with pytest.raises(QueueFullError):
+        scheduler.submit_job(lambda: None)
+
+    service.gate.set()
+    assert [future.result(5) for future in queued] == ["re: q0", "re: q1"]
+
+
+def test_full_queue_answers_503(make_scheduler, service):
+    scheduler = make_scheduler(max_batch_size=8, max_wait_ms=10, max_queue_depth=1)
+    occupy_model_worker(scheduler, service)
+    scheduler.submit("queued", "Promtior", "bot", user_key="queued")
+    app = FastAPI()
+    app.include_router(chat.router)
+    app.state.ready = True
+    app.state.chat_service = service
+    app.state.scheduler = scheduler
+    app.state.admission = AdmissionController(max_concurrent=10, rate_per_minute=0)
+
+    response = TestClient(app).post("/api/chat", json={
+        "message": "hello", "company_name": "Promtior", "chat_name": "bot", "user_email": "ana@example.com"
+    })
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+def pending(message, user_key, job=None):
+    return _PendingRequest(message, "Promtior", "bot", user_key, Cancellation(timeout=0), job)
+
+
+def test_a_queued_job_closes_the_batch_and_runs_next():
+    scheduler = InferenceScheduler(GatedChatService(), max_batch_size=8, max_wait_ms=50)
+    job = pending(None, "streamer", job=lambda: None)
+    for item in (pending("q0", "user0"), job, pending("q1", "user1")):
+        scheduler._queue.put_nowait(item)
+
+    assert [p.message for p in scheduler._collect_batch()] == ["q0"]
+    assert scheduler._deferred is job
+    assert scheduler.depth == 2
+    assert scheduler._collect_batch() == [job]
+    assert [p.message for p in scheduler._collect_batch()] == ["q1"]
+    assert scheduler.depth == 0
+
+
+def test_a_deferred_job_still_runs_between_batches(make_scheduler, service):
+    scheduler = make_scheduler(max_batch_size=8, max_wait_ms=200)
+    occupy_model_worker(scheduler, service)
+    before = scheduler.submit("q0", "Promtior", "bot", user_key="user0")
+    job = scheduler.submit_job(lambda: service.batches.append(["job"]) or "streamed", user_key="streamer")
+    after = scheduler.submit("q1", "Promtior", "bot", user_key="user1")
+
+    service.gate.set()
+
+    assert (before.result(5), job.result(5), after.result(5)) == ("re: q0", "streamed", "re: q1")
+    assert service.batches == [["first"], ["q0"], ["job"], ["q1"]]
@@ -0,0 +1,79 @@
+import json
+
+from app.services.ingestion import TextChunker, chunk_document, load_chunks
+
+
+def words(n, prefix="w"):
+    return " ".join(f"{prefix}{i}" for i in range(n))
+
+
+def test_chunker_counts_words_without_a_fast_tokenizer():
+    chunker = TextChunker(max_tokens=10, overlap=2)
+
+    assert chunker.tokenizer is None
+    assert chunker.count("one two  three\nfour") == 4
+
+
+def test_overlap_is_capped_at_half_the_window():
+    assert TextChunker(max_tokens=10, overlap=8).overlap == 5
+
+
+def test_split_makes_overlapping_windows_that_cover_the_text():
+    chunker = TextChunker(max_tokens=10, overlap=3)
+
+    pieces = chunker.split(words(25))
+
+    assert all(chunker.count(piece) <= 10 for piece in pieces)
+    assert pieces[0].split()[-3:] == pieces[1].split()[:3]
+    assert pieces[0].startswith("w0 ") and pieces[-1].endswith("w24")
+
+
+def test_split_keeps_short_text_whole():
+    chunker = TextChunker(max_tokens=10, overlap=3)
+
+    assert chunker.split("  short text ") == ["short text"]
+    assert chunker.split("   ") == []
+
+
+def test_small_objects_stay_in_one_chunk_with_their_heading():
+    chunker = TextChunker(max_tokens=50, overlap=5)
+    data = {
+        "metadata": {"company_name": "Promtior"},
+        "services": [
+            {"title": "RAG", "description": words(30, "rag")},
+            {"title": "Agents", "description": words(30, "agent")},
+        ],
+    }
+
+    chunks = chunk_document(data, "promtior.json", chunker)
+
+    assert [chunk.key_path for chunk in chunks] == ["services[0]", "services[1]"]
+    assert chunks[0].text.startswith("services\ntitle: RAG\ndescription: rag0")
+    assert all(chunk.company == "Promtior" and chunk.source == "promtior.json" for chunk in chunks)
+    assert "company_name" not in " ".join(chunk.text for chunk in chunks)
+
+
+def test_long_fields_are_split_and_keep_their_title():
+    chunker = TextChunker(max_tokens=20, overlap=4)
+    data = {"about": {"title": "History", "story": words(60, "s")}}
+
+    chunks = chunk_document(data, "about.json", chunker)
+
+    assert len(chunks) > 1
+    assert all(chunker.count(chunk.text) <= 20 for chunk in chunks)
+    assert all(chunk.text.startswith("about\ntitle: History\n") for chunk in chunks)
+    assert "s59" in chunks[-1].text
+
+
+def test_load_chunks_drops_duplicates_and_digests_the_result(tmp_path):
+    document = {"faq": [{"q": "What is RAG?", "a": "Retrieval augmented generation"}]}
+    for name in ("a.json", "b.json"):
+        (tmp_path / name).write_text(json.dumps(document), encoding="utf-8")
+    (tmp_path / "broken.json").write_text("{", encoding="utf-8")
+    chunker = TextChunker(max_tokens=50, overlap=5)
+
+    chunks, digest = load_chunks(chunker, str(tmp_path))
+
+    assert len(chunks) == 1 and chunks[0].source == "a.json"
+    assert load_chunks(chunker, str(tmp_path))[1] == digest
+    assert load_chunks(TextChunker(max_tokens=40, overlap=5), str(tmp_path))[1] != digest
@@ -0,0 +1,135 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, func, select
+
+from app.db import stats
+from app.db.db_models import Base, Conversation, ConversationStats, Interaction, StatsSummary
+from app.db.migrations import run_migrations
+from app.services.interaction_logger import InteractionLogWriter, InteractionRecord
+
+START = datetime(2026, 1, 1, 9)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'log.db'}")
+    Base.metadata.create_all(engine)
+    run_migrations(engine)
+    yield engine
+    engine.dispose()
+
+
+def record(i, email="ana@example.com", message="Thanks, great help"):
+    return InteractionRecord(email, email.split("@")[0], START + timedelta(minutes=i), f"{message} {i}", f"reply {i}")
+
+
+def count(engine, model):
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(model)).scalar_one()
+
+
+def summary(engine):
+    with engine.connect() as conn:
+        return conn.execute(select(StatsSummary)).mappings().one()
+
+
+def spy_on_batches(writer):
+    sizes = []
+    write_batch = writer.write_batch
+
+    def recording(records):
+        sizes.append(len(records))
+        write_batch(records)
+
+    writer.write_batch = recording
+    return sizes
+
+
+def test_queued_records_are_written_in_batches(engine):
+    writer = InteractionLogWriter(engine, max_queue=100, batch_size=3, flush_interval=0.05)
+    sizes = spy_on_batches(writer)
+
+    async def log_and_wait():
+        await writer.start()
+        assert all(writer.log(record(i)) for i in range(7))
+        for _ in range(200):
+            if sum(sizes) == 7:
+                break
+            await asyncio.sleep(0.01)
+        await writer.stop()
+
+    asyncio.run(log_and_wait())
+
+    assert sizes == [3, 3, 1]
+    assert count(engine, Interaction) == 7
+
+
+def test_stop_writes_everything_still_queued(engine):
+    writer = InteractionLogWriter(engine, max_queue=100, batch_size=4, flush_interval=60)
+    sizes = spy_on_batches(writer)
+
+    async def log_and_stop():
+        await writer.start()
+        for i in range(10):
+            writer.log(record(i))
+        # Let the background task pick up a partial batch before shutting down
+        await asyncio.sleep(0.05)
+        await writer.stop()
+
+    asyncio.run(log_and_stop())
+
+    assert sum(sizes) == 10 and max(sizes) <= 4
+    assert count(engine, Interaction) == 10
+    assert writer.dropped == 0
+
+
+def test_full_queue_drops_and_counts(engine):
+    writer = InteractionLogWriter(engine, max_queue=2, batch_size=10, flush_interval=60)
+
+    async def overfill():
+        await writer.start()
+        results = [writer.log(record(i)) for i in range(3)]
+        await writer.stop()
+        return results
+
+    assert asyncio.run(overfill()) == [True, True, False]
+    assert writer.dropped == 1
+    assert count(engine, Interaction) == 2
+
+
+def test_repeated_conversations_are_upserted(engine):
+    writer = InteractionLogWriter(engine)
+
+    writer.write_batch([InteractionRecord("ana@example.com", "Ana"), record(0), record(1)])
+    writer.write_batch([record(2), record(3, email="bob@example.com")])
+
+    assert count(engine, Conversation) == 2
+    assert count(engine, Interaction) == 4
+    assert summary(engine)["conversations"] == 2
+    with engine.connect() as conn:
+        per_user = dict(conn.execute(
+            select(Conversation.user_email, ConversationStats.interactions)
+            .join(ConversationStats, ConversationStats.conversation_id == Conversation.id)
+        ).all())
+    assert per_user == {"ana@example.com": 3, "bob@example.com": 1}
+
+
+def test_stats_move_in_the_same_transaction(engine, monkeypatch):
+    writer = InteractionLogWriter(engine)
+    writer.write_batch([record(0, message="Thanks, great help")])
+    assert summary(engine)["interactions"] == 1
+    assert summary(engine)["positive"] == 1
+
+    def failing_apply_batch(conn, new_conversations, interactions):
+        raise RuntimeError("stats write failed")
+
+    monkeypatch.setattr(stats, "apply_batch", failing_apply_batch)
+    with pytest.raises(RuntimeError):
+        writer.write_batch([record(1), record(2, email="bob@example.com")])
+
+    # Nothing of the failed batch is left behind: data and aggregates stay consistent
+    assert count(engine, Interaction) == 1
+    assert count(engine, Conversation) == 1
+    assert summary(engine)["interactions"] == 1
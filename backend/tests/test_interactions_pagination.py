@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.api.chat import get_interactions_from_db
+from app.db.db_models import Conversation, Interaction
+
+
+@pytest.fixture
+def conversations(session):
+    start = datetime(2026, 1, 1)
+    for i in range(5):
+        conversation = Conversation(user_email=f"user{i}@example.com", user_name=f"User {i}")
+        # Inserted newest first, so the page must follow time order, not insertion order
+        conversation.interactions = [
+            Interaction(timestamp=start + timedelta(minutes=n), user_message=f"q{n}", bot_response=f"a{n}")
+            for n in reversed(range(i))
+        ]
+        session.add(conversation)
+    session.commit()
+    return session
+
+
+def test_pages_follow_the_cursor_until_exhausted(conversations):
+    pages, cursor = [], None
+    while True:
+        page, cursor = get_interactions_from_db(conversations, limit=2, cursor=cursor)
+        pages.append([conversation["user_email"] for conversation in page])
+        if cursor is None:
+            break
+
+    assert pages == [
+        ["user0@example.com", "user1@example.com"],
+        ["user2@example.com", "user3@example.com"],
+        ["user4@example.com"],
+    ]
+
+
+def test_a_full_last_page_still_returns_a_cursor_to_an_empty_page(conversations):
+    page, cursor = get_interactions_from_db(conversations, limit=5)
+    assert len(page) == 5
+
+    assert get_interactions_from_db(conversations, limit=5, cursor=cursor) == ([], None)
+
+
+def test_without_limit_everything_is_returned_in_one_page(conversations):
+    page, cursor = get_interactions_from_db(conversations, timeout=5)
+
+    assert cursor is None
+    assert len(page) == 5
+
+
+def test_interactions_are_serialized_in_time_order(conversations):
+    # Ids start at 1, so cursor 3 lands on the fourth conversation
+    page, _ = get_interactions_from_db(conversations, limit=1, cursor=3)
+
+    (conversation,) = page
+    assert conversation["user_name"] == "User 3"
+    assert [interaction["user_message"] for interaction in conversation["interactions"]] == ["q0", "q1", "q2"]
+    assert conversation["interactions"][0] == {
+        "timestamp": "2026-01-01T00:00:00",
+        "user_message": "q0",
+        "bot_response": "a0",
+        "sentiment": None
+    }
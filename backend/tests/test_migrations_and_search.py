@@ -0,0 +1,133 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import sessionmaker
+
+from app.api.chat import search_interactions_in_db
+from app.db.db_models import Base, Conversation, Interaction
+from app.db.migrations import MIGRATIONS, run_migrations
+
+
+@pytest.fixture
+def legacy_engine(tmp_path):
+    """A database from before the migrations: no unique email, no sentiment column"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE conversations (id INTEGER PRIMARY KEY, user_email VARCHAR(255) NOT NULL, "
+            "user_name VARCHAR(255) NOT NULL, created_at TIMESTAMP)"
+        ))
+        conn.execute(text(
+            "CREATE TABLE interactions (id INTEGER PRIMARY KEY, conversation_id INTEGER REFERENCES conversations(id), "
+            "timestamp TIMESTAMP NOT NULL, user_message TEXT NOT NULL, bot_response TEXT NOT NULL)"
+        ))
+        conn.execute(text(
+            "INSERT INTO conversations (id, user_email, user_name) VALUES "
+            "(1, 'ana@example.com', 'Ana'), (2, 'bob@example.com', 'Bob'), (3, 'ana@example.com', 'Ana')"
+        ))
+        conn.execute(text(
+            "INSERT INTO interactions (conversation_id, timestamp, user_message, bot_response) VALUES "
+            "(1, '2026-01-01 10:00:00', 'hello', 'hi'), (2, '2026-01-01 11:00:00', 'prices?', 'ask sales'), "
+            "(3, '2026-01-01 12:00:00', 'thanks', 'welcome')"
+        ))
+    yield engine
+    engine.dispose()
+
+
+def applied_versions(engine):
+    with engine.connect() as conn:
+        return [row[0] for row in conn.execute(text("SELECT version FROM schema_migrations ORDER BY version"))]
+
+
+def test_duplicate_conversations_are_merged_before_the_unique_index(legacy_engine):
+    Base.metadata.create_all(legacy_engine)
+    run_migrations(legacy_engine)
+
+    with legacy_engine.connect() as conn:
+        conversations = conn.execute(text("SELECT id, user_email FROM conversations ORDER BY id")).all()
+        owners = conn.execute(text("SELECT conversation_id FROM interactions ORDER BY id")).scalars().all()
+    assert [tuple(row) for row in conversations] == [(1, "ana@example.com"), (2, "bob@example.com")]
+    assert owners == [1, 2, 1]
+    indexes = {index["name"]: index for index in inspect(legacy_engine).get_indexes("conversations")}
+    assert indexes["ix_conversations_user_email"]["unique"]
+    assert "sentiment" in {column["name"] for column in inspect(legacy_engine).get_columns("interactions")}
+
+
+def test_running_the_migrations_twice_is_a_no_op(legacy_engine):
+    Base.metadata.create_all(legacy_engine)
+    run_migrations(legacy_engine)
+    with legacy_engine.connect() as conn:
+        applied_at = conn.execute(text("SELECT applied_at FROM schema_migrations ORDER BY version")).scalars().all()
+
+    run_migrations(legacy_engine)
+
+    assert applied_versions(legacy_engine) == [version for version, _, _ in MIGRATIONS]
+    with legacy_engine.connect() as conn:
+        assert conn.execute(text("SELECT applied_at FROM schema_migrations ORDER BY version")).scalars().all() == applied_at
+        assert conn.execute(text("SELECT COUNT(*) FROM interactions")).scalar() == 3
+
+
+@pytest.fixture
+def search_db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'search.db'}")
+    Base.metadata.create_all(engine)
+    run_migrations(engine)
+    db = sessionmaker(bind=engine)()
+    start = datetime(2026, 1, 1)
+    for i, (email, name, messages) in enumerate([
+        ("ana@example.com", "Ana Martinez", [("Do you build chatbots?", "Yes, RAG chatbots"), ("Pricing?", "Ask sales")]),
+        ("bob@example.com", "Roberto Diaz", [("Where is the office?", "Montevideo")]),
+        ("carla@example.com", "Carla Martinez", [("Tell me about chatbots", "We build them")]),
+    ]):
+        conversation = Conversation(user_email=email, user_name=name)
+        conversation.interactions = [
+            Interaction(timestamp=start + timedelta(hours=i, minutes=n), user_message=message, bot_response=reply)
+            for n, (message, reply) in enumerate(messages)
+        ]
+        db.add(conversation)
+    db.commit()
+    yield db
+    db.close()
+    engine.dispose()
+
+
+def test_user_name_search_uses_trigram_substrings(search_db):
+    results = search_interactions_in_db(search_db, "martin")
+
+    assert sorted(result["user_name"] for result in results) == ["Ana Martinez", "Carla Martinez"]
+    ana = next(result for result in results if result["user_name"] == "Ana Martinez")
+    # Newest interaction first
+    assert [i["user_message"] for i in ana["interactions"]] == ["Pricing?", "Do you build chatbots?"]
+    assert [r["user_name"] for r in search_interactions_in_db(search_db, "Di")] == ["Roberto Diaz"]
+
+
+def test_message_search_matches_words_in_messages_and_replies(search_db):
+    results = search_interactions_in_db(search_db, None, q="chatbots")
+
+    assert [(r["user_name"], [i["user_message"] for i in r["interactions"]]) for r in results] == [
+        ("Carla Martinez", ["Tell me about chatbots"]),
+        ("Ana Martinez", ["Do you build chatbots?"]),
+    ]
+    assert [r["user_name"] for r in search_interactions_in_db(search_db, None, q="montevideo")] == ["Roberto Diaz"]
+
+
+def test_message_search_combined_with_user_name(search_db):
+    results = search_interactions_in_db(search_db, "carla", q="chatbots")
+
+    assert [r["user_email"] for r in results] == ["carla@example.com"]
+
+
+def test_search_terms_cannot_inject_fts_syntax(search_db):
+    assert search_interactions_in_db(search_db, None, q='chatbots" OR "office') == []
+    assert search_interactions_in_db(search_db, None, q="") == []
+
+
+def test_search_index_follows_updates_and_deletes(search_db):
+    conversation = search_db.query(Conversation).filter_by(user_email="bob@example.com").one()
+    conversation.user_name = "Roberta Martinez"
+    search_db.query(Interaction).filter(Interaction.user_message == "Tell me about chatbots").delete()
+    search_db.commit()
+
+    assert len(search_interactions_in_db(search_db, "martinez")) == 3
+    assert [r["user_name"] for r in search_interactions_in_db(search_db, None, q="chatbots")] == ["Ana Martinez"]
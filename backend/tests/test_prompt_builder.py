@@ -0,0 +1,134 @@
+import pytest
+
+pytest.importorskip("torch")
+
+from app.services.prompt_builder import (
+    MIN_TRUNCATED_CHUNK_TOKENS, REQUEST_TEMPLATE, PrefixKVCache, PromptBuilder
+)
+
+from .fakes import WhitespaceTokenizer
+
+QUESTION = "What services does Promtior offer?"
+
+
+def words(n, prefix="w"):
+    return " ".join(f"{prefix}{i}" for i in range(n))
+
+
+@pytest.fixture
+def builder():
+    return PromptBuilder(WhitespaceTokenizer(), context_window=400, max_new_tokens=100)
+
+
+def free_tokens(builder):
+    """Tokens left for context once BOS, the system prompt and the request scaffold are in"""
+    prefix = builder.prefix("Promtior", "bot")
+    scaffold = REQUEST_TEMPLATE.format(context="", question=QUESTION)
+    return builder.budget - 1 - builder.count(prefix) - builder.count(scaffold)
+
+
+def test_budget_leaves_room_for_the_answer(builder):
+    assert builder.budget == 300
+    with pytest.raises(ValueError):
+        PromptBuilder(WhitespaceTokenizer(), context_window=100, max_new_tokens=100)
+
+
+@pytest.mark.parametrize("chunks", [0, 1, 5, 50])
+def test_prompt_stays_within_the_budget(builder, chunks):
+    context = [words(40, f"c{i}_") for i in range(chunks)]
+    history = [f"User: q{i}\nAssistant: " + words(30, f"h{i}_") for i in range(5)]
+
+    prompt = builder.build(words(500, "q"), "Promtior", "bot", context, history)
+
+    # +1 for BOS, as the builder counts it
+    assert builder.count(prompt.text) + 1 <= builder.budget
+    assert prompt.prompt_tokens <= builder.budget
+
+
+def test_lowest_ranked_chunk_is_truncated_and_the_rest_dropped(builder):
+    best = words(free_tokens(builder) - 50 - 1, "best")
+    second = words(100, "second")
+
+    prompt = builder.build(QUESTION, "Promtior", "bot", [best, second, "tiny chunk"])
+
+    assert prompt.context == [best, builder.truncate(second, 47)]
+    assert prompt.context[1].startswith("second0 ") and prompt.context[1].endswith(" ...")
+    # A later chunk that would still fit is not promoted over a better-ranked one
+    assert "tiny" not in prompt.text
+    assert builder.count(prompt.text) + 1 <= builder.budget
+
+
+def test_chunk_that_would_be_cut_too_short_is_dropped(builder):
+    room = MIN_TRUNCATED_CHUNK_TOKENS - 1
+    best = words(free_tokens(builder) - room - 1, "best")
+
+    prompt = builder.build(QUESTION, "Promtior", "bot", [best, words(100, "second")])
+
+    assert prompt.context == [best]
+    assert "second0" not in prompt.text
+
+
+def test_each_section_appears_once_and_in_order(builder):
+    history = ["Earlier, the user asked about: offices", "User: where?\nAssistant: Montevideo"]
+
+    prompt = builder.build(QUESTION, "Promtior", "bot", ["Promtior builds RAG assistants"], history)
+
+    markers = [
+        "You are bot, a helpful AI assistant for Promtior", "Conversation so far:", "Context:", "Question:", "Answer:"
+    ]
+    assert [prompt.text.count(marker) for marker in markers] == [1] * len(markers)
+    positions = [prompt.text.index(marker) for marker in markers]
+    assert positions == sorted(positions)
+    assert prompt.prefix == builder.prefix("Promtior", "bot")
+    assert prompt.text.endswith("Answer:")
+
+
+def test_history_keeps_the_newest_lines_within_a_quarter_of_the_budget(builder):
+    history = [f"User: q{i}\nAssistant: " + words(20, f"h{i}_") for i in range(10)]
+
+    prompt = builder.build(QUESTION, "Promtior", "bot", [], history)
+
+    section = prompt.suffix.split("Context:")[0]
+    assert builder.count(section) <= builder.budget // 4
+    assert "User: q9" in section and "User: q0" not in section
+    assert "Conversation so far:" not in builder.build(QUESTION, "Promtior", "bot", []).text
+
+
+class FakePrefixModel:
+    """Causal LM stand-in: records each prefill and returns a marker as the KV cache"""
+
+    device = "cpu"
+
+    def __init__(self):
+        self.prefills = []
+
+    def __call__(self, input_ids, use_cache=True):
+        length = input_ids.shape[1]
+        self.prefills.append(length)
+
+        class Output:
+            past_key_values = ("past", length)
+
+        return Output()
+
+
+def test_prefix_cache_is_keyed_by_the_system_prompt_inputs(builder):
+    model = FakePrefixModel()
+    cache = PrefixKVCache(model, builder.tokenizer, max_entries=2)
+    promtior = builder.prefix("Promtior", "bot")
+
+    ids, past = cache.get(promtior)
+    cache.get(promtior)
+    assert (cache.misses, cache.hits) == (1, 1)
+    assert past == ("past", builder.count(promtior))
+
+    # Another company or chat name is another system prompt, prefilled on its own
+    for prefix in (builder.prefix("Acme", "bot"), builder.prefix("Promtior", "helper")):
+        assert prefix != promtior
+        cache.get(prefix)
+    assert (cache.misses, cache.hits) == (3, 1)
+    assert len(model.prefills) == 3
+
+    # Only max_entries prefixes are kept: the least recently used one was evicted
+    cache.get(promtior)
+    assert cache.misses == 4
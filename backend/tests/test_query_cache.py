@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from app.services.query_cache import QueryEmbeddingCache
+
+
+def vectors(n, dim=4):
+    return np.arange(n * dim, dtype=np.float32).reshape(n, dim) / 10
+
+
+def test_keys_collapse_whitespace_and_case_only_when_asked():
+    assert QueryEmbeddingCache(max_bytes=1024, dtype="float32").key(" What  is\nRAG ") == "What is RAG"
+    assert QueryEmbeddingCache(max_bytes=1024, dtype="float32", lowercase=True).key("What is RAG") == "what is rag"
+
+
+def test_stores_float16_and_returns_float32():
+    cache = QueryEmbeddingCache(max_bytes=1024, dtype="float16")
+    cache.put_many(["a"], vectors(1))
+
+    (found,) = cache.get_many(["a"])
+    assert found.dtype == np.float32
+    np.testing.assert_allclose(found, vectors(1)[0], rtol=1e-3)
+    assert cache.nbytes == 4 * 2 + len("a")
+
+
+def test_counts_hits_and_misses():
+    cache = QueryEmbeddingCache(max_bytes=1024, dtype="float32")
+    cache.put_many(["a"], vectors(1))
+
+    found = cache.get_many(["a", "b"])
+    assert found[1] is None
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 1)
+
+
+def test_evicts_least_recently_used_to_stay_within_bytes():
+    entry = 4 * 4 + 1
+    cache = QueryEmbeddingCache(max_bytes=2 * entry, dtype="float32")
+    cache.put_many(["a", "b"], vectors(2))
+    cache.get_many(["a"])
+    cache.put_many(["c"], vectors(1))
+
+    assert [v is not None for v in cache.get_many(["a", "b", "c"])] == [True, False, True]
+    assert cache.nbytes == 2 * entry
+
+
+def test_replacing_a_key_does_not_double_count():
+    cache = QueryEmbeddingCache(max_bytes=1024, dtype="float32")
+    cache.put_many(["a"], vectors(1))
+    cache.put_many(["a"], vectors(1))
+
+    assert cache.nbytes == 4 * 4 + 1
+    assert cache.stats()["entries"] == 1
+
+
+def test_skips_entries_larger_than_the_whole_cache():
+    cache = QueryEmbeddingCache(max_bytes=8, dtype="float32")
+    cache.put_many(["a"], vectors(1))
+
+    assert cache.get_many(["a"]) == [None]
+    assert cache.nbytes == 0
+
+
+def test_rejects_unknown_dtype():
+    with pytest.raises(ValueError):
+        QueryEmbeddingCache(max_bytes=1024, dtype="int8")
@@ -0,0 +1,88 @@
+import numpy as np
+
+from app.services.response_cache import ResponseCache, normalize_message
+
+
+def unit(*values):
+    vector = np.array(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_normalize_message_ignores_case_spacing_and_final_punctuation():
+    assert normalize_message("  What   does Promtior DO? ") == "what does promtior do"
+    assert normalize_message("¿Qué hacen?!") == "¿qué hacen"
+
+
+def test_exact_hits_are_normalized_and_partitioned():
+    cache = ResponseCache(max_entries=10, ttl_seconds=60, similarity_threshold=0.9)
+    cache.put("What is Promtior?", "Promtior", "bot", "A consultancy")
+
+    assert cache.get_exact("what is promtior", "Promtior", "bot") == "A consultancy"
+    assert cache.get_exact("what is promtior", "Other", "bot") is None
+    assert cache.get_exact("what is promtior", "Promtior", "other-bot") is None
+    assert cache.stats()["exact_hits"] == 1
+
+
+def test_semantic_hit_above_threshold_only():
+    cache = ResponseCache(max_entries=10, ttl_seconds=60, similarity_threshold=0.9)
+    cache.put("services offered", "Promtior", "bot", "RAG and agents", unit(1, 0, 0))
+
+    assert cache.get("what services do you offer", "Promtior", "bot", unit(1, 0.1, 0)) == "RAG and agents"
+    assert cache.get("when was it founded", "Promtior", "bot", unit(0, 1, 0)) is None
+    # Semantic matches never cross partitions
+    assert cache.get("what services do you offer", "Other", "bot", unit(1, 0.1, 0)) is None
+    stats = cache.stats()
+    assert (stats["semantic_hits"], stats["misses"]) == (1, 2)
+
+
+def test_semantic_lookup_skips_an_expired_best_match(clock):
+    cache = ResponseCache(max_entries=10, ttl_seconds=60, similarity_threshold=0.8)
+    cache.put("services offered", "Promtior", "bot", "stale", unit(1, 0, 0))
+    clock.advance(30)
+    cache.put("which services", "Promtior", "bot", "fresh", unit(1, 0.3, 0))
+    clock.advance(31)
+
+    assert cache.get("services", "Promtior", "bot", unit(1, 0, 0)) == "fresh"
+    assert cache.stats()["entries"] == 1
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = ResponseCache(max_entries=10, ttl_seconds=60, similarity_threshold=0.9)
+    cache.put("hello", "Promtior", "bot", "hi")
+
+    clock.advance(59)
+    assert cache.get_exact("hello", "Promtior", "bot") == "hi"
+    clock.advance(2)
+    assert cache.get_exact("hello", "Promtior", "bot") is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResponseCache(max_entries=2, ttl_seconds=60, similarity_threshold=0.9)
+    cache.put("a", "Promtior", "bot", "A")
+    cache.put("b", "Promtior", "bot", "B")
+    cache.get_exact("a", "Promtior", "bot")
+    cache.put("c", "Promtior", "bot", "C")
+
+    assert cache.get_exact("a", "Promtior", "bot") == "A"
+    assert cache.get_exact("b", "Promtior", "bot") is None
+    assert cache.get_exact("c", "Promtior", "bot") == "C"
+
+
+def test_evicted_entries_leave_the_semantic_tier():
+    cache = ResponseCache(max_entries=1, ttl_seconds=60, similarity_threshold=0.9)
+    cache.put("services", "Promtior", "bot", "old", unit(1, 0, 0))
+    assert cache.get("services?", "Promtior", "bot", unit(1, 0, 0)) == "old"
+
+    cache.put("founded", "Promtior", "bot", "2023", unit(0, 1, 0))
+    assert cache.get("which services", "Promtior", "bot", unit(1, 0, 0)) is None
+
+
+def test_new_corpus_version_clears_the_cache():
+    cache = ResponseCache(max_entries=10, ttl_seconds=60, similarity_threshold=0.9)
+    cache.sync_corpus_version("v1")
+    cache.put("hello", "Promtior", "bot", "hi")
+
+    cache.sync_corpus_version("v1")
+    assert cache.get_exact("hello", "Promtior", "bot") == "hi"
+    cache.sync_corpus_version("v2")
+    assert cache.get_exact("hello", "Promtior", "bot") is None
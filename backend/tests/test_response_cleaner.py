@@ -0,0 +1,78 @@
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from app.services.chat_service import ResponseCleaner, clean_response
+
+OUTPUTS = [
+    "Answer: Promtior builds RAG assistants.",
+    "  Promtior was founded in 2023.\n\nQuestion: When was it founded?",
+    "It offers consulting.\nUser: and the price?\nAssistant: It depends.",
+    "Answer:\n We work with banks. Context: none",
+    "Use cases include support bots. Users love them.",
+    "Answer: Answer: twice",
+    "Nothing to clean",
+    "",
+]
+
+
+def stream(chunks):
+    cleaner = ResponseCleaner()
+    pieces = [cleaner.feed(chunk) for chunk in chunks]
+    pieces.append(cleaner.finish())
+    return "".join(pieces)
+
+
+def chunked(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def test_marker_split_across_chunks_is_removed():
+    cleaner = ResponseCleaner()
+
+    assert cleaner.feed("We build assistants.\nUs") == "We build assistants."
+    assert cleaner.feed("er: what else?") == ""
+    assert cleaner.stopped
+    assert cleaner.feed("more text") == ""
+    assert cleaner.finish() == ""
+
+
+def test_leading_answer_marker_split_across_chunks_is_removed():
+    assert stream(["An", "swer", ": ", "Hello", " there"]) == "Hello there"
+
+
+def test_text_that_only_looks_like_a_marker_is_released():
+    cleaner = ResponseCleaner()
+
+    assert cleaner.feed("Ask our team. Use") == "Ask our team."
+    assert cleaner.feed("rs") == " Users"
+    assert cleaner.feed(" Cont") == ""
+    assert cleaner.finish() == " Cont"
+
+
+def test_held_back_whitespace_is_trimmed_at_the_end():
+    assert stream(["Done.", "  \n"]) == "Done."
+
+
+def test_a_short_answer_that_looks_like_the_answer_marker_is_released():
+    assert stream(["An", "s"]) == "Ans"
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 8, 1000])
+@pytest.mark.parametrize("output", OUTPUTS)
+def test_streaming_and_full_text_cleaning_agree(output, size):
+    assert stream(chunked(output, size)) == clean_response(output)
+
+
+def test_full_text_cleaning():
+    assert [clean_response(output) for output in OUTPUTS] == [
+        "Promtior builds RAG assistants.",
+        "Promtior was founded in 2023.",
+        "It offers consulting.",
+        "We work with banks.",
+        "Use cases include support bots. Users love them.",
+        "twice",
+        "Nothing to clean",
+        "",
+    ]
@@ -0,0 +1,19 @@
+from app.services.sentiment import classify, classify_many
+
+
+def test_lexicon_weights_decide_the_label():
+    assert classify("Thanks, great help") == "positive"
+    assert classify("This answer is wrong and useless") == "negative"
+    assert classify("What services do you offer?") == "neutral"
+    assert classify("") == classify(None) == "neutral"
+
+
+def test_negation_flips_the_next_few_words():
+    assert classify("not helpful at all") == "negative"
+    assert classify("no es un problema") == "positive"
+    # Outside the negation scope words count as usual
+    assert classify("not that it matters, but this was very helpful") == "positive"
+
+
+def test_classify_many_keeps_the_order():
+    assert classify_many(["gracias", None, "horrible"]) == ["positive", "neutral", "negative"]
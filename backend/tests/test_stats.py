@@ -0,0 +1,135 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import chat
+from app.api.chat import get_stats_from_db
+from app.db import stats
+from app.db.db_connection import get_db
+from app.db.db_models import Conversation, Interaction
+
+SENTIMENT_CYCLE = ("positive", "negative", "neutral", "positive")
+
+
+def add_interactions(session, email, count, start):
+    """Writes count interactions for email, as the log writer does, and returns the inserted rows"""
+    conversation = session.query(Conversation).filter_by(user_email=email).one_or_none()
+    created = conversation is None
+    if created:
+        conversation = Conversation(user_email=email, user_name=email.split("@")[0])
+        session.add(conversation)
+        session.flush()
+    rows = []
+    for i in range(count):
+        interaction = Interaction(
+            conversation_id=conversation.id, timestamp=start + timedelta(minutes=37 * i),
+            user_message=f"q{i}", bot_response=f"a{i}", sentiment=SENTIMENT_CYCLE[i % len(SENTIMENT_CYCLE)]
+        )
+        session.add(interaction)
+        rows.append(interaction)
+    session.flush()
+    stats.apply_batch(session.connection(), int(created), [
+        {"conversation_id": row.conversation_id, "timestamp": row.timestamp, "sentiment": row.sentiment}
+        for row in rows
+    ])
+    session.commit()
+
+
+def comparable(summary):
+    return {key: value for key, value in summary.items() if key != "updated_at"}
+
+
+@pytest.fixture
+def logged(session):
+    now = datetime.utcnow()
+    add_interactions(session, "ana@example.com", 5, now - timedelta(days=3))
+    add_interactions(session, "bob@example.com", 2, now - timedelta(hours=5))
+    # A later batch for a known conversation moves its latest sentiment forward
+    add_interactions(session, "ana@example.com", 3, now - timedelta(hours=2))
+    add_interactions(session, "eve@example.com", 1, now - timedelta(days=45))
+    return session
+
+
+@pytest.mark.parametrize("bucket", ["hour", "day"])
+def test_incremental_aggregates_match_a_full_rebuild(logged, bucket):
+    conn = logged.connection()
+    incremental = stats.read_stats(conn, bucket, days=30, top=10)
+
+    stats.rebuild(conn, batch_size=4)
+    rebuilt = stats.read_stats(conn, bucket, days=30, top=10)
+
+    assert comparable(incremental) == comparable(rebuilt)
+    assert incremental["conversations"] == 3
+    assert incremental["interactions"] == 11
+    assert incremental["active_users"] == 2
+    assert incremental["sentiment"] == {"positive": 6, "negative": 3, "neutral": 2}
+    assert [user["user_email"] for user in incremental["top_users"]] == [
+        "ana@example.com", "bob@example.com", "eve@example.com"
+    ]
+
+
+def test_rebuild_classifies_interactions_without_sentiment(session):
+    conversation = Conversation(user_email="ana@example.com", user_name="ana")
+    conversation.interactions = [
+        Interaction(timestamp=datetime.utcnow(), user_message="Thanks, great help", bot_response="a")
+    ]
+    session.add(conversation)
+    session.commit()
+
+    stats.rebuild(session.connection())
+
+    assert session.query(Interaction).one().sentiment == "positive"
+    assert stats.read_stats(session.connection())["sentiment"]["positive"] == 1
+
+
+def test_etag_changes_only_when_the_stats_change(logged):
+    etag, _ = get_stats_from_db(logged, "day", 30, 10)
+
+    assert get_stats_from_db(logged, "day", 30, 10)[0] == etag
+    stats.apply_batch(logged.connection(), 0, [])
+    assert get_stats_from_db(logged, "day", 30, 10)[0] == etag
+    # The query parameters are part of the tag: another window is another body
+    assert get_stats_from_db(logged, "hour", 30, 10)[0] != etag
+
+    add_interactions(logged, "bob@example.com", 1, datetime.utcnow())
+    changed, _ = get_stats_from_db(logged, "day", 30, 10)
+    assert changed != etag
+
+    version = stats.stats_version(logged.connection())
+    stats.rebuild(logged.connection())
+    # Rebuilt aggregates never reuse a version an old ETag could match
+    assert stats.stats_version(logged.connection()) > version
+    assert get_stats_from_db(logged, "day", 30, 10)[0] != changed
+
+
+def test_matching_if_none_match_skips_the_query(logged):
+    etag, _ = get_stats_from_db(logged, "day", 30, 10)
+
+    assert get_stats_from_db(logged, "day", 30, 10, f'W/"stale", {etag}') == (etag, None)
+    assert get_stats_from_db(logged, "day", 30, 10, 'W/"stale"')[1] is not None
+
+
+def test_stats_endpoint_answers_304_on_if_none_match(logged):
+    app = FastAPI()
+    app.include_router(chat.router)
+    app.dependency_overrides[get_db] = lambda: logged
+    client = TestClient(app)
+
+    response = client.get("/api/interactions/stats")
+    assert response.status_code == 200
+    assert response.json()["interactions"] == 11
+    assert response.headers["cache-control"] == "no-cache"
+    etag = response.headers["etag"]
+
+    cached = client.get("/api/interactions/stats", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["etag"] == etag
+    assert cached.content == b""
+
+    add_interactions(logged, "bob@example.com", 1, datetime.utcnow())
+    fresh = client.get("/api/interactions/stats", headers={"If-None-Match": etag})
+    assert fresh.status_code == 200
+    assert fresh.headers["etag"] != etag
+    assert fresh.json()["interactions"] == 12
@@ -0,0 +1,149 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from app.services.ingestion import TextChunker
+from app.services.tenant_indexes import TenantIndexes
+
+from .fakes import StubEmbedder
+
+# Every tenant below is a single one-line chunk: 32 float32 = 128 bytes
+ONE_TENANT_MB = 200 / (1024 * 1024)
+
+
+def write_source(directory, company, text):
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, "info.json"), "w", encoding="utf-8") as f:
+        json.dump({"metadata": {"company_name": company}, "about": {"text": text}}, f)
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    root = tmp_path / "data"
+    write_source(str(root), "Promtior", "Promtior builds generative AI assistants")
+    write_source(str(root / "acme"), "Acme", "Acme sells rockets and anvils")
+    write_source(str(root / "globex"), "Globex", "Globex runs a nuclear power plant")
+    return root
+
+
+@pytest.fixture
+def make_tenants(data_dir, tmp_path):
+    def make(memory_cap_mb=ONE_TENANT_MB):
+        tenants = TenantIndexes(
+            StubEmbedder(dim=32), "stub", TextChunker(max_tokens=50, overlap=5),
+            data_dir=str(data_dir), cache_dir=str(tmp_path / "cache"), memory_cap_mb=memory_cap_mb
+        )
+        tenants.discover()
+        return tenants
+    return make
+
+
+def texts(snapshot):
+    return [chunk.text for chunk in snapshot.items]
+
+
+def test_discover_registers_root_and_subdirectory_companies(make_tenants):
+    tenants = make_tenants()
+
+    assert sorted(tenants.discover()) == ["acme", "globex", "promtior"]
+    assert tenants.default_slug == "promtior"
+    assert tenants.stats()["loaded"] == 0
+
+
+def test_unknown_company_resolves_to_none(make_tenants):
+    tenants = make_tenants()
+
+    assert tenants.resolve("Initech") is None
+    assert tenants.snapshot("Initech") is None
+    assert tenants.resolve("ACME").company == "Acme"
+    assert tenants.resolve(None).company == "Promtior"
+    assert tenants.stats()["loaded"] == 0
+
+
+def test_rarely_used_tenant_does_not_evict_a_hot_one(make_tenants):
+    tenants = make_tenants()
+    for _ in range(5):
+        tenants.snapshot("Acme")
+    assert tenants.stats()["resident"] == ["acme"]
+
+    cold = tenants.snapshot("Globex")
+
+    assert tenants.stats()["resident"] == ["acme"]
+    assert tenants.rejected_admissions == 1
+    assert tenants.spills == 0
+    assert not cold.resident and isinstance(cold.matrix, np.memmap)
+    assert tenants.snapshot("Acme").resident
+
+
+def test_tenant_used_more_often_takes_the_slot(make_tenants):
+    tenants = make_tenants()
+    for _ in range(5):
+        tenants.snapshot("Acme")
+
+    # Rejected while used at most as often as the resident tenant
+    for _ in range(5):
+        assert not tenants.snapshot("Globex").resident
+    assert tenants.snapshot("Globex").resident
+
+    assert tenants.stats()["resident"] == ["globex"]
+    assert tenants.spills == 1
+    assert tenants.resident_bytes <= tenants.memory_cap
+
+
+def test_evicted_tenant_is_still_served_from_the_mmap(make_tenants):
+    tenants = make_tenants()
+    embedder = tenants.model
+    tenants.snapshot("Acme")
+    for _ in range(2):
+        tenants.snapshot("Globex")
+    assert tenants.stats()["resident"] == ["globex"]
+
+    snapshot = tenants.snapshot("Acme")
+
+    assert not snapshot.resident and isinstance(snapshot.matrix, np.memmap)
+    query = embedder.encode(["rockets and anvils"])[0]
+    (position, score), = snapshot.store.search(query, 1)
+    assert snapshot.items[position].text.endswith("Acme sells rockets and anvils")
+    assert score > 0.5
+
+
+def test_tenant_larger_than_the_cap_stays_on_the_mmap(make_tenants):
+    tenants = make_tenants(memory_cap_mb=0)
+
+    snapshot = tenants.snapshot("Acme")
+
+    assert not snapshot.resident
+    assert tenants.stats()["resident"] == []
+    assert texts(snapshot) == ["about.text: Acme sells rockets and anvils"]
+
+
+def test_reload_refreshes_each_tenant_from_its_own_sources(make_tenants, data_dir):
+    tenants = make_tenants(memory_cap_mb=1)
+    acme_before = texts(tenants.snapshot("Acme"))
+    globex_before = texts(tenants.snapshot("Globex"))
+
+    write_source(str(data_dir / "acme"), "Acme", "Acme now also sells portable holes")
+    write_source(str(data_dir / "initech"), "Initech", "Initech makes TPS reports")
+    tenants.reload()
+
+    acme = texts(tenants.snapshot("Acme"))
+    assert acme != acme_before and "portable holes" in acme[0]
+    assert texts(tenants.snapshot("Globex")) == globex_before
+    assert not any("portable holes" in text for text in globex_before)
+    # A new company is registered by reload and opened on first use
+    assert tenants.resolve("Initech") is not None and not tenants.resolve("Initech").loaded
+    assert texts(tenants.snapshot("Initech")) == ["about.text: Initech makes TPS reports"]
+
+
+def test_removed_company_is_dropped_on_reload(make_tenants, data_dir):
+    tenants = make_tenants(memory_cap_mb=1)
+    tenants.snapshot("Globex")
+
+    os.remove(str(data_dir / "globex" / "info.json"))
+    tenants.reload()
+
+    assert tenants.resolve("Globex") is None
+    assert "globex" not in tenants.stats()["resident"]
+    assert tenants.snapshot("Acme") is not None
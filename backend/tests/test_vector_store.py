@@ -0,0 +1,109 @@
+import numpy as np
+import pytest
+
+from app.services.vector_store import NumpyVectorStore, create_vector_store, load_vector_store
+
+DIM = 16
+
+
+def normalized(rows, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((rows, DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def brute_force(matrix, ids, query, k):
+    scores = matrix @ query
+    order = np.argsort(-scores, kind="stable")[:k]
+    return [int(ids[i]) for i in order]
+
+
+@pytest.fixture
+def corpus():
+    return normalized(200)
+
+
+@pytest.fixture
+def store(corpus):
+    store = NumpyVectorStore(DIM)
+    store.add(range(100, 300), corpus)
+    return store
+
+
+@pytest.mark.parametrize("k", [1, 5, 50, 200, 500])
+def test_top_k_matches_a_full_sort(store, corpus, k):
+    ids = np.arange(100, 300)
+    for query in normalized(10, seed=1):
+        results = store.search(query, k)
+
+        assert [i for i, _ in results] == brute_force(corpus, ids, query, k)
+        scores = [score for _, score in results]
+        assert scores == sorted(scores, reverse=True)
+
+
+@pytest.mark.parametrize("k", [1, 7, 200, 300])
+def test_search_many_agrees_with_search(store, k):
+    queries = normalized(12, seed=2)
+
+    batched = store.search_many(queries, k)
+
+    assert len(batched) == len(queries)
+    for query, results in zip(queries, batched):
+        expected = store.search(query, k)
+        assert [i for i, _ in results] == [i for i, _ in expected]
+        np.testing.assert_allclose([s for _, s in results], [s for _, s in expected], atol=1e-6)
+
+
+def test_empty_store_and_non_positive_k():
+    store = NumpyVectorStore(DIM)
+    query = normalized(1)[0]
+
+    assert store.search(query, 5) == []
+    assert store.search_many(normalized(3), 5) == [[], [], []]
+    store.add([1], normalized(1))
+    assert store.search(query, 0) == []
+
+
+def test_removed_ids_are_no_longer_returned(store, corpus):
+    store.remove([100, 150, 299])
+
+    assert len(store) == 197
+    returned = {i for i, _ in store.search(corpus[50], 200)}
+    assert returned.isdisjoint({100, 150, 299})
+    assert store.search(corpus[1], 1)[0][0] == 101
+
+
+def test_save_and_load_round_trip(tmp_path, store, corpus):
+    store.remove([120])
+    path = str(tmp_path / "store")
+    store.save(path)
+
+    loaded = load_vector_store(path, "numpy")
+
+    assert isinstance(loaded.matrix, np.memmap)
+    assert len(loaded) == len(store)
+    queries = normalized(5, seed=3)
+    assert loaded.search_many(queries, 10) == store.search_many(queries, 10)
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        create_vector_store(DIM, "annoy")
+
+
+def test_faiss_flat_matches_numpy(tmp_path, store, corpus):
+    pytest.importorskip("faiss")
+    flat = create_vector_store(DIM, "faiss-flat")
+    flat.add(range(100, 300), corpus)
+    queries = normalized(8, seed=4)
+
+    for expected, results in zip(store.search_many(queries, 10), flat.search_many(queries, 10)):
+        assert [i for i, _ in results] == [i for i, _ in expected]
+        np.testing.assert_allclose([s for _, s in results], [s for _, s in expected], atol=1e-5)
+
+    flat.remove([100, 101])
+    store.remove([100, 101])
+    path = str(tmp_path / "flat")
+    flat.save(path)
+    loaded = load_vector_store(path, "faiss-flat")
+    assert len(loaded) == len(store)
+    assert [i for i, _ in loaded.search(corpus[0], 5)] == [i for i, _ in store.search(corpus[0], 5)]
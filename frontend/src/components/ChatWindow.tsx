@@ -53,8 +53,17 @@ export function ChatWindow({ onClose }: { onClose: () => void }) {
             user_email: globalUserData.email
         });
 
-        // Log the interaction
-        await fetch('http://127.0.0.1:8000/api/log_interaction', {
+        setIsTyping(false);
+
+        const botMessage: Message = {
+            text: response.reply,
+            isUser: false
+        };
+
+        setMessages(prev => [...prev, botMessage]);
+
+        // Log the interaction in the background; the backend queues it for a batched write
+        fetch('http://127.0.0.1:8000/api/log_interaction', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
@@ -70,16 +79,7 @@ export function ChatWindow({ onClose }: { onClose: () => void }) {
                     }
                 ]
             }),
-        });
-
-        setIsTyping(false);
-
-        const botMessage: Message = {
-            text: response.reply,
-            isUser: false
-        };
-
-        setMessages(prev => [...prev, botMessage]);
+        }).catch(error => console.error('Error logging interaction:', error));
     } catch {
         setIsTyping(false);
         const errorMessage: Message = {
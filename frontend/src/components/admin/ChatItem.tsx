@@ -1,5 +1,4 @@
 import { UserInteractions } from '../../types/chat'
-import { getSentiment } from '../../lib/sentiment'
 
 interface ChatItemProps {
     interaction: UserInteractions
@@ -8,7 +7,8 @@ interface ChatItemProps {
 
 export function ChatItem({ interaction, onClick }: ChatItemProps) {
     const lastInteraction = interaction.interactions[interaction.interactions.length - 1]
-    const sentiment = getSentiment(lastInteraction.user_message)
+    // Classified by the backend when the interaction was logged
+    const sentiment = lastInteraction.sentiment ?? 'neutral'
 
     return (
         <div 
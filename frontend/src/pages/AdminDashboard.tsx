@@ -1,22 +1,47 @@
 import { useState } from 'react'
-import { useQuery } from '@tanstack/react-query'
-import { MessageCircle, Filter } from 'lucide-react'
+import { useInfiniteQuery, useQuery } from '@tanstack/react-query'
+import { MessageCircle, MessagesSquare, Users, Smile, Filter } from 'lucide-react'
 import { Button } from '@/components/ui/button'
 import { Input } from '@/components/ui/input'
-import { UserInteractions } from '../types/chat'
+import { InteractionStats, UserInteractions } from '../types/chat'
 import { ChatItem } from '../components/admin/ChatItem'
 import { StatCard } from '../components/admin/StatCard'
 import { config } from '../lib/config'
 
+const PAGE_SIZE = 50
+
 export default function AdminDashboard() {
   const [searchTerm, setSearchTerm] = useState('')
   const [selectedEmail, setSelectedEmail] = useState<string | null>(null)
 
-  const { data: interactions, error, isLoading, refetch } = useQuery({
-    queryKey: ['interactions'],
+  // Totals are aggregated by the backend; the ETag makes unchanged stats a 304
+  const { data: stats } = useQuery<InteractionStats>({
+    queryKey: ['interactionStats'],
     queryFn: async () => {
+      const response = await fetch(`${config.apiUrl}/api/interactions/stats?bucket=day&days=30`);
+      if (!response.ok) throw new Error('Network response was not ok');
+      return response.json();
+    },
+    staleTime: 30000,
+    refetchOnWindowFocus: false,
+  });
+
+  // Conversations are paged by id; X-Next-Cursor points at the next page
+  const {
+    data: interactionPages,
+    error,
+    isLoading,
+    refetch,
+    fetchNextPage,
+    hasNextPage,
+    isFetchingNextPage,
+  } = useInfiniteQuery({
+    queryKey: ['interactions'],
+    initialPageParam: null as string | null,
+    queryFn: async ({ pageParam }) => {
       try {
-        const response = await fetch(`${config.apiUrl}/api/interactions`, {
+        const cursor = pageParam ? `&cursor=${pageParam}` : '';
+        const response = await fetch(`${config.apiUrl}/api/interactions?limit=${PAGE_SIZE}${cursor}`, {
           headers: {
             'Content-Type': 'application/json',
           },
@@ -30,12 +55,14 @@ export default function AdminDashboard() {
           throw new Error('Network response was not ok');
         }
 
-        return response.json();
+        const conversations: UserInteractions[] = await response.json();
+        return { conversations, nextCursor: response.headers.get('X-Next-Cursor') };
       } catch (error) {
         console.error('Error fetching interactions:', error);
         throw error;
       }
     },
+    getNextPageParam: (lastPage) => lastPage.nextCursor,
     retry: 2,
     retryDelay: (attemptIndex) => Math.min(1000 * 2 ** attemptIndex, 10000),
     staleTime: 30000, // Consider data fresh for 30 seconds
@@ -77,16 +104,11 @@ export default function AdminDashboard() {
     </div>
   );
 
+  const interactions = interactionPages?.pages.flatMap((page) => page.conversations);
   const interactionsToDisplay = searchTerm ? searchResults : interactions;
 
-  const stats = {
-    totalConversations: interactions?.length || 0,
-    activeUsers: interactions?.filter((i: UserInteractions) =>
-      new Date(i.interactions[0].timestamp).getMonth() === new Date().getMonth()
-    ).length || 0,
-    avgResponseTime: '1.2s',
-    userSatisfaction: '98%'
-  }
+  const rated = stats ? stats.sentiment.positive + stats.sentiment.negative : 0
+  const satisfaction = rated ? `${Math.round(100 * (stats?.sentiment.positive ?? 0) / rated)}%` : '—'
 
   return (
     <div className="min-h-screen bg-background">
@@ -107,9 +129,27 @@ export default function AdminDashboard() {
           <div className="grid grid-cols-1 md:grid-cols-4 gap-6 mb-8">
             <StatCard
               title="Total Conversations"
-              value={stats.totalConversations.toString()}
+              value={(stats?.conversations ?? 0).toString()}
               icon={MessageCircle}
-              change="+20.1% from last month"
+              change={`${stats?.active_users ?? 0} active in the last 30 days`}
+            />
+            <StatCard
+              title="Interactions"
+              value={(stats?.interactions ?? 0).toString()}
+              icon={MessagesSquare}
+              change={`${stats?.activity.reduce((sum, day) => sum + day.interactions, 0) ?? 0} in the last 30 days`}
+            />
+            <StatCard
+              title="Top User"
+              value={stats?.top_users[0]?.user_name ?? '—'}
+              icon={Users}
+              change={`${stats?.top_users[0]?.interactions ?? 0} interactions`}
+            />
+            <StatCard
+              title="User Satisfaction"
+              value={satisfaction}
+              icon={Smile}
+              change={`${stats?.sentiment.negative ?? 0} negative messages`}
             />
           </div>
 
@@ -140,6 +180,18 @@ export default function AdminDashboard() {
               ))}
             </div>
 
+            {!searchTerm && hasNextPage && (
+              <div className="mt-4 flex justify-center">
+                <Button
+                  variant="outline"
+                  onClick={() => fetchNextPage()}
+                  disabled={isFetchingNextPage}
+                >
+                  {isFetchingNextPage ? 'Loading...' : 'Load more'}
+                </Button>
+              </div>
+            )}
+
             {userInteractions && (
               <div className="mt-6">
                 <h4 className="text-lg font-semibold text-foreground">Interactions for {userInteractions.user_email}</h4>
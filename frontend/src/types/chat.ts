@@ -1,7 +1,10 @@
-interface Interaction {
+  type Sentiment = 'positive' | 'negative' | 'neutral'
+
+  interface Interaction {
     timestamp: string
     user_message: string
     bot_response: string
+    sentiment?: Sentiment | null
   }
   
   interface UserInteractions {
@@ -9,5 +12,23 @@ interface Interaction {
     user_name: string
     interactions: Interaction[]
   }
+
+  interface InteractionStats {
+    conversations: number
+    interactions: number
+    active_users: number
+    sentiment: Record<Sentiment, number>
+    bucket: 'hour' | 'day'
+    since: string
+    activity: ({ bucket: string, interactions: number } & Record<Sentiment, number>)[]
+    top_users: {
+      user_email: string
+      user_name: string
+      interactions: number
+      last_interaction_at: string | null
+      last_sentiment: Sentiment | null
+    }[]
+    updated_at: string | null
+  }
   
-  export type { Interaction, UserInteractions }
\ No newline at end of file
+  export type { Interaction, InteractionStats, Sentiment, UserInteractions }